@@ -9,18 +9,23 @@
 # ╚═════════════════════════════════════════════╝
 
 from flask import Flask, send_file
+from commands import register_commands
 from config import Config
 from extensions import init_extensions, init_security
 from flask_swagger_ui import get_swaggerui_blueprint
 from routes import register_blueprints
 from utils.errors import init_error_handlers
-from utils.security import init_security_headers
+from utils.outbox import init_mail_outbox
+from utils.security import init_proxy_fix, init_security_headers
 
 
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder="static")
     app.config.from_object(config_class)
 
+    # Take the client address from X-Forwarded-For when running behind proxies
+    init_proxy_fix(app)
+
     # Initialize extensions
     init_extensions(app)
 
@@ -42,6 +47,9 @@ def create_app(config_class=Config):
     # Register blueprints
     register_blueprints(app)
 
+    # Register CLI commands
+    register_commands(app)
+
     # Register API blueprint
     from routes.api.v1 import api_v1, register_routes
 
@@ -60,6 +68,9 @@ def create_app(config_class=Config):
     def send_swagger_spec():
         return send_file("swagger.yaml")
 
+    # Start the mail outbox worker with the first request so retries come due without new mail
+    init_mail_outbox(app)
+
     return app
 
 
@@ -0,0 +1,206 @@
+import click
+from flask.cli import with_appcontext
+
+from extensions import db
+from models import JobCheckpoint, User
+from utils.achievements import max_user_id, recompute_achievements
+from utils.aggregates import period_start
+from utils.digest import checkpoint_name, digest_chunk, digest_week, send_digests
+from utils.exercise_import import IMPORT_FORMATS, detect_format, import_exercises, iter_rows
+from utils.idempotency import purge_expired_keys
+from utils.leaderboard import rebuild_exercise_totals, rebuild_points_rollups
+from utils.outbox import send_batch
+from utils.rank_index import build_rank_index
+from utils.stats import rebuild_exercise_rollups
+from utils.streaks import rebuild_streaks
+
+
+def register_commands(app):
+    """Register the maintenance CLI commands with the app."""
+    app.cli.add_command(rebuild_aggregates)
+    app.cli.add_command(import_exercises_command)
+    app.cli.add_command(purge_idempotency_keys)
+    app.cli.add_command(recompute_achievements_command)
+    app.cli.add_command(send_outbox)
+    app.cli.add_command(send_weekly_digest)
+
+
+@click.command("rebuild-aggregates")
+@click.option("--chunk-size", default=1000, show_default=True, help="Rows per upsert batch.")
+@with_appcontext
+def rebuild_aggregates(chunk_size):
+    """Rebuild the per-type totals, point/exercise rollups and streaks from the exercise table.
+
+    Run after importing data outside the app or to backfill existing history.
+    Everything happens in one transaction, so readers never see a partial rebuild.
+    """
+    try:
+        totals = rebuild_exercise_totals()
+        click.echo(f"Rebuilt {totals} exercise totals.")
+        days = rebuild_points_rollups(chunk_size=chunk_size)
+        click.echo(f"Rebuilt point rollups from {days} active user-days.")
+        days = rebuild_exercise_rollups(chunk_size=chunk_size)
+        click.echo(f"Rebuilt exercise rollups from {days} active user-type-days.")
+        users = rebuild_streaks(chunk_size=chunk_size)
+        click.echo(f"Rebuilt streaks for {users} users.")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo("Aggregates rebuilt successfully!")
+
+
+@click.command("import-exercises")
+@click.argument("username")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format", "fmt", type=click.Choice(IMPORT_FORMATS), help="Defaults to the extension."
+)
+@click.option("--chunk-size", default=1000, show_default=True, help="Rows per transaction.")
+@with_appcontext
+def import_exercises_command(username, path, fmt, chunk_size):
+    """Import a user's exercise history from a CSV or NDJSON file.
+
+    The file is streamed and committed ``--chunk-size`` rows at a time, so
+    arbitrarily large exports import in bounded memory.
+    """
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"No user named {username!r}.")
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        raise click.BadParameter(
+            "Cannot tell the format from the file name.", param_hint="--format"
+        )
+
+    with open(path, encoding="utf-8", newline="") as stream:
+        report = import_exercises(user, iter_rows(stream, fmt), chunk_size=chunk_size)
+    for error in report["errors"]:
+        click.echo(f"Row {error['row']}: {error['message']}", err=True)
+    click.echo(
+        f"Imported {report['imported']} exercises ({report['points']} points), "
+        f"{report['failed']} rows failed."
+    )
+    if not report["complete"]:
+        raise click.ClickException("The import stopped early; fix the file and import the rest.")
+
+
+@click.command("purge-idempotency-keys")
+@with_appcontext
+def purge_idempotency_keys():
+    """Delete stored Idempotency-Key responses whose replay window has passed."""
+    click.echo(f"Purged {purge_expired_keys()} expired idempotency keys.")
+
+
+@click.command("send-outbox")
+@click.option("--batch-size", default=50, show_default=True, help="Messages per SMTP connection.")
+@with_appcontext
+def send_outbox(batch_size):
+    """Send every due message in the mail outbox, then exit.
+
+    For deployments that run the sender from cron or a dedicated process
+    instead of the in-app worker (MAIL_OUTBOX_WORKER_ENABLED=False).
+    """
+    sent = failed = 0
+    while True:
+        batch_sent, batch_failed = send_batch(batch_size)
+        sent += batch_sent
+        failed += batch_failed
+        if batch_sent + batch_failed < batch_size:
+            break
+    click.echo(f"Sent {sent} messages, {failed} failed attempts.")
+
+
+@click.command("recompute-achievements")
+@click.option("--chunk-size", default=50000, show_default=True, help="Users per INSERT ... SELECT.")
+@click.option("--restart", is_flag=True, help="Ignore a saved checkpoint and start from scratch.")
+@with_appcontext
+def recompute_achievements_command(chunk_size, restart):
+    """Insert the achievements every user has earned but is missing.
+
+    Run after adding or retuning ACHIEVEMENT_TIERS. Users are processed in id
+    ranges of --chunk-size, each committed together with a checkpoint, so an
+    interrupted run resumes after the last finished range.
+    """
+    name = "recompute-achievements"
+    checkpoint = JobCheckpoint.query.filter_by(name=name).first()
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=name, position=0)
+        db.session.add(checkpoint)
+    elif restart:
+        checkpoint.position = 0
+    elif checkpoint.position:
+        click.echo(f"Resuming after user id {checkpoint.position}.")
+
+    last_id = max_user_id()
+    added = 0
+    try:
+        while checkpoint.position < last_id:
+            upto = min(checkpoint.position + chunk_size, last_id)
+            added += recompute_achievements(checkpoint.position, upto)
+            checkpoint.position = upto
+            db.session.commit()
+            click.echo(
+                f"Processed users up to id {upto} of {last_id} "
+                f"({upto * 100 // last_id}%), {added} achievements added."
+            )
+        db.session.delete(checkpoint)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo(f"Achievements recomputed: {added} added.")
+
+
+@click.command("send-weekly-digest")
+@click.option("--chunk-size", default=500, show_default=True, help="Users per SMTP connection.")
+@click.option(
+    "--week",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Any day of the week to report. Defaults to last week.",
+)
+@click.option("--restart", is_flag=True, help="Ignore a saved checkpoint and send to everyone.")
+@with_appcontext
+def send_weekly_digest(chunk_size, week, restart):
+    """Email every active user a summary of their week.
+
+    Users are processed in id ranges of --chunk-size: each range is built
+    from a few aggregate queries and sent over one SMTP connection, and the
+    checkpoint is committed after every message, so an interrupted run
+    resumes after the last user it reached. Delivery is at-least-once: a
+    crash between the server accepting a message and that commit sends the
+    one digest again on resume. Each week keeps its own checkpoint, so
+    running the command again for any week only reaches users who joined since.
+    """
+    week_start = period_start("week", week.date()) if week else digest_week()
+    checkpoint = JobCheckpoint.query.filter_by(name=checkpoint_name(week_start)).first()
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=checkpoint_name(week_start), position=0)
+        db.session.add(checkpoint)
+    elif restart:
+        checkpoint.position = 0
+    elif checkpoint.position:
+        click.echo(f"Resuming after user id {checkpoint.position}.")
+
+    def advance(user_id):
+        checkpoint.position = user_id
+        db.session.commit()
+
+    rank_index = build_rank_index()
+    last_id = max_user_id()
+    sent = failed = 0
+    try:
+        while checkpoint.position < last_id:
+            upto = min(checkpoint.position + chunk_size, last_id)
+            digests = digest_chunk(checkpoint.position, upto, week_start, rank_index)
+            chunk_sent, chunk_failed = send_digests(digests, on_sent=advance)
+            sent += chunk_sent
+            failed += chunk_failed
+            checkpoint.position = upto
+            db.session.commit()
+            click.echo(f"Processed users up to id {upto} of {last_id} ({upto * 100 // last_id}%).")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo(f"Weekly digest for {week_start.isoformat()}: {sent} sent, {failed} failed.")
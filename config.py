@@ -18,6 +18,59 @@ class Config:
     JWT_TOKEN_LOCATION = ["cookies"]
     JWT_COOKIE_CSRF_PROTECT = False
     JWT_ACCESS_COOKIE_NAME = "access_token_cookie"
+    JWT_COOKIE_SAMESITE = "Lax"
+    JWT_SESSION_COOKIE = False  # cookie max-age follows JWT_ACCESS_TOKEN_EXPIRES
+    # Reissue the access cookie only once a token has this many seconds left
+    JWT_REFRESH_WINDOW = int(os.getenv("JWT_REFRESH_WINDOW", 300))
+
+    # Leaderboard rank index
+    RANK_INDEX_ENABLED = os.getenv("RANK_INDEX_ENABLED", "True") == "True"
+    RANK_INDEX_MAX_AGE = int(os.getenv("RANK_INDEX_MAX_AGE", 60))
+
+    # Leaderboard snapshot cache; set LEADERBOARD_CACHE_PATH to share it across workers
+    LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", 30))
+    LEADERBOARD_CACHE_SIZE = int(os.getenv("LEADERBOARD_CACHE_SIZE", 128))
+    LEADERBOARD_CACHE_PATH = os.getenv("LEADERBOARD_CACHE_PATH")
+    # How often a worker checks the shared cache for other workers' invalidations
+    LEADERBOARD_CACHE_SYNC_MS = int(os.getenv("LEADERBOARD_CACHE_SYNC_MS", 1000))
+
+    # Per-worker cache of user summaries for authorization and page headers; changes
+    # committed on this worker invalidate it at once, other workers within the TTL
+    USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "True") == "True"
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 5))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+
+    # Idempotency-Key replay window, and how long an unfinished request holds its key
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+
+    # Write-behind exercise logging: queue submissions and commit them in groups.
+    # An entry that keeps failing is retried with backoff from WRITE_BEHIND_RETRY_MS,
+    # then moved to the dead-letter file after WRITE_BEHIND_MAX_ATTEMPTS
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "False") == "True"
+    WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", 50))
+    WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500))
+    WRITE_BEHIND_JOURNAL_DIR = os.getenv("WRITE_BEHIND_JOURNAL_DIR")
+    WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+    WRITE_BEHIND_RETRY_MS = int(os.getenv("WRITE_BEHIND_RETRY_MS", 500))
+
+    # Password hashing: bcrypt cost, and the pool that keeps it off the request threads.
+    # Hashes at another cost (or legacy pbkdf2 ones) are upgraded on the next login.
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0)) or None
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+    # Login throttle: attempts allowed per username and per client IP within the window.
+    # Set LOGIN_THROTTLE_PATH to share the counters across workers through a SQLite file.
+    # Behind reverse proxies, set PROXY_FIX_X_FOR to their number so the client IP is
+    # read from X-Forwarded-For; otherwise every client shares the proxy's IP bucket.
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    LOGIN_THROTTLE_ENABLED = os.getenv("LOGIN_THROTTLE_ENABLED", "True") == "True"
+    LOGIN_THROTTLE_USER_LIMIT = int(os.getenv("LOGIN_THROTTLE_USER_LIMIT", 5))
+    LOGIN_THROTTLE_IP_LIMIT = int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", 20))
+    LOGIN_THROTTLE_WINDOW = int(os.getenv("LOGIN_THROTTLE_WINDOW", 300))
+    LOGIN_THROTTLE_PATH = os.getenv("LOGIN_THROTTLE_PATH")
 
     # Mail Configuration
     MAIL_SERVER = os.getenv("MAIL_SERVER")
@@ -30,3 +83,14 @@ class Config:
         os.getenv("MAIL_DEFAULT_EMAIL"),
     )
     MAIL_DEBUG = True
+
+    # Mail outbox: queued messages are sent in batches over one SMTP connection,
+    # retried with exponential backoff, and given up after MAIL_OUTBOX_MAX_ATTEMPTS.
+    # The in-app worker starts with the first request; leave it off to send from cron
+    # or a dedicated process with `flask send-outbox`
+    MAIL_OUTBOX_WORKER_ENABLED = os.getenv("MAIL_OUTBOX_WORKER_ENABLED", "False") == "True"
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", 50))
+    MAIL_OUTBOX_POLL_SECONDS = int(os.getenv("MAIL_OUTBOX_POLL_SECONDS", 5))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", 6))
+    MAIL_OUTBOX_RETRY_SECONDS = int(os.getenv("MAIL_OUTBOX_RETRY_SECONDS", 30))
+    MAIL_OUTBOX_LEASE_SECONDS = int(os.getenv("MAIL_OUTBOX_LEASE_SECONDS", 300))
@@ -1,6 +1,7 @@
-from flask import redirect, url_for
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager
+import time
+
+from flask import current_app, redirect, url_for
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt, set_access_cookies
 from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 from flask_talisman import Talisman
@@ -8,7 +9,6 @@ from itsdangerous import URLSafeTimedSerializer
 
 # Initialize extensions
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 jwt = JWTManager()
 mail = Mail()
 talisman = Talisman()
@@ -16,7 +16,6 @@ talisman = Talisman()
 
 def init_extensions(app):
     db.init_app(app)
-    bcrypt.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
 
@@ -49,6 +48,36 @@ def init_extensions(app):
     def user_identity_lookup(identity):
         return str(identity)
 
+    init_token_refresh(app)
+
+
+def refresh_expiring_token(response):
+    """Reissue the access cookie when the request's token is close to expiring.
+
+    Only requests that verified a token are considered, and only tokens with
+    less than ``JWT_REFRESH_WINDOW`` seconds left are reissued, so most
+    responses carry no new cookie. Responses that already set or clear the
+    cookie themselves (login, logout) are left alone.
+    """
+    try:
+        claims = get_jwt()
+    except RuntimeError:  # no @jwt_required on this request
+        return response
+    expires_at = claims.get("exp")
+    if expires_at is None or claims.get("type") != "access":
+        return response
+    if expires_at - time.time() > current_app.config.get("JWT_REFRESH_WINDOW", 300):
+        return response
+    cookie_name = current_app.config["JWT_ACCESS_COOKIE_NAME"] + "="
+    if any(cookie.startswith(cookie_name) for cookie in response.headers.getlist("Set-Cookie")):
+        return response
+    set_access_cookies(response, create_access_token(identity=claims["sub"]))
+    return response
+
+
+def init_token_refresh(app):
+    app.after_request(refresh_expiring_token)
+
 
 def init_security(app):
     # Enable Talisman security headers
@@ -1,6 +1,23 @@
 from .achievement import Achievement
+from .checkpoint import JobCheckpoint
 from .constants import EXERCISE_RANKS
 from .exercise import Exercise
+from .idempotency import IdempotencyKey
+from .outbox import OutboxMessage
+from .rollup import ExerciseRollup, PointsRollup, UserExerciseTotal
+from .streak import UserStreak
 from .user import User
 
-__all__ = ["User", "Exercise", "Achievement", "EXERCISE_RANKS"]
+__all__ = [
+    "User",
+    "Exercise",
+    "Achievement",
+    "PointsRollup",
+    "ExerciseRollup",
+    "UserExerciseTotal",
+    "IdempotencyKey",
+    "JobCheckpoint",
+    "OutboxMessage",
+    "UserStreak",
+    "EXERCISE_RANKS",
+]
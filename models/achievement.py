@@ -4,6 +4,8 @@ from extensions import db
 
 
 class Achievement(db.Model):
+    __table_args__ = (db.UniqueConstraint("user_id", "name", name="uq_achievement_user_name"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     name = db.Column(db.String(100), nullable=False)
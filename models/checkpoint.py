@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from extensions import db
+
+
+class JobCheckpoint(db.Model):
+    """Last position a resumable job or journal has durably processed, by name."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)
+    position = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JobCheckpoint {self.name}={self.position}>"
@@ -1,3 +1,45 @@
+# Points awarded per unit (rep, second or minute) of each exercise type
+EXERCISE_MULTIPLIERS = {
+    "pushup": 0.5,
+    "situp": 0.3,
+    "squat": 0.4,
+    "pullup": 1.0,
+    "burpee": 1.5,
+    "plank": 0.1,
+    "run": 2.0,
+}
+
+# Overall rank tiers by total exercise points
+USER_RANKS = [
+    (1000, "Master"),
+    (700, "Ruby"),
+    (400, "Diamond"),
+    (200, "Silver"),
+    (0, "Bronze"),
+]
+
+# Points-based achievements, unlocked when a user's total reaches the threshold
+ACHIEVEMENT_TIERS = {
+    "Beginner": 100,
+    "Intermediate": 500,
+    "Advanced": 1000,
+    "Expert": 5000,
+    "Master": 10000,
+}
+
+# Achievements for consecutive days with any exercise: name -> days in a row
+STREAK_ACHIEVEMENTS = {
+    "On a Roll": 3,
+    "Consistent": 7,
+    "Habit Formed": 30,
+}
+
+# Achievements for active days within one calendar week: name -> days
+WEEKLY_SESSION_ACHIEVEMENTS = {
+    "Regular": 3,
+    "Dedicated": 5,
+}
+
 EXERCISE_RANKS = {
     "pushup": [
         (2000, "Mythic"),
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from extensions import db
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request made with an Idempotency-Key header.
+
+    Keys are stored as SHA-256 digests so rows stay small whatever clients
+    send. A row with no ``status_code`` marks a request still in progress.
+    """
+
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "key_hash", name="uq_idempotency_key_user_key"),
+        db.Index("ix_idempotency_key_expires_at", "expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    key_hash = db.Column(db.String(64), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<IdempotencyKey user={self.user_id} {self.key_hash[:8]}>"
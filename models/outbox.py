@@ -0,0 +1,37 @@
+import json
+from datetime import datetime
+
+from extensions import db
+
+
+class OutboxMessage(db.Model):
+    """An email waiting to be sent, written in the same transaction as the change it reports.
+
+    ``next_attempt_at`` doubles as the claim lease: a sender pushes it forward
+    while it holds the message, so a sender that dies mid-batch only delays
+    delivery until the lease runs out.
+    """
+
+    __tablename__ = "outbox_message"
+    __table_args__ = (db.Index("ix_outbox_message_due", "status", "next_attempt_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)
+    sender = db.Column(db.String(255))
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claim_token = db.Column(db.String(32))
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    @property
+    def recipient_list(self):
+        return json.loads(self.recipients)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.status} attempts={self.attempts}>"
@@ -0,0 +1,64 @@
+from extensions import db
+
+
+class PointsRollup(db.Model):
+    """Points a user earned in one day, week or month, maintained at write time."""
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "period", "period_start", "user_id", name="uq_points_rollup_period_user"
+        ),
+        db.Index("ix_points_rollup_period_points", "period", "period_start", "points", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    period = db.Column(db.String(10), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    points = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PointsRollup {self.period} {self.period_start} user={self.user_id}>"
+
+
+class UserExerciseTotal(db.Model):
+    """Running count per user and exercise type, maintained at write time."""
+
+    __tablename__ = "user_exercise_totals"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "exercise_type", name="uq_user_exercise_totals_user_type"),
+        db.Index("ix_user_exercise_totals_type_total", "exercise_type", "total", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    exercise_type = db.Column(db.String(20), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UserExerciseTotal {self.exercise_type} user={self.user_id} total={self.total}>"
+
+
+class ExerciseRollup(db.Model):
+    """Per-user, per-type exercise count for one day, week or month, maintained at write time."""
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "user_id",
+            "exercise_type",
+            "period",
+            "period_start",
+            name="uq_exercise_rollup_user_type_period",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    exercise_type = db.Column(db.String(20), nullable=False)
+    period = db.Column(db.String(10), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    points = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ExerciseRollup {self.exercise_type} {self.period} {self.period_start}>"
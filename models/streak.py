@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from extensions import db
+
+ONE_DAY = timedelta(days=1)
+
+
+class UserStreak(db.Model):
+    """Consecutive-day activity streaks, maintained incrementally as exercises are logged.
+
+    Besides the run ending at ``last_day``, the run just before it is kept
+    (``prev_end``/``prev_length``), so an entry backdated into the gap between
+    the two can join them without reading any history.
+    """
+
+    __tablename__ = "user_streak"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    last_day = db.Column(db.Date, nullable=False)
+    current = db.Column(db.Integer, nullable=False, default=1)
+    longest = db.Column(db.Integer, nullable=False, default=1)
+    prev_end = db.Column(db.Date)
+    prev_length = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def current_start(self):
+        return self.last_day - timedelta(days=self.current - 1)
+
+    def add_day(self, day):
+        """Record activity on ``day``; O(1) for days at most two before ``last_day``.
+
+        Older days may fall before the run that ``prev_end`` describes, so
+        callers rebuild the streak from the rollups instead.
+        """
+        if day > self.last_day:
+            if day == self.last_day + ONE_DAY:
+                self.current += 1
+            else:
+                self.prev_end, self.prev_length = self.last_day, self.current
+                self.current = 1
+            self.last_day = day
+        elif day >= self.current_start:
+            return
+        elif day == self.current_start - ONE_DAY:
+            self.current += 1
+            if self.prev_end == day - ONE_DAY:
+                # The day bridges the gap: the previous run joins the current one
+                self.current += self.prev_length
+                self.prev_end, self.prev_length = None, 0
+        elif self.prev_end is not None and day <= self.prev_end:
+            return
+        elif self.prev_end is not None and day == self.prev_end + ONE_DAY:
+            self.prev_end += ONE_DAY
+            self.prev_length += 1
+        else:
+            self.prev_end, self.prev_length = day, 1
+        self.longest = max(self.longest, self.current, self.prev_length)
+
+    def current_streak(self, today):
+        """Return the running streak, or 0 once a full day has passed without activity."""
+        return self.current if self.last_day >= today - ONE_DAY else 0
+
+    def __repr__(self):
+        return f"<UserStreak user={self.user_id} current={self.current} longest={self.longest}>"
@@ -1,9 +1,11 @@
 from datetime import datetime
 
-from extensions import bcrypt, db
+from extensions import db
 
 
 class User(db.Model):
+    __table_args__ = (db.Index("ix_user_exercise_points_id", "exercise_points", "id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -16,48 +18,28 @@ class User(db.Model):
     achievements = db.relationship("Achievement", back_populates="user", lazy=True)
 
     def set_password(self, pw):
-        self.password_hash = bcrypt.generate_password_hash(pw).decode()
+        from utils.passwords import hash_password
+
+        self.password_hash = hash_password(pw)
 
     def check_password(self, pw):
-        return bcrypt.check_password_hash(self.password_hash, pw)
+        """Check the password, upgrading an outdated hash in place when it matches."""
+        from utils.passwords import verify_password
+
+        return verify_password(self, pw)
 
     def get_rank(self):
-        pts = self.exercise_points
-        if pts >= 1000:
-            return "Master"
-        if pts >= 700:
-            return "Ruby"
-        if pts >= 400:
-            return "Diamond"
-        if pts >= 200:
-            return "Silver"
-        return "Bronze"
+        from utils.scoring import scoring
+
+        return scoring.user_rank(self.exercise_points or 0)
 
     def calculate_achievements(self):
-        """Calculate and update user achievements based on exercise history"""
-        from models import Achievement
-
-        # Example achievement thresholds
-        achievement_thresholds = {
-            "Beginner": 100,
-            "Intermediate": 500,
-            "Advanced": 1000,
-            "Expert": 5000,
-            "Master": 10000,
-        }
-
-        # Check points-based achievements
-        for name, threshold in achievement_thresholds.items():
-            if self.exercise_points >= threshold:
-                # Check if achievement already exists
-                existing = Achievement.query.filter_by(user_id=self.id, name=name).first()
-
-                if not existing:
-                    achievement = Achievement(
-                        user_id=self.id,
-                        name=name,
-                        description=f"Earned {threshold} exercise points",
-                    )
-                    db.session.add(achievement)
+        """Calculate and update user achievements from the maintained aggregates.
+
+        Achievements are normally unlocked at write time by the rules in
+        ``utils.achievements``; this is a per-user repair.
+        """
+        from utils.achievements import recompute_achievements
 
+        recompute_achievements(self.id - 1, self.id)
         db.session.commit()
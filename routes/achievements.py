@@ -1,6 +1,7 @@
-from flask import make_response, redirect, render_template
-from flask_jwt_extended import create_access_token, jwt_required
+from flask import redirect, render_template
+from flask_jwt_extended import jwt_required
 
+from models.constants import ACHIEVEMENT_TIERS
 from utils.helpers import get_current_user
 
 from . import achievements_bp
@@ -13,18 +14,7 @@ def achievements():
     if not user:
         return redirect("/auth/login")
 
-    # Calculate achievements and progress
-    user.calculate_achievements()
-
-    # Define achievement tiers and their point requirements
-    achievement_tiers = {
-        "Beginner": 100,
-        "Intermediate": 500,
-        "Advanced": 1000,
-        "Expert": 5000,
-        "Master": 10000,
-    }
-
+    # Achievements are unlocked when points change, so this page only reads them.
     # Calculate current tier and progress
     current_points = user.exercise_points
     current_tier = None
@@ -33,7 +23,7 @@ def achievements():
 
     # Find current and next tier
     previous_threshold = 0
-    for tier, threshold in achievement_tiers.items():
+    for tier, threshold in ACHIEVEMENT_TIERS.items():
         if current_points < threshold:
             next_tier = {"name": tier, "threshold": threshold}
             if current_tier:
@@ -54,28 +44,16 @@ def achievements():
             "name": a.name,
             "description": a.description,
             "unlocked_at": a.unlocked_at,
-            "threshold": achievement_tiers.get(a.name, 0),
+            "threshold": ACHIEVEMENT_TIERS.get(a.name, 0),
         }
         for a in user.achievements
     ]
 
-    response = make_response(
-        render_template(
-            "achievements.html",
-            user=user,
-            achievements=achievements_data,
-            current_tier=current_tier,
-            next_tier=next_tier,
-            progress=progress,
-        )
-    )
-    new_token = create_access_token(identity=user.id)
-    response.set_cookie(
-        "access_token_cookie",
-        new_token,
-        httponly=True,
-        secure=True,
-        samesite="Lax",
-        max_age=900,  # 15 minutes
+    return render_template(
+        "achievements.html",
+        user=user,
+        achievements=achievements_data,
+        current_tier=current_tier,
+        next_tier=next_tier,
+        progress=progress,
     )
-    return response
@@ -1,8 +1,9 @@
 from flask import jsonify, request
 from flask_jwt_extended import create_access_token
 
-from extensions import bcrypt
+from extensions import db
 from models import User
+from utils.login_throttle import check_login_attempt, login_succeeded
 
 from . import api_v1
 
@@ -14,9 +15,19 @@ def get_token():
     if not all(k in data for k in ("username", "password")):
         return jsonify({"code": 400, "message": "Missing username or password"}), 400
 
+    retry_after = check_login_attempt(data["username"])
+    if retry_after:
+        return (
+            jsonify({"code": 429, "message": "Too many login attempts"}),
+            429,
+            {"Retry-After": str(retry_after)},
+        )
+
     user = User.query.filter_by(username=data["username"]).first()
 
-    if user and bcrypt.check_password_hash(user.password, data["password"]):
+    if user and user.check_password(data["password"]):
+        db.session.commit()  # persists an upgraded hash
+        login_succeeded(data["username"])
         access_token = create_access_token(identity=user.id)
         return jsonify({"access_token": access_token, "token_type": "Bearer"})
 
@@ -1,9 +1,21 @@
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from models import Exercise, User
+from models import Exercise
 from extensions import db
+from utils.exercise_import import (
+    IMPORT_FORMATS,
+    detect_format,
+    import_exercises,
+    iter_rows,
+    validate_entry,
+)
+from utils.exercise_log import log_exercise, log_exercises
+from utils.helpers import get_current_user
+from utils.idempotency import idempotent
+from utils.scoring import scoring
+from utils.stats import GRANULARITIES, exercise_series
+from utils.write_behind import get_write_behind
 from . import api_v1
 import logging
 
@@ -11,20 +23,13 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-EXERCISE_MULTIPLIERS = {
-    "pushup": 0.5,
-    "situp": 0.3,
-    "squat": 0.4,
-    "pullup": 1.0,
-    "burpee": 1.5,
-    "plank": 0.1,
-    "run": 2.0,
-}
+# Largest number of entries accepted by POST /exercises/batch
+MAX_BATCH_SIZE = 5000
 
 
 def validate_exercise_type(exercise_type):
     """Validate exercise type and return error response if invalid."""
-    if exercise_type not in EXERCISE_MULTIPLIERS:
+    if not scoring.is_valid_type(exercise_type):
         return jsonify({"code": 400, "message": "Invalid exercise type"}), 400
     return None
 
@@ -64,7 +69,7 @@ def serialize_exercise(exercise):
 
 def calculate_points(exercise_type, count):
     """Calculate points for an exercise."""
-    return round(EXERCISE_MULTIPLIERS[exercise_type] * count)
+    return scoring.points(exercise_type, count)
 
 
 @api_v1.route("/exercises", methods=["GET"])
@@ -99,6 +104,7 @@ def list_exercises():
 
 @api_v1.route("/exercises", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_exercise():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -119,21 +125,40 @@ def create_exercise():
         # logger.error(f"Invalid date: {data['date']}")
         return exercise_date
 
-    points = calculate_points(data["type"], data["count"])
-    exercise = Exercise(
-        user_id=user_id,
-        exercise_type=data["type"],
-        count=data["count"],
-        intensity=data.get("intensity", 1.0),
-        points=points,
-        date_added=datetime.combine(exercise_date, datetime.min.time()),
-    )
-
-    user = User.query.get(user_id)
-    user.exercise_points += points
+    # Count and intensity are checked here too, so a queued write cannot fail later
+    today = datetime.now().date()
+    entry, error = validate_entry(data, today, today - timedelta(days=2))
+    if error:
+        return jsonify({"code": 400, "message": error}), 400
+
+    entry["points"] = calculate_points(entry["exercise_type"], entry["count"])
+    queue = get_write_behind()
+    if queue is not None:
+        queue.submit(int(user_id), entry)
+        return (
+            jsonify(
+                {
+                    "status": "queued",
+                    "type": entry["exercise_type"],
+                    "count": entry["count"],
+                    "points": entry["points"],
+                    "date": entry["date_added"].isoformat(),
+                }
+            ),
+            202,
+        )
 
-    db.session.add(exercise)
-    db.session.commit()
+    user = get_current_user()
+    exercise = log_exercise(
+        user,
+        entry["exercise_type"],
+        entry["count"],
+        entry["points"],
+        entry["date_added"],
+        intensity=entry["intensity"],
+    )
+    # Committed by @idempotent together with any stored response
+    db.session.flush()
     
     # logger.info(
     #     f"Successfully saved exercise: type={data['type']}, "
@@ -142,66 +167,125 @@ def create_exercise():
     return jsonify(serialize_exercise(exercise)), 201
 
 
+@api_v1.route("/exercises/batch", methods=["POST"])
+@jwt_required()
+@idempotent
+def create_exercises_batch():
+    data = request.get_json(silent=True)
+    items = data.get("exercises") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"code": 400, "message": "Expected a non-empty list of exercises"}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return (
+            jsonify({"code": 413, "message": f"At most {MAX_BATCH_SIZE} exercises per batch"}),
+            413,
+        )
+
+    user = get_current_user()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
+
+    today = datetime.now().date()
+    results = []
+    entries = []
+    for index, item in enumerate(items):
+        entry, error = validate_entry(item, today, today - timedelta(days=2))
+        if error:
+            results.append({"index": index, "status": "error", "message": error})
+        else:
+            results.append({"index": index, "status": "created"})
+            entries.append(entry)
+
+    points = scoring.score_batch(
+        [entry["exercise_type"] for entry in entries], [entry["count"] for entry in entries]
+    )
+    for entry, entry_points in zip(entries, points):
+        entry["points"] = entry_points
+
+    ids = log_exercises(user, entries)
+    db.session.flush()
+
+    created = iter(zip(ids, points))
+    for result in results:
+        if result["status"] == "created":
+            result["id"], result["points"] = next(created)
+
+    return (
+        jsonify(
+            {
+                "created": len(entries),
+                "failed": len(items) - len(entries),
+                "points": sum(points),
+                "results": results,
+            }
+        ),
+        201 if entries else 400,
+    )
+
+
+@api_v1.route("/exercises/import", methods=["POST"])
+@jwt_required()
+def import_exercise_history():
+    """Import historical exercises from a CSV or NDJSON upload, streamed in chunks."""
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename
+    else:
+        stream, filename = request.stream, ""
+    fmt = request.args.get("format") or detect_format(filename, request.mimetype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"code": 400, "message": "Format must be csv or ndjson"}), 400
+
+    user = get_current_user()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
+
+    report = import_exercises(user, iter_rows(stream, fmt))
+    # A truncated import is an error even though the rows before the break were saved
+    return jsonify(report), 201 if report["imported"] and report["complete"] else 400
+
+
+def parse_stats_args():
+    """Read ``days`` and ``granularity``; return an error response if invalid."""
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return None, None, (jsonify({"code": 400, "message": "Invalid granularity"}), 400)
+    try:
+        days = int(request.args.get("days", 30))
+    except ValueError:
+        return None, None, (jsonify({"code": 400, "message": "Invalid days"}), 400)
+    return days, granularity, None
+
+
+@api_v1.route("/exercises/stats", methods=["GET"])
+@jwt_required()
+def get_exercises_stats():
+    """Counts for several exercise types from the rollup table, in columnar form."""
+    types_arg = request.args.get("types")
+    exercise_types = types_arg.split(",") if types_arg else list(scoring.multipliers)
+    for exercise_type in exercise_types:
+        error_response = validate_exercise_type(exercise_type)
+        if error_response:
+            return error_response
+
+    days, granularity, error_response = parse_stats_args()
+    if error_response:
+        return error_response
+
+    dates, series = exercise_series(get_jwt_identity(), exercise_types, days, granularity)
+    return jsonify({"dates": dates, "series": series, "granularity": granularity})
+
+
 @api_v1.route("/exercises/<exercise_type>/stats", methods=["GET"])
 @jwt_required()
 def get_exercise_stats(exercise_type):
-    # logger.info(f"Fetching stats for exercise type: {exercise_type}")
-    
     error_response = validate_exercise_type(exercise_type)
     if error_response:
-        # logger.error(f"Invalid exercise type: {exercise_type}")
         return error_response
 
-    user_id = get_jwt_identity()
-    days = int(request.args.get("days", 30))
-
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # logger.info(f"Querying exercises from {start_date} to {end_date}")
-
-    # Get exercise stats from database
-    stats = (
-        db.session.query(
-            func.date(Exercise.date_added).label("date"),
-            func.sum(Exercise.count).label("count"),
-        )
-        .filter(
-            Exercise.user_id == user_id,
-            Exercise.exercise_type == exercise_type,
-            Exercise.date_added >= start_date,
-            Exercise.date_added <= end_date,
-        )
-        .group_by(func.date(Exercise.date_added))
-        .order_by(func.date(Exercise.date_added))
-        .all()
-    )
-    
-    # logger.info(f"Raw stats from database: {[(str(s.date), s.count) for s in stats]}")
+    days, granularity, error_response = parse_stats_args()
+    if error_response:
+        return error_response
 
-    # Fill in missing dates with zero counts
-    date_range = []
-    counts = []
-    current_date = start_date.date()
-    
-    # Create dictionary with string dates (they're already strings from the query)
-    stats_dict = {str(stat.date): stat.count for stat in stats}
-    
-    # logger.info("Processing stats:")
-    # logger.info(f"Stats dictionary with formatted dates: {stats_dict}")
-
-    while current_date <= end_date.date():
-        date_str = current_date.strftime("%Y-%m-%d")
-        count = stats_dict.get(date_str, 0)
-        found_in_dict = date_str in stats_dict
-        logger.info(f"Processing date {date_str}: found in dict: {found_in_dict}, count = {count}")
-        date_range.append(date_str)
-        counts.append(count)
-        current_date += timedelta(days=1)
-
-    # logger.info("Final processed data:")
-    # logger.info(f"Dates: {date_range}")
-    # logger.info(f"Counts: {counts}")
-    # logger.info(f"Non-zero counts: {[c for c in counts if c != 0]}")
-
-    return jsonify({"dates": date_range, "counts": counts})
+    dates, series = exercise_series(get_jwt_identity(), [exercise_type], days, granularity)
+    return jsonify({"dates": dates, "counts": series[exercise_type], "granularity": granularity})
@@ -1,40 +1,183 @@
+import math
+
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required
+from sqlalchemy import tuple_
 
 from models import User
+from utils.helpers import get_current_user_summary
+from utils.leaderboard import (
+    WINDOWS,
+    cached_window_count,
+    cached_window_top,
+    exercise_rank,
+    exercise_top,
+    exercise_total,
+    leaderboard_order,
+    users_around,
+    window_count,
+    window_top,
+)
+from utils.pagination import decode_cursor, encode_cursor
+from utils.scoring import scoring
 
 from . import api_v1
 
+MAX_PER_PAGE = 100
+MAX_RADIUS = 25
+
+
+def serialize_leaderboard_entry(rank, user, points=None):
+    """Serialize a leaderboard row; ``points`` defaults to the all-time total."""
+    return {
+        "rank": rank,
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "exercise_points": user.exercise_points,
+        },
+        "points": user.exercise_points if points is None else points,
+    }
+
+
+def get_leaderboard_by_cursor(cursor, per_page):
+    """Keyset page: seeks past the cursor position instead of using OFFSET."""
+    query = User.query.order_by(*leaderboard_order())
+    served = 0
+    if cursor:
+        try:
+            position = decode_cursor(cursor, required=("p", "i", "n"))
+        except ValueError:
+            return jsonify({"code": 400, "message": "Invalid cursor"}), 400
+        query = query.filter(
+            tuple_(User.exercise_points, User.id) < tuple_(position["p"], position["i"])
+        )
+        served = position["n"]
+
+    users = query.limit(per_page + 1).all()
+    has_more = len(users) > per_page
+    users = users[:per_page]
+
+    next_cursor = None
+    if has_more:
+        last = users[-1]
+        next_cursor = encode_cursor(p=last.exercise_points, i=last.id, n=served + len(users))
+
+    pagination = {"per_page": per_page, "next_cursor": next_cursor}
+    if request.args.get("include_total", "").lower() in ("1", "true"):
+        pagination["total_items"] = User.query.count()
+
+    return jsonify(
+        {
+            "items": [
+                serialize_leaderboard_entry(served + idx + 1, user)
+                for idx, user in enumerate(users)
+            ],
+            "pagination": pagination,
+        }
+    )
+
 
 @api_v1.route("/leaderboard", methods=["GET"])
 @jwt_required()
 def get_leaderboard():
     page = int(request.args.get("page", 1))
     per_page = int(request.args.get("per_page", 20))
+    window = request.args.get("window", "all")
+    if window not in WINDOWS:
+        return jsonify({"code": 400, "message": "Invalid window"}), 400
 
-    pagination = User.query.order_by(User.exercise_points.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    if "cursor" in request.args:
+        if window != "all":
+            return (
+                jsonify(
+                    {
+                        "code": 400,
+                        "message": "Cursor pagination is only available for the all-time window",
+                    }
+                ),
+                400,
+            )
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        return get_leaderboard_by_cursor(request.args["cursor"], per_page)
+
+    if page < 1 or per_page < 1:
+        return jsonify({"code": 400, "message": "Invalid pagination parameters"}), 400
+
+    offset = (page - 1) * per_page
+    if offset == 0:
+        entries = cached_window_top(window, per_page)
+        total = cached_window_count(window)
+    else:
+        entries = window_top(window, per_page, offset=offset)
+        total = window_count(window)
 
     return jsonify(
         {
             "items": [
-                {
-                    "rank": (page - 1) * per_page + idx + 1,
-                    "user": {
-                        "id": user.id,
-                        "username": user.username,
-                        "exercise_points": user.exercise_points,
-                    },
-                    "points": user.exercise_points,
-                }
-                for idx, user in enumerate(pagination.items)
+                serialize_leaderboard_entry(offset + idx + 1, user, points)
+                for idx, (user, points) in enumerate(entries)
             ],
             "pagination": {
                 "page": page,
                 "per_page": per_page,
-                "total_pages": pagination.pages,
-                "total_items": pagination.total,
+                "total_pages": math.ceil(total / per_page),
+                "total_items": total,
+                "window": window,
             },
         }
     )
+
+
+@api_v1.route("/leaderboard/exercises/<exercise_type>", methods=["GET"])
+@jwt_required()
+def get_exercise_leaderboard(exercise_type):
+    if exercise_type not in scoring.exercise_tables:
+        return jsonify({"code": 400, "message": "Invalid exercise type"}), 400
+
+    limit = min(max(int(request.args.get("limit", 20)), 1), MAX_PER_PAGE)
+    user = get_current_user_summary()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
+    total = exercise_total(user, exercise_type)
+
+    return jsonify(
+        {
+            "exercise_type": exercise_type,
+            "items": [
+                {
+                    "rank": idx + 1,
+                    "user": {"id": player.id, "username": player.username},
+                    "total": player_total,
+                    "tier": scoring.exercise_rank(exercise_type, player_total),
+                }
+                for idx, (player, player_total) in enumerate(exercise_top(exercise_type, limit))
+            ],
+            "me": {
+                "rank": exercise_rank(user, exercise_type),
+                "total": total,
+                "tier": scoring.exercise_rank(exercise_type, total),
+            },
+        }
+    )
+
+
+@api_v1.route("/leaderboard/around-me", methods=["GET"])
+@jwt_required()
+def get_leaderboard_around_me():
+    radius = min(max(int(request.args.get("radius", 5)), 1), MAX_RADIUS)
+    user = get_current_user_summary()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
+
+    position, above, below = users_around(user, radius)
+
+    items = [
+        serialize_leaderboard_entry(position - len(above) + idx, player)
+        for idx, player in enumerate(above)
+    ]
+    items.append(serialize_leaderboard_entry(position, user))
+    items.extend(
+        serialize_leaderboard_entry(position + idx + 1, player) for idx, player in enumerate(below)
+    )
+    return jsonify({"rank": position, "radius": radius, "items": items})
@@ -0,0 +1,33 @@
+from flask import jsonify
+from flask_jwt_extended import jwt_required
+
+from utils.leaderboard import get_leaderboard_cache
+from utils.login_throttle import get_login_throttle
+from utils.outbox import get_mail_outbox, outbox_stats
+from utils.passwords import get_password_hasher
+from utils.user_cache import get_user_cache
+from utils.write_behind import get_write_behind
+
+from . import api_v1
+
+
+@api_v1.route("/metrics", methods=["GET"])
+@jwt_required()
+def get_metrics():
+    """Runtime counters for this worker process."""
+    queue = get_write_behind()
+    throttle = get_login_throttle()
+    user_cache = get_user_cache()
+    outbox = get_mail_outbox()
+    return jsonify(
+        {
+            "leaderboard_cache": get_leaderboard_cache().stats(),
+            "write_behind": queue.stats() if queue is not None else None,
+            "password_hasher": get_password_hasher().stats(),
+            "login_throttle": throttle.stats() if throttle is not None else None,
+            "user_cache": user_cache.stats() if user_cache is not None else None,
+            "mail_outbox": dict(
+                outbox_stats(), worker=outbox.stats() if outbox is not None else None
+            ),
+        }
+    )
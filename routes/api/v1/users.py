@@ -1,8 +1,11 @@
 from flask import jsonify, request
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import jwt_required
 
-from extensions import bcrypt, db
+from extensions import db
 from models import User
+from utils.helpers import get_current_user as load_current_user
+from utils.passwords import hash_password
+from utils.streaks import streak_summary
 
 from . import api_v1
 
@@ -20,8 +23,11 @@ def create_user():
     if User.query.filter_by(email=data["email"]).first():
         return jsonify({"code": 400, "message": "Email already exists"}), 400
 
-    hashed_password = bcrypt.generate_password_hash(data["password"]).decode("utf-8")
-    user = User(username=data["username"], email=data["email"], password=hashed_password)
+    user = User(
+        username=data["username"],
+        email=data["email"],
+        password_hash=hash_password(data["password"]),
+    )
 
     db.session.add(user)
     db.session.commit()
@@ -43,8 +49,9 @@ def create_user():
 @api_v1.route("/users/me", methods=["GET"])
 @jwt_required()
 def get_current_user():
-    user_id = get_jwt_identity()
-    user = User.query.get_or_404(user_id)
+    user = load_current_user()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
 
     return jsonify(
         {
@@ -52,6 +59,7 @@ def get_current_user():
             "username": user.username,
             "email": user.email,
             "exercise_points": user.exercise_points,
+            "streak": streak_summary(user.id),
             "achievements": [
                 {
                     "id": a.id,
@@ -68,8 +76,9 @@ def get_current_user():
 @api_v1.route("/users/me/achievements", methods=["GET"])
 @jwt_required()
 def get_user_achievements():
-    user_id = get_jwt_identity()
-    user = User.query.get_or_404(user_id)
+    user = load_current_user()
+    if not user:
+        return jsonify({"code": 404, "message": "User not found"}), 404
 
     return jsonify(
         [
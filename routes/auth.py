@@ -1,12 +1,13 @@
 from flask import (current_app, flash, jsonify, redirect, render_template,
                    request, url_for)
 from flask_jwt_extended import create_access_token
-from flask_mail import Message
 from itsdangerous import BadSignature, SignatureExpired
-from werkzeug.security import check_password_hash, generate_password_hash
 
-from extensions import db, mail
+from extensions import db
 from models import User
+from utils.login_throttle import check_login_attempt, login_succeeded
+from utils.outbox import queue_mail
+from utils.passwords import hash_password
 from utils.validators import (sanitize_input, validate_email,
                               validate_password, validate_username)
 
@@ -77,7 +78,7 @@ def register():
         new_user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password, method="pbkdf2:sha256"),
+            password_hash=hash_password(password),
         )
 
         try:
@@ -103,12 +104,19 @@ def login():
             flash("Please provide both username and password.", "error")
             return render_template("auth.html")
 
+        retry_after = check_login_attempt(username)
+        if retry_after:
+            flash("Too many login attempts. Please try again later.", "error")
+            return render_template("auth.html"), 429, {"Retry-After": str(retry_after)}
+
         user = User.query.filter_by(username=username).first()
 
-        if user and check_password_hash(user.password, password):
+        if user and user.check_password(password):
+            db.session.commit()  # persists an upgraded hash
+            login_succeeded(username)
             # Set session or JWT token here
             flash("Login successful!", "success")
-            return redirect(url_for("dashboard.index"))
+            return redirect(url_for("dashboard.dashboard"))
 
         flash("Invalid username or password.", "error")
         return render_template("auth.html")
@@ -132,18 +140,17 @@ def register_api():
     user = User(username=username, email=email)
     user.set_password(password)
     db.session.add(user)
-    db.session.commit()
 
     token = current_app.ts.dumps(email, salt="email-confirm")
     confirm_url = url_for("auth.confirm_email", token=token, _external=True)
 
-    msg = Message("Confirm your GameFit account", recipients=[email])
-    msg.body = f"Hi {username}, confirm here:\n\n{confirm_url}"
-
-    try:
-        mail.send(msg)
-    except Exception as ex:
-        current_app.logger.error(f"Mail failed: {ex}")
+    # Sent by the outbox worker once the user is committed, never inside the request
+    queue_mail(
+        "Confirm your GameFit account",
+        [email],
+        f"Hi {username}, confirm here:\n\n{confirm_url}",
+    )
+    db.session.commit()
 
     return jsonify(success=True, message="Registered! Check your email."), 200
 
@@ -153,10 +160,21 @@ def login_api():
     data = request.get_json()
     username = data.get("username")
     password = data.get("password")
+
+    retry_after = check_login_attempt(username)
+    if retry_after:
+        return (
+            jsonify(success=False, message="Too many login attempts"),
+            429,
+            {"Retry-After": str(retry_after)},
+        )
+
     user = User.query.filter_by(username=username).first()
 
     if not user or not user.check_password(password):
         return jsonify(success=False, message="Invalid credentials"), 401
+    db.session.commit()  # persists an upgraded hash
+    login_succeeded(username)
     if not user.is_active:
         return jsonify(success=False, message="Please confirm email"), 403
 
@@ -2,12 +2,15 @@ from datetime import datetime, timedelta
 
 from flask import flash, jsonify, redirect, render_template, request
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func
 
 from extensions import db
-from models import Exercise
-from models.constants import EXERCISE_RANKS
+from models import UserExerciseTotal
+from utils.exercise_log import log_exercises
 from utils.helpers import get_current_user
+from utils.scoring import scoring
+from utils.stats import GRANULARITIES, exercise_series
+from utils.streaks import streak_summary
+from utils.write_behind import get_write_behind
 
 from . import dashboard_bp
 
@@ -60,19 +63,6 @@ def get_daily_routine():
     ]
 
 
-def get_exercise_multipliers():
-    """Return the point multipliers for each exercise type."""
-    return {
-        "pushup": 0.5,
-        "situp": 0.3,
-        "squat": 0.4,
-        "pullup": 1.0,
-        "burpee": 1.5,
-        "plank": 0.1,
-        "run": 2.0,
-    }
-
-
 def validate_exercise_date(date_str, today):
     """Validate the exercise date."""
     try:
@@ -87,45 +77,69 @@ def validate_exercise_date(date_str, today):
         return None, "Invalid date format."
 
 
-def process_exercise_submission(user, exercise_type, count, date_str):
-    """Process a single exercise submission."""
-    today = datetime.now().date()
+def build_exercise_entry(exercise_type, count, date_str, today):
+    """Validate one routine row; return ``(entry, None)`` or ``(None, message)``."""
     exercise_date, error = validate_exercise_date(date_str, today)
     if error:
-        return False, error
-
-    multipliers = get_exercise_multipliers()
-    points = round(multipliers.get(exercise_type, 0.5) * count)
-
-    exercise = Exercise(
-        user_id=user.id,
-        exercise_type=exercise_type,
-        count=count,
-        intensity=1.0,
-        points=points,
-        date_added=datetime.combine(exercise_date, datetime.min.time()),
-    )
-    user.exercise_points += points
-    db.session.add(exercise)
-    return True, None
+        return None, error
+    return {
+        "exercise_type": exercise_type,
+        "count": count,
+        "intensity": 1.0,
+        "points": scoring.points(exercise_type, count),
+        "date_added": datetime.combine(exercise_date, datetime.min.time()),
+    }, None
 
 
-def get_exercise_ranks(user, daily_routine):
-    """Compute per-exercise totals & ranks."""
-    per_ex_ranks = {}
+def parse_routine_form(form, daily_routine, today):
+    """Validate every routine row in ``form``; return ``(entries, None)`` or ``(None, message)``.
+
+    Rows with no count are skipped. Nothing is saved here, so one bad row
+    rejects the whole form.
+    """
+    entries = []
     for ex in daily_routine:
-        total = (
-            db.session.query(db.func.sum(Exercise.count))
-            .filter_by(user_id=user.id, exercise_type=ex["type"])
-            .scalar()
-            or 0
-        )
+        try:
+            count = int(form.get(ex["type"]) or 0)
+        except ValueError:
+            return None, f"Invalid count for {ex['label']}."
+        if count < 0:
+            return None, f"Invalid count for {ex['label']}."
+        if count == 0:
+            continue
+        date_str = form.get(f"{ex['type']}_date")
+        entry, error = build_exercise_entry(ex["type"], count, date_str, today)
+        if error:
+            return None, error
+        entries.append(entry)
+    return entries, None
+
+
+def save_exercise_entries(user, entries):
+    """Queue ``entries`` for write-behind, or log them in the current transaction."""
+    queue = get_write_behind()
+    if queue is not None:
+        for entry in entries:
+            queue.submit(user.id, entry)
+    else:
+        log_exercises(user, entries)
+        db.session.commit()
 
-        for thresh, name in EXERCISE_RANKS[ex["type"]]:
-            if total >= thresh:
-                per_ex_ranks[ex["type"]] = {"total": total, "rank": name}
-                break
-    return per_ex_ranks
+
+def get_exercise_ranks(user, daily_routine):
+    """Compute per-exercise totals & ranks from the maintained totals table."""
+    totals = dict(
+        db.session.query(UserExerciseTotal.exercise_type, UserExerciseTotal.total)
+        .filter(UserExerciseTotal.user_id == user.id)
+        .all()
+    )
+    exercise_types = [ex["type"] for ex in daily_routine]
+    routine_totals = [totals.get(exercise_type, 0) for exercise_type in exercise_types]
+    ranks = scoring.rank_batch(exercise_types, routine_totals)
+    return {
+        exercise_type: {"total": total, "rank": rank}
+        for exercise_type, total, rank in zip(exercise_types, routine_totals, ranks)
+    }
 
 
 @dashboard_bp.route("/api/exercise-stats/<exercise_type>")
@@ -135,39 +149,15 @@ def exercise_stats(exercise_type):
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
 
-    # Get the last 30 days of data
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-
-    # Query exercise data grouped by date
-    stats = (
-        db.session.query(
-            func.date(Exercise.date_added).label("date"),
-            func.sum(Exercise.count).label("count"),
-        )
-        .filter(
-            Exercise.user_id == user.id,
-            Exercise.exercise_type == exercise_type,
-            Exercise.date_added >= start_date,
-            Exercise.date_added <= end_date,
-        )
-        .group_by(func.date(Exercise.date_added))
-        .order_by(func.date(Exercise.date_added))
-        .all()
-    )
-
-    # Create a complete date range with zeros for missing dates
-    date_range = []
-    counts = []
-    current_date = start_date.date()
-    stats_dict = {stat.date: stat.count for stat in stats}
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": "Invalid granularity"}), 400
 
-    while current_date <= end_date.date():
-        date_range.append(current_date.strftime("%Y-%m-%d"))
-        counts.append(stats_dict.get(current_date, 0))
-        current_date += timedelta(days=1)
+    # Last 30 days by default, read from the pre-aggregated rollups
+    days = request.args.get("days", 30, type=int)
+    dates, series = exercise_series(user.id, [exercise_type], days, granularity)
 
-    return jsonify({"dates": date_range, "counts": counts})
+    return jsonify({"dates": dates, "counts": series[exercise_type]})
 
 
 @dashboard_bp.route("/", methods=["GET", "POST"]) # NOSONAR
@@ -182,22 +172,11 @@ def dashboard():
     available_dates = [today - timedelta(days=i) for i in range(2, -1, -1)]
 
     if request.method == "POST":
-        logged_any = False
-        error = None
-
-        for ex in daily_routine:
-            count = int(request.form.get(ex["type"], 0))
-            if count > 0:
-                date_str = request.form.get(f"{ex['type']}_date")
-                success, error = process_exercise_submission(user, ex["type"], count, date_str)
-                if not success:
-                    flash(error, "error")
-                    return redirect("/dashboard")
-                logged_any = True
-
-        if logged_any:
-            db.session.commit()
-            user.calculate_achievements()
+        entries, error = parse_routine_form(request.form, daily_routine, today)
+        if error:
+            flash(error, "error")
+        elif entries:
+            save_exercise_entries(user, entries)
         else:
             flash("Enter at least one exercise count.", "warning")
 
@@ -210,5 +189,6 @@ def dashboard():
         user=user,
         daily_routine=daily_routine,
         per_ex_ranks=per_ex_ranks,
+        streak=streak_summary(user.id, today),
         available_dates=available_dates,
     )
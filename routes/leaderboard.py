@@ -1,9 +1,9 @@
-from flask import make_response, redirect, render_template
-from flask_jwt_extended import create_access_token, jwt_required
-from sqlalchemy import desc
+from flask import redirect, render_template, request
+from flask_jwt_extended import jwt_required
 
-from models import User
-from utils.helpers import get_current_user
+from utils.helpers import get_current_user_summary
+from utils.leaderboard import WINDOW_LABELS, WINDOWS, cached_window_top, window_points, window_rank
+from utils.rank_index import get_user_rank
 
 from . import leaderboard_bp
 
@@ -11,24 +11,26 @@ from . import leaderboard_bp
 @leaderboard_bp.route("/")
 @jwt_required()
 def leaderboard():
-    user = get_current_user()
+    user = get_current_user_summary()
     if not user:
         return redirect("/auth")
 
-    top_players = User.query.order_by(desc(User.exercise_points)).limit(20).all()
-    all_users = User.query.order_by(desc(User.exercise_points)).all()
-    user_rank = next((i + 1 for i, u in enumerate(all_users) if u.id == user.id), 0)
+    window = request.args.get("window", "all")
+    if window not in WINDOWS:
+        window = "all"
 
-    response = make_response(
-        render_template("leaderboard.html", user=user, top_players=top_players, user_rank=user_rank)
-    )
-    new_token = create_access_token(identity=user.id)
-    response.set_cookie(
-        "access_token_cookie",
-        new_token,
-        httponly=True,
-        secure=True,
-        samesite="Lax",
-        max_age=900,  # 15 minutes
+    top_players = cached_window_top(window, 20)
+    if window == "all":
+        user_rank = get_user_rank(user)
+    else:
+        user_rank = window_rank(user, window)
+
+    return render_template(
+        "leaderboard.html",
+        user=user,
+        top_players=top_players,
+        user_rank=user_rank,
+        user_points=window_points(user, window),
+        window=window,
+        window_labels=WINDOW_LABELS,
     )
-    return response
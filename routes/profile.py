@@ -1,5 +1,5 @@
-from flask import make_response, redirect, render_template, request, current_app
-from flask_jwt_extended import create_access_token, jwt_required
+from flask import redirect, render_template, request
+from flask_jwt_extended import jwt_required
 
 from extensions import db
 from models import User
@@ -15,17 +15,7 @@ def profile():
     if not user:
         return redirect("/auth")
 
-    response = make_response(render_template("profile.html", user=user))
-    new_token = create_access_token(identity=user.id)
-    response.set_cookie(
-        current_app.config["JWT_ACCESS_COOKIE_NAME"],
-        new_token,
-        httponly=True,
-        secure=current_app.config["JWT_COOKIE_SECURE"],
-        samesite="Lax",
-        max_age=900  # 15 minutes
-    )
-    return response
+    return render_template("profile.html", user=user)
 
 
 @profile_bp.route("/edit", methods=["GET", "POST"]) # NOSONAR
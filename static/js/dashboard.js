@@ -81,27 +81,31 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Fetch exercise data and update chart
+    // Fetch every exercise type's series in one request and reuse it when switching types
+    const exerciseTypes = Array.from(exerciseSelect.options).map(option => option.value);
+    let statsRequest = null;
+
+    function loadStats() {
+        if (!statsRequest) {
+            statsRequest = fetch(`/api/v1/exercises/stats?types=${exerciseTypes.join(',')}&days=30`)
+                .then(response => response.json());
+        }
+        return statsRequest;
+    }
+
+    // Update chart from the batched stats
     function updateChart(exerciseType) {
-        console.log('Fetching stats for exercise type:', exerciseType);
-        fetch(`/api/v1/exercises/${exerciseType}/stats`)
-            .then(response => response.json())
+        loadStats()
             .then(data => {
-                console.log('Received stats data:', data);
-                // Verify the data is being processed correctly
-                console.log('Data validation:');
-                console.log('Number of dates:', data.dates.length);
-                console.log('Number of counts:', data.counts.length);
-                console.log('Sample counts:', data.counts.slice(-5));
-                
                 initChart({
                     labels: data.dates,
-                    counts: data.counts,
+                    counts: data.series[exerciseType],
                     exerciseLabel: exerciseSelect.options[exerciseSelect.selectedIndex].text
                 });
             })
             .catch(error => {
                 console.error('Error fetching exercise stats:', error);
+                statsRequest = null;
             });
     }
 
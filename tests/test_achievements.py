@@ -86,4 +86,130 @@ def test_achievements_unlocked_status(client, app):
             assert b'First Steps' in response.data
             assert b'Warming Up' in response.data
             # Check that the achievements are not marked as locked
-            assert b'locked">First Steps' not in response.data 
\ No newline at end of file
+            assert b'locked">First Steps' not in response.data 
+
+def test_achievements_unlock_on_threshold_crossing(app):
+    from extensions import db
+    from models import Achievement, User
+    from utils.exercise_log import log_exercise, log_exercises
+
+    with app.app_context():
+        user = User(username='climber', email='climber@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+
+        log_exercise(user, 'burpee', 60, 90, today)
+        db.session.commit()
+        assert Achievement.query.count() == 0
+
+        # 90 -> 600 points crosses Beginner and Intermediate in one write,
+        # and 60 -> 400 burpees crosses three burpee rank tiers
+        log_exercise(user, 'burpee', 340, 510, today)
+        db.session.commit()
+        assert sorted(a.name for a in user.achievements) == [
+            'Beginner', 'Burpee Diamond', 'Burpee Ruby', 'Burpee Silver', 'Intermediate'
+        ]
+
+        entries = [
+            {'exercise_type': 'run', 'count': 100, 'intensity': 1.0, 'points': 200,
+             'date_added': today}
+        ] * 3
+        log_exercises(user, entries)
+        db.session.commit()
+        assert user.exercise_points == 1200
+        names = {a.name for a in Achievement.query.filter_by(user_id=user.id)}
+        assert {'Advanced', 'Run Silver'} <= names
+        assert len(names) == 7
+
+
+def test_achievements_page_does_not_write(client, app):
+    mock_user = MagicMock(id=1, exercise_points=600, achievements=[])
+
+    with app.app_context():
+        client.set_cookie('access_token_cookie', create_access_token(identity=1))
+        with patch('routes.achievements.get_current_user', return_value=mock_user):
+            response = client.get('/achievements/')
+    assert response.status_code == 200
+    mock_user.calculate_achievements.assert_not_called()
+
+
+def test_streak_and_weekly_rules_read_rollups(app):
+    from datetime import timedelta
+    from extensions import db
+    from models import User
+    from utils.achievements import AchievementRule, RULES, register_rule
+    from utils.exercise_log import log_exercise
+
+    class NightOwl(AchievementRule):
+        def triggered_by(self, change):
+            return 'plank' in change.counts_by_type
+
+        def is_met(self, change):
+            return change.counts_by_type['plank'] >= 300
+
+    with app.app_context():
+        user = User(username='steady', email='steady@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        # Monday of a past week, so every day falls in one calendar week
+        monday = datetime(2024, 4, 1)
+
+        def names():
+            db.session.expire(user, ['achievements'])
+            return {a.name for a in user.achievements}
+
+        # Backdated out of order: days 0, 2, then 1 completes a 3-day run
+        for offset in (0, 2):
+            log_exercise(user, 'plank', 10, 1, monday + timedelta(days=offset))
+        db.session.commit()
+        assert 'On a Roll' not in names()
+
+        log_exercise(user, 'plank', 10, 1, monday + timedelta(days=1))
+        db.session.commit()
+        assert {'On a Roll', 'Regular'} <= names()
+        assert 'Dedicated' not in names()
+
+        for offset in (3, 4, 5, 6):
+            log_exercise(user, 'plank', 10, 1, monday + timedelta(days=offset))
+        db.session.commit()
+        assert {'Dedicated', 'Consistent'} <= names()
+
+        rule = register_rule(NightOwl('Night Owl', 'Hold a 5 minute plank'))
+        try:
+            log_exercise(user, 'plank', 300, 30, monday)
+            db.session.commit()
+        finally:
+            RULES.remove(rule)
+        assert 'Night Owl' in names()
+
+
+def test_streak_and_weekly_rules_fire_only_on_crossing(app):
+    from datetime import timedelta
+    from extensions import db
+    from models import User
+    from utils import exercise_log
+    from utils.achievements import evaluate_achievements
+
+    met = []
+
+    def record(change):
+        met.append(set(evaluate_achievements(change)) & {'On a Roll', 'Regular', 'Dedicated'})
+
+    with app.app_context(), patch.object(exercise_log, 'evaluate_achievements', record):
+        user = User(username='keeper', email='keeper@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        monday = datetime(2024, 4, 1)
+
+        for offset in (0, 1, 2, 2, 3, 4):
+            exercise_log.log_exercise(user, 'plank', 10, 1, monday + timedelta(days=offset))
+        exercise_log.log_exercises(user, [
+            {'exercise_type': 'plank', 'count': 10, 'intensity': 1.0, 'points': 1,
+             'date_added': monday + timedelta(days=offset)}
+            for offset in (4, 5)
+        ])
+        db.session.commit()
+
+    # Repeat days and already-qualifying streaks and weeks unlock nothing again
+    assert met == [set(), set(), {'On a Roll', 'Regular'}, set(), set(), {'Dedicated'}, set()]
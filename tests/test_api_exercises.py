@@ -0,0 +1,296 @@
+import io
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import IdempotencyKey, User
+from utils import idempotency
+from utils.exercise_import import INVALID_ENCODING, import_exercises, iter_rows
+from utils.exercise_log import log_exercise
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username="athlete", email="athlete@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def auth_client(client, app, user_id):
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=user_id))
+    return client
+
+
+def test_batched_stats_returns_columnar_series(auth_client, app, user_id):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        log_exercise(user, "pushup", 10, 5, today)
+        log_exercise(user, "pushup", 5, 3, today)
+        log_exercise(user, "squat", 20, 8, today - timedelta(days=1))
+        db.session.commit()
+
+    response = auth_client.get("/api/v1/exercises/stats?types=pushup,squat,plank&days=7")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data["dates"]) == 8
+    assert data["dates"][-1] == today.strftime("%Y-%m-%d")
+    assert set(data["series"]) == {"pushup", "squat", "plank"}
+    assert data["series"]["pushup"][-1] == 15
+    assert data["series"]["squat"][-2] == 20
+    assert sum(data["series"]["plank"]) == 0
+
+
+def test_batched_stats_rejects_unknown_type(auth_client):
+    response = auth_client.get("/api/v1/exercises/stats?types=pushup,yoga")
+    assert response.status_code == 400
+
+
+def test_stats_granularity_reads_rollups(auth_client, app, user_id):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        log_exercise(user, "plank", 60, 6, today)
+        log_exercise(user, "plank", 90, 9, today - timedelta(days=1))
+        db.session.commit()
+
+    data = auth_client.get("/api/v1/exercises/plank/stats?days=3650&granularity=month").get_json()
+    assert data["granularity"] == "month"
+    assert 120 <= len(data["dates"]) <= 122
+    assert data["dates"][-1] == today.replace(day=1).strftime("%Y-%m-%d")
+    assert sum(data["counts"]) == 150
+
+    data = auth_client.get("/api/v1/exercises/stats?types=plank&days=14&granularity=week")
+    assert sum(data.get_json()["series"]["plank"]) == 150
+
+    response = auth_client.get("/api/v1/exercises/plank/stats?granularity=hour")
+    assert response.status_code == 400
+
+
+def test_batch_create_applies_points_once(auth_client, app, user_id):
+    today = datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    payload = {
+        "exercises": [
+            {"type": "pushup", "count": 10, "date": today.isoformat()},
+            {"type": "yoga", "count": 10, "date": today.isoformat()},
+            {"type": "squat", "count": 20, "date": yesterday.isoformat()},
+            {"type": "pushup", "count": 4, "date": yesterday.isoformat()},
+            {"type": "run", "count": 0, "date": today.isoformat()},
+        ]
+    }
+
+    response = auth_client.post("/api/v1/exercises/batch", json=payload)
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["created"] == 3
+    assert data["failed"] == 2
+    assert data["points"] == 5 + 8 + 2
+    assert [r["status"] for r in data["results"]] == [
+        "created",
+        "error",
+        "created",
+        "created",
+        "error",
+    ]
+    assert data["results"][1]["message"] == "Invalid exercise type"
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert user.exercise_points == 15
+        assert len(user.exercises) == 3
+        assert {ex.id for ex in user.exercises} == {
+            r["id"] for r in data["results"] if r["status"] == "created"
+        }
+
+    stats = auth_client.get("/api/v1/exercises/stats?types=pushup&days=2").get_json()
+    assert stats["series"]["pushup"][-2:] == [4, 10]
+
+
+def test_batch_create_rejects_empty_and_invalid(auth_client):
+    assert auth_client.post("/api/v1/exercises/batch", json={"exercises": []}).status_code == 400
+    response = auth_client.post(
+        "/api/v1/exercises/batch", json=[{"type": "pushup", "count": 5, "date": "2000-01-01"}]
+    )
+    assert response.status_code == 400
+    assert response.get_json()["created"] == 0
+
+
+def test_import_csv_upload_and_ndjson_body(auth_client, app, user_id):
+    csv_body = b"type,count,date\npushup,10,2020-01-01\nsquat,20,2020-01-02\n"
+    response = auth_client.post(
+        "/api/v1/exercises/import",
+        data={"file": (io.BytesIO(csv_body), "export.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    assert response.get_json() == {
+        "imported": 2,
+        "failed": 0,
+        "points": 13,
+        "errors": [],
+        "complete": True,
+    }
+
+    future = (datetime.now().date() + timedelta(days=1)).isoformat()
+    ndjson_body = "\n".join(
+        [
+            json.dumps({"type": "run", "count": 5, "date": "2019-06-01"}),
+            "not json",
+            json.dumps({"type": "run", "count": 5, "date": future}),
+            "",
+        ]
+    )
+    response = auth_client.post(
+        "/api/v1/exercises/import", data=ndjson_body, content_type="application/x-ndjson"
+    )
+    data = response.get_json()
+    assert response.status_code == 201
+    assert (data["imported"], data["failed"]) == (1, 2)
+    assert data["errors"] == [
+        {"row": 2, "message": "Missing required fields"},
+        {"row": 3, "message": "Date cannot be in the future"},
+    ]
+
+    with app.app_context():
+        assert db.session.get(User, user_id).exercise_points == 23
+
+    response = auth_client.post("/api/v1/exercises/import", data="x", content_type="text/plain")
+    assert response.status_code == 400
+
+
+def test_import_reports_rows_saved_before_invalid_utf8(auth_client, app, user_id):
+    # Well past the text decoder's read size, so rows are parsed before the bad byte
+    csv_body = b"type,count,date\n" + b"pushup,1,2020-01-01\n" * 900 + b"squat,\xff,2020-01-02\n"
+    response = auth_client.post("/api/v1/exercises/import", data=csv_body, content_type="text/csv")
+    assert response.status_code == 400
+    report = response.get_json()
+    assert report["complete"] is False
+    assert 0 < report["imported"] <= 900
+    assert report["errors"] == [{"row": report["imported"] + 1, "message": INVALID_ENCODING}]
+    with app.app_context():
+        assert len(db.session.get(User, user_id).exercises) == report["imported"]
+
+
+def test_import_streams_in_bounded_memory(app, user_id):
+    rows = 5000
+
+    def export():
+        yield "type,count,date\n"
+        for i in range(rows):
+            yield f"pushup,2,20{10 + i % 10}-0{1 + i % 9}-1{i % 10}\n"
+
+    class GeneratorReader(io.TextIOBase):
+        def __init__(self, lines):
+            self._lines = lines
+
+        def __iter__(self):
+            return self._lines
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        tracemalloc.start()
+        report = import_exercises(user, iter_rows(GeneratorReader(export()), "csv"), chunk_size=250)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert report["imported"] == rows
+        assert db.session.get(User, user_id).exercise_points == rows
+    # Roughly one chunk of rows plus the session; far below the size of the input
+    assert peak < 4 * 1024 * 1024
+
+
+def test_idempotent_retry_replays_without_double_counting(auth_client, app, user_id):
+    payload = {"type": "pushup", "count": 10, "date": datetime.now().date().isoformat()}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = auth_client.post("/api/v1/exercises", json=payload, headers=headers)
+    retry = auth_client.post("/api/v1/exercises", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert user.exercise_points == 5
+        assert len(user.exercises) == 1
+
+    reused = auth_client.post("/api/v1/exercises", json=dict(payload, count=20), headers=headers)
+    assert reused.status_code == 422
+
+    other = auth_client.post("/api/v1/exercises", json=payload, headers={"Idempotency-Key": "2"})
+    assert other.status_code == 201
+    with app.app_context():
+        assert db.session.get(User, user_id).exercise_points == 10
+
+
+def test_idempotency_key_expires(auth_client, app, user_id, runner):
+    payload = {"type": "squat", "count": 5, "date": datetime.now().date().isoformat()}
+    headers = {"Idempotency-Key": "short-lived"}
+    app.config["IDEMPOTENCY_KEY_TTL"] = 0
+
+    auth_client.post("/api/v1/exercises", json=payload, headers=headers)
+    second = auth_client.post("/api/v1/exercises", json=payload, headers=headers)
+    assert "Idempotent-Replayed" not in second.headers
+    with app.app_context():
+        assert len(db.session.get(User, user_id).exercises) == 2
+
+    result = runner.invoke(args=["purge-idempotency-keys"])
+    assert "Purged 1 expired idempotency keys." in result.output
+    with app.app_context():
+        assert IdempotencyKey.query.count() == 0
+
+
+def test_request_that_loses_its_claim_is_not_applied(auth_client, app, user_id, monkeypatch):
+    payload = {"type": "pushup", "count": 10, "date": datetime.now().date().isoformat()}
+    claim = idempotency._claim
+
+    def claim_then_lose(user_id, key_hash, request_hash):
+        record, claimed = claim(user_id, key_hash, request_hash)
+        lost = SimpleNamespace(id=record.id, created_at=record.created_at)
+        # A retry reclaims the key while this request is still running
+        db.session.delete(record)
+        db.session.flush()
+        db.session.add(
+            IdempotencyKey(
+                user_id=record.user_id,
+                key_hash=record.key_hash,
+                request_hash=record.request_hash,
+                created_at=record.created_at + timedelta(seconds=61),
+                expires_at=record.expires_at,
+            )
+        )
+        db.session.commit()
+        return lost, claimed
+
+    monkeypatch.setattr(idempotency, "_claim", claim_then_lose)
+    response = auth_client.post(
+        "/api/v1/exercises", json=payload, headers={"Idempotency-Key": "slow"}
+    )
+    assert response.status_code == 409
+    with app.app_context():
+        assert db.session.get(User, user_id).exercises == []
+        assert [key.status_code for key in IdempotencyKey.query] == [None]
+
+
+def test_failed_idempotent_request_writes_nothing(auth_client, app, user_id, monkeypatch):
+    def fail_after_writing(*args, **kwargs):
+        raise RuntimeError("lost the database halfway")
+
+    monkeypatch.setattr("routes.api.v1.exercises.serialize_exercise", fail_after_writing)
+    payload = {"type": "pushup", "count": 10, "date": datetime.now().date().isoformat()}
+    with pytest.raises(RuntimeError):
+        auth_client.post("/api/v1/exercises", json=payload, headers={"Idempotency-Key": "boom"})
+    with app.app_context():
+        assert db.session.get(User, user_id).exercises == []
+        assert IdempotencyKey.query.count() == 0
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import update
+
+from extensions import db
+from models import PointsRollup, User
+from utils.exercise_log import log_exercise
+
+
+@pytest.fixture
+def ranked_users(app):
+    with app.app_context():
+        users = [
+            User(
+                username=f"player{i}",
+                email=f"player{i}@example.com",
+                password_hash="x",
+                exercise_points=pts,
+            )
+            for i, pts in enumerate([900, 700, 700, 700, 400, 100, 0])
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        return [u.id for u in users]
+
+
+@pytest.fixture
+def auth_client(client, app, ranked_users):
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=ranked_users[0]))
+    return client
+
+
+def test_leaderboard_offset_mode_unchanged(auth_client):
+    response = auth_client.get("/api/v1/leaderboard?page=2&per_page=3")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [item["rank"] for item in data["items"]] == [4, 5, 6]
+    assert data["pagination"]["total_items"] == 7
+    assert data["pagination"]["total_pages"] == 3
+
+
+def test_leaderboard_cursor_walks_all_pages(auth_client):
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = auth_client.get(f"/api/v1/leaderboard?cursor={cursor}&per_page=2")
+        assert response.status_code == 200
+        data = response.get_json()
+        assert "total_items" not in data["pagination"]
+        seen.extend((item["rank"], item["points"]) for item in data["items"])
+        cursor = data["pagination"]["next_cursor"]
+
+    assert [rank for rank, _ in seen] == list(range(1, 8))
+    assert [points for _, points in seen] == [900, 700, 700, 700, 400, 100, 0]
+
+
+def test_leaderboard_cursor_total_is_optional(auth_client):
+    response = auth_client.get("/api/v1/leaderboard?cursor=&per_page=5&include_total=true")
+    data = response.get_json()
+    assert data["pagination"]["total_items"] == 7
+    assert data["pagination"]["next_cursor"]
+
+
+def test_leaderboard_invalid_cursor(auth_client):
+    response = auth_client.get("/api/v1/leaderboard?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid cursor"
+
+
+def test_leaderboard_windows_use_rollups(auth_client, app, ranked_users):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with app.app_context():
+        first, last = db.session.get(User, ranked_users[0]), db.session.get(User, ranked_users[-1])
+        log_exercise(last, "pushup", 100, 50, today)
+        log_exercise(last, "pushup", 100, 50, today)
+        log_exercise(first, "run", 10, 20, today)
+        log_exercise(first, "run", 10, 500, today - timedelta(days=45))
+        db.session.commit()
+
+        assert PointsRollup.query.filter_by(user_id=last.id, period="day").one().points == 100
+        assert last.exercise_points == 100
+
+    response = auth_client.get("/api/v1/leaderboard?window=30d")
+    data = response.get_json()
+    assert [(item["user"]["id"], item["points"]) for item in data["items"]] == [
+        (ranked_users[-1], 100),
+        (ranked_users[0], 20),
+    ]
+    assert data["pagination"]["total_items"] == 2
+
+    response = auth_client.get("/api/v1/leaderboard?window=century")
+    assert response.status_code == 400
+
+
+def test_leaderboard_page_window_rank(auth_client, app, ranked_users):
+    with app.app_context():
+        other = db.session.get(User, ranked_users[1])
+        log_exercise(other, "burpee", 10, 15, datetime.now())
+        db.session.commit()
+
+    response = auth_client.get("/leaderboard/?window=week")
+    assert response.status_code == 200
+    assert b"player1" in response.data
+    assert b"player0" not in response.data.split(b"Your Stats")[0]
+    assert b"This Week Points" in response.data
+
+
+def test_exercise_leaderboard_ranks_by_type_total(auth_client, app, ranked_users):
+    today = datetime.now()
+    with app.app_context():
+        me, rival = db.session.get(User, ranked_users[0]), db.session.get(User, ranked_users[2])
+        log_exercise(rival, "pushup", 150, 75, today)
+        log_exercise(rival, "pushup", 100, 50, today)
+        log_exercise(me, "pushup", 120, 60, today)
+        log_exercise(me, "squat", 900, 360, today)
+        db.session.commit()
+
+    response = auth_client.get("/api/v1/leaderboard/exercises/pushup?limit=5")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [(item["user"]["id"], item["total"], item["tier"]) for item in data["items"]] == [
+        (ranked_users[2], 250, "Silver"),
+        (ranked_users[0], 120, "Bronze"),
+    ]
+    assert data["me"] == {"rank": 2, "total": 120, "tier": "Bronze"}
+
+    response = auth_client.get("/api/v1/leaderboard/exercises/cartwheel")
+    assert response.status_code == 400
+
+
+def test_exercise_leaderboard_deleted_user(client, app):
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=12345))
+
+    response = client.get("/api/v1/leaderboard/exercises/pushup")
+    assert response.status_code == 404
+    assert response.get_json()["message"] == "User not found"
+
+
+def test_leaderboard_around_me(client, app, ranked_users):
+    with app.app_context():
+        # player2 sits in the middle of the 700-point tie
+        client.set_cookie("access_token_cookie", create_access_token(identity=ranked_users[2]))
+
+    response = client.get("/api/v1/leaderboard/around-me?radius=2")
+    assert response.status_code == 200
+    data = response.get_json()
+
+    full = client.get("/api/v1/leaderboard?cursor=&per_page=100").get_json()["items"]
+    position = next(item["rank"] for item in full if item["user"]["id"] == ranked_users[2])
+    assert data["rank"] == position
+    assert [item["rank"] for item in data["items"]] == list(range(position - 2, position + 3))
+    assert [item["user"]["id"] for item in data["items"]] == [
+        item["user"]["id"] for item in full[position - 3 : position + 2]
+    ]
+
+
+def test_leaderboard_around_me_at_top(auth_client):
+    data = auth_client.get("/api/v1/leaderboard/around-me?radius=3").get_json()
+    assert data["rank"] == 1
+    assert [item["rank"] for item in data["items"]] == [1, 2, 3, 4]
+
+
+def test_leaderboard_around_me_sees_other_workers_writes(auth_client, app, ranked_users):
+    auth_client.get("/api/v1/leaderboard/around-me")
+    with app.app_context():
+        # A change committed elsewhere, never seen by this process's rank index
+        db.session.execute(
+            update(User).where(User.id == ranked_users[5]).values(exercise_points=800)
+        )
+        db.session.commit()
+
+    data = auth_client.get("/api/v1/leaderboard/around-me?radius=25").get_json()
+    assert [item["rank"] for item in data["items"]] == list(range(1, 8))
+    assert [item["points"] for item in data["items"]] == [900, 800, 700, 700, 700, 400, 0]
+
+
+def test_leaderboard_around_me_deleted_user(client, app):
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=12345))
+
+    assert client.get("/api/v1/leaderboard/around-me").status_code == 404
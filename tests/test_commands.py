@@ -0,0 +1,230 @@
+from datetime import datetime
+
+from extensions import db
+from models import (
+    Achievement,
+    Exercise,
+    ExerciseRollup,
+    JobCheckpoint,
+    PointsRollup,
+    User,
+    UserExerciseTotal,
+)
+from routes.dashboard import get_daily_routine, get_exercise_ranks
+from utils.aggregates import increment
+from utils.exercise_log import log_exercise
+
+
+def add_history(app):
+    """Insert raw exercise rows without touching the aggregates, as an old database would."""
+    with app.app_context():
+        user = User(username="veteran", email="veteran@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            [
+                Exercise(
+                    user_id=user.id,
+                    exercise_type="pushup",
+                    count=150,
+                    points=75,
+                    date_added=datetime(2024, 1, 1),
+                ),
+                Exercise(
+                    user_id=user.id,
+                    exercise_type="pushup",
+                    count=100,
+                    points=50,
+                    date_added=datetime(2024, 1, 3),
+                ),
+                Exercise(
+                    user_id=user.id,
+                    exercise_type="plank",
+                    count=600,
+                    points=60,
+                    date_added=datetime(2024, 2, 1),
+                ),
+            ]
+        )
+        db.session.commit()
+        return user.id
+
+
+def test_rebuild_aggregates(app, runner):
+    user_id = add_history(app)
+
+    result = runner.invoke(args=["rebuild-aggregates"])
+    assert result.exit_code == 0, result.output
+    assert "Aggregates rebuilt successfully!" in result.output
+
+    with app.app_context():
+        totals = {
+            t.exercise_type: t.total for t in UserExerciseTotal.query.filter_by(user_id=user_id)
+        }
+        assert totals == {"pushup": 250, "plank": 600}
+
+        rollups = {
+            (r.period, r.period_start.isoformat()): r.points
+            for r in PointsRollup.query.filter_by(user_id=user_id)
+        }
+        assert rollups[("month", "2024-01-01")] == 125
+        assert rollups[("week", "2024-01-01")] == 125
+        assert rollups[("day", "2024-02-01")] == 60
+
+        monthly_pushups = ExerciseRollup.query.filter_by(
+            user_id=user_id, exercise_type="pushup", period="month"
+        ).one()
+        assert (monthly_pushups.count, monthly_pushups.points) == (250, 125)
+
+        ranks = get_exercise_ranks(db.session.get(User, user_id), get_daily_routine())
+        assert ranks["pushup"] == {"total": 250, "rank": "Silver"}
+        assert ranks["squat"] == {"total": 0, "rank": "Bronze"}
+
+    # Rebuilding is idempotent
+    assert runner.invoke(args=["rebuild-aggregates"]).exit_code == 0
+    with app.app_context():
+        pushups = UserExerciseTotal.query.filter_by(user_id=user_id, exercise_type="pushup").one()
+        assert pushups.total == 250
+
+
+def test_rebuild_upserts_each_rollup_row_once_per_statement(app, runner, monkeypatch):
+    # PostgreSQL rejects an ON CONFLICT DO UPDATE that reaches the same row twice
+    add_history(app)
+    calls = []
+
+    def unique_increment(model, keys, rows):
+        row_keys = [tuple(row[key] for key in keys) for row in rows]
+        assert len(row_keys) == len(set(row_keys)), f"duplicate {model.__name__} keys"
+        calls.append(model)
+        return increment(model, keys, rows)
+
+    monkeypatch.setattr("utils.leaderboard.increment", unique_increment)
+    monkeypatch.setattr("utils.stats.increment", unique_increment)
+    result = runner.invoke(args=["rebuild-aggregates"])
+    assert result.exit_code == 0, result.output
+    assert PointsRollup in calls and ExerciseRollup in calls
+
+
+def test_import_exercises_command(app, runner, tmp_path):
+    with app.app_context():
+        user = User(username="migrant", email="migrant@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    export = tmp_path / "history.csv"
+    export.write_text(
+        "type,count,date,intensity\n"
+        "pushup,40,2021-03-01,\n"
+        "pushup,60,2021-03-02,1.5\n"
+        "run,30,2021-03-20,\n"
+        "yoga,10,2021-03-21,\n"
+        "squat,abc,2021-03-22,\n"
+    )
+
+    result = runner.invoke(args=["import-exercises", "migrant", str(export), "--chunk-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Imported 3 exercises (110 points), 2 rows failed." in result.output
+    assert "Row 4: Invalid exercise type" in result.output
+
+    with app.app_context():
+        assert db.session.get(User, user_id).exercise_points == 110
+        monthly = {
+            r.exercise_type: r.count
+            for r in ExerciseRollup.query.filter_by(user_id=user_id, period="month")
+        }
+        assert monthly == {"pushup": 100, "run": 30}
+        march = PointsRollup.query.filter_by(
+            user_id=user_id, period="month", period_start=datetime(2021, 3, 1).date()
+        ).one()
+        assert march.points == 110
+
+    assert runner.invoke(args=["import-exercises", "nobody", str(export)]).exit_code != 0
+
+
+def test_recompute_achievements(app, runner):
+    with app.app_context():
+        users = [
+            User(username=f"u{i}", email=f"u{i}@example.com", password_hash="x", exercise_points=p)
+            for i, p in enumerate([50, 150, 600, 1200, 12000])
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add(Achievement(user_id=users[2].id, name="Beginner", description="legacy"))
+        db.session.add(UserExerciseTotal(user_id=users[0].id, exercise_type="pushup", total=250))
+        db.session.commit()
+        ids = [u.id for u in users]
+
+    result = runner.invoke(args=["recompute-achievements", "--chunk-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Processed users up to id 2 of 5 (40%)" in result.output
+    # Points: 0 + 1 + (2 - 1 existing) + 3 + 5, plus one pushup rank
+    assert "Achievements recomputed: 11 added." in result.output
+
+    with app.app_context():
+        names = {
+            user_id: sorted(a.name for a in Achievement.query.filter_by(user_id=user_id))
+            for user_id in ids
+        }
+        assert names[ids[0]] == ["Pushup Silver"]
+        assert names[ids[2]] == ["Beginner", "Intermediate"]
+        assert len(names[ids[4]]) == 5
+        assert JobCheckpoint.query.count() == 0
+
+    result = runner.invoke(args=["recompute-achievements"])
+    assert "Achievements recomputed: 0 added." in result.output
+
+
+def test_recompute_achievements_backfills_weekly_sessions(app, runner):
+    days_by_user = [
+        (6, 7, 8, 9, 10),  # Monday to Friday of one week
+        (11, 12, 13),  # a weekend, then the next Monday
+        (6, 6, 7, 8),  # two workouts on one day
+    ]
+    with app.app_context():
+        users = [
+            User(username=f"w{i}", email=f"w{i}@example.com", password_hash="x")
+            for i in range(len(days_by_user))
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        for user, days in zip(users, days_by_user):
+            for day in days:
+                log_exercise(user, "pushup", 1, 1, datetime(2024, 5, day))
+        # As if the rules had shipped after the history was logged
+        Achievement.query.delete()
+        db.session.commit()
+        ids = [u.id for u in users]
+
+    result = runner.invoke(args=["recompute-achievements"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        weekly = [
+            sorted(
+                a.name
+                for a in Achievement.query.filter(
+                    Achievement.user_id == user_id, Achievement.name.in_(["Regular", "Dedicated"])
+                )
+            )
+            for user_id in ids
+        ]
+    assert weekly == [["Dedicated", "Regular"], [], ["Regular"]]
+
+
+def test_recompute_achievements_resumes_from_checkpoint(app, runner):
+    with app.app_context():
+        db.session.add_all(
+            User(
+                username=f"r{i}", email=f"r{i}@example.com", password_hash="x", exercise_points=150
+            )
+            for i in range(4)
+        )
+        db.session.add(JobCheckpoint(name="recompute-achievements", position=2))
+        db.session.commit()
+
+    result = runner.invoke(args=["recompute-achievements"])
+    assert "Resuming after user id 2." in result.output
+    assert "Achievements recomputed: 2 added." in result.output
+
+    result = runner.invoke(args=["recompute-achievements", "--restart"])
+    assert "Achievements recomputed: 2 added." in result.output
@@ -67,7 +67,7 @@ def test_exercise_submission(client, app):
              patch('models.User.query') as mock_query, \
              patch('extensions.db.session.query') as mock_db_query, \
              patch('extensions.db.session.get', return_value=mock_user), \
-             patch('extensions.db.session.add') as mock_add, \
+             patch('routes.dashboard.log_exercises') as mock_log, \
              patch('extensions.db.session.commit') as mock_commit:
             
             # Mock the database query for exercise ranks
@@ -88,8 +88,9 @@ def test_exercise_submission(client, app):
             client.set_cookie('access_token_cookie', access_token)
             response = client.post('/dashboard/', data=data)
             
-            # Verify database operations
-            assert mock_add.called
+            # Verify database operations: the whole form is logged in one call
+            mock_log.assert_called_once()
+            assert [e['exercise_type'] for e in mock_log.call_args.args[1]] == ['pushup']
             assert mock_commit.called
             assert response.status_code in [200, 302]  # Either success or redirect
 
@@ -100,9 +101,9 @@ def test_get_daily_routine():
     assert len(routine) == 7
     assert all(isinstance(ex, dict) for ex in routine)
 
-def test_get_exercise_multipliers():
-    from routes.dashboard import get_exercise_multipliers
-    multipliers = get_exercise_multipliers()
+def test_scoring_multipliers():
+    from utils.scoring import scoring
+    multipliers = scoring.multipliers
     assert isinstance(multipliers, dict)
     assert len(multipliers) == 7
     assert all(isinstance(v, float) for v in multipliers.values())
@@ -0,0 +1,131 @@
+import smtplib
+from datetime import date, datetime
+
+import flask_mail
+from sqlalchemy import event
+
+from extensions import db
+from models import Achievement, JobCheckpoint, User
+from utils.digest import checkpoint_name, digest_chunk
+from utils.exercise_log import log_exercise
+from utils.rank_index import build_rank_index
+
+WEEK = date(2024, 5, 6)
+
+
+def add_users(app, count, inactive=()):
+    """Create ``count`` users, logging a week of push-ups for the first."""
+    with app.app_context():
+        users = [
+            User(
+                username=f"d{i}",
+                email=f"d{i}@example.com",
+                password_hash="x",
+                is_active=i not in inactive,
+            )
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        for day in (6, 7, 8):
+            log_exercise(users[0], "pushup", 100, 50, datetime(2024, 5, day))
+        log_exercise(users[0], "squat", 50, 20, datetime(2024, 4, 29))
+        db.session.add(
+            Achievement(user_id=users[0].id, name="Dedicated", unlocked_at=datetime(2024, 5, 8, 9))
+        )
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def test_weekly_digest_sends_each_chunk_over_one_connection(app, runner, smtp_server):
+    add_users(app, 5, inactive={3})
+
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-08", "--chunk-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Weekly digest for 2024-05-06: 4 sent, 0 failed." in result.output
+    assert smtp_server.connections == 3
+    recipients = [recipients[0] for recipients, _ in smtp_server.messages]
+    assert recipients == ["d0@example.com", "d1@example.com", "d2@example.com", "d4@example.com"]
+
+    body = smtp_server.messages[0][1]
+    assert "Subject: Your GameFit week: 150 points" in body
+    assert "Total points: 170 (Bronze, #1 overall)" in body
+    assert "Pushup                300        300   Silver" in body
+    assert "Squat                   0         50   Bronze" in body
+    assert "Unlocked this week: Dedicated" in body
+    assert "not logged any exercises" in smtp_server.messages[1][1]
+
+
+def test_digest_chunk_query_count_does_not_grow_with_users(app):
+    ids = add_users(app, 8)
+    with app.app_context():
+        rank_index = build_rank_index()
+        statements = []
+        engine = db.engine
+
+        def count(*args):
+            statements.append(args[2])
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            small = digest_chunk(0, ids[1], WEEK, rank_index)
+            queries_small = len(statements)
+            del statements[:]
+            large = digest_chunk(0, ids[-1], WEEK, rank_index)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+    assert (len(small), len(large)) == (2, 8)
+    assert len(statements) == queries_small
+    assert large[0]["week_points"] == 150
+    assert large[0]["position"] == 1 and large[1]["position"] == 2
+
+
+def test_weekly_digest_resumes_from_checkpoint(app, runner, smtp_server):
+    ids = add_users(app, 4)
+    with app.app_context():
+        db.session.add(JobCheckpoint(name=checkpoint_name(WEEK), position=ids[1]))
+        db.session.add(JobCheckpoint(name=checkpoint_name(date(2024, 4, 29)), position=ids[0]))
+        db.session.commit()
+
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-06"])
+    assert f"Resuming after user id {ids[1]}." in result.output
+    assert [recipients for recipients, _ in smtp_server.messages] == [
+        ["d2@example.com"],
+        ["d3@example.com"],
+    ]
+    with app.app_context():
+        assert [(c.name, c.position) for c in JobCheckpoint.query.order_by(JobCheckpoint.name)] == [
+            (checkpoint_name(date(2024, 4, 29)), ids[0]),
+            (checkpoint_name(WEEK), ids[-1]),
+        ]
+
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-06"])
+    assert "Weekly digest for 2024-05-06: 0 sent, 0 failed." in result.output
+
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-06", "--restart"])
+    assert "Weekly digest for 2024-05-06: 4 sent, 0 failed." in result.output
+
+
+def test_weekly_digest_checkpoints_each_sent_user(app, runner, smtp_server, monkeypatch):
+    ids = add_users(app, 4)
+    send = flask_mail.Connection.send
+    calls = []
+
+    def drop_after_two(conn, message):
+        calls.append(message.recipients)
+        if len(calls) == 3:
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        return send(conn, message)
+
+    monkeypatch.setattr(flask_mail.Connection, "send", drop_after_two)
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-06"])
+    assert result.exit_code != 0
+    with app.app_context():
+        assert JobCheckpoint.query.filter_by(name=checkpoint_name(WEEK)).one().position == ids[1]
+
+    monkeypatch.setattr(flask_mail.Connection, "send", send)
+    result = runner.invoke(args=["send-weekly-digest", "--week", "2024-05-06"])
+    assert f"Resuming after user id {ids[1]}." in result.output
+    recipients = [recipients[0] for recipients, _ in smtp_server.messages]
+    assert recipients == ["d0@example.com", "d1@example.com", "d2@example.com", "d3@example.com"]
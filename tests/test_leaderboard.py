@@ -92,4 +92,52 @@ def test_leaderboard_empty(client, app):
             assert b'No players found' in response.data  # Check empty leaderboard message
             assert b'Your Stats' in response.data  # Check stats section exists
             assert b'Total Points' in response.data  # Check points are shown
-            assert b'Your Position' in response.data  # Check rank is shown 
\ No newline at end of file
+            assert b'Your Position' in response.data  # Check rank is shown 
+
+def test_rank_index_counts_users_ahead():
+    from utils.rank_index import RankIndex
+    index = RankIndex([500, 400, 400, 100, 0])
+    assert len(index) == 5
+    assert index.rank(500) == 1
+    assert index.rank(400) == 2  # Ties share the better rank
+    assert index.rank(100) == 4
+    assert index.rank(0) == 5
+    assert index.rank(10000) == 1
+
+def test_rank_index_move_and_grow():
+    from utils.rank_index import RankIndex
+    index = RankIndex([10, 20])
+    index.move(10, 5000)  # Forces the tree to grow past its initial range
+    assert index.rank(5000) == 1
+    assert index.rank(20) == 2
+    index.move(0, 30)  # Users unknown to the index are simply added
+    assert len(index) == 3
+    assert index.rank(20) == 3
+
+def test_user_rank_matches_count_fallback(app):
+    from extensions import db
+    from models import User
+    from utils.points import award_points
+    from utils.rank_index import count_rank, get_user_rank
+
+    with app.app_context():
+        users = [
+            User(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password_hash="x",
+                exercise_points=pts,
+            )
+            for i, pts in enumerate([300, 200, 200, 50])
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+
+        assert [get_user_rank(u) for u in users] == [1, 2, 2, 4]
+
+        # Index is kept in sync after commit without a rebuild
+        award_points(users[3], 400)
+        db.session.commit()
+        assert get_user_rank(users[3]) == 1
+        assert get_user_rank(users[0]) == 2
+        assert [get_user_rank(u) for u in users] == [count_rank(u.exercise_points) for u in users]
@@ -0,0 +1,92 @@
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import User
+from utils.login_throttle import LoginThrottle, MemoryBucketStore, SqliteBucketStore
+from utils.passwords import hash_password
+from utils.security import init_proxy_fix
+
+
+def test_token_bucket_refills_and_rejects_without_spending():
+    store = MemoryBucketStore(max_keys=2)
+    buckets = [("user:a", 3, 0.1), ("ip:1", 10, 1.0)]
+
+    assert [store.take(buckets, 100)[0] for _ in range(3)] == [0, 0, 0]
+    retry_after, blocked = store.take(buckets, 100)
+    assert blocked == "user:a"
+    assert round(retry_after) == 10
+    # The IP bucket was not charged for the rejected attempt
+    assert store.take([("ip:1", 10, 1.0)], 100) == (0, None)
+
+    assert store.take(buckets, 110) == (0, None)
+
+    store.take([("ip:2", 1, 1.0)], 110)
+    store.take([("ip:3", 1, 1.0)], 110)
+    assert len(store) == 2  # Least recently used buckets were evicted
+
+
+def test_shared_store_limits_across_workers(tmp_path):
+    path = str(tmp_path / "throttle.db")
+    worker_a = LoginThrottle(user_limit=2, ip_limit=10, window=60, store=SqliteBucketStore(path))
+    worker_b = LoginThrottle(user_limit=2, ip_limit=10, window=60, store=SqliteBucketStore(path))
+
+    assert worker_a.check("Alice", "10.0.0.1") == 0
+    assert worker_b.check("alice", "10.0.0.2") == 0
+    assert worker_a.check("alice", "10.0.0.3") == 30
+    assert worker_a.stats()["rejected_by_username"] == 1
+
+    worker_b.reset("ALICE")
+    assert worker_a.check("alice", "10.0.0.3") == 0
+    assert worker_b.stats()["tracked_keys"] == 4
+
+
+def test_login_throttled_before_password_check(client, app):
+    app.config.update(LOGIN_THROTTLE_USER_LIMIT=2, LOGIN_THROTTLE_IP_LIMIT=3)
+    with app.app_context():
+        user = User(username="target", email="target@example.com", password_hash="")
+        user.password_hash = hash_password("Secret123")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    def attempt(username, password="wrong"):
+        return client.post("/api/v1/auth/token", json={"username": username, "password": password})
+
+    assert attempt("target", "Secret123").status_code == 200
+    assert attempt("target").status_code == 401
+    assert attempt("target").status_code == 401
+    verified = app.extensions["password_hasher"].stats()["verified"]
+
+    response = attempt("target", "Secret123")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert app.extensions["password_hasher"].stats()["verified"] == verified
+
+    # Four attempts already came from this client, over its limit of three
+    assert attempt("someone-else").status_code == 429
+
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=user_id))
+    stats = client.get("/api/v1/metrics").get_json()["login_throttle"]
+    assert stats["allowed"] == 3
+    assert stats["rejected"] == 2
+    assert stats["rejected_by_username"] == 1
+    assert stats["rejected_by_ip"] == 1
+
+
+def test_clients_behind_a_proxy_get_their_own_ip_bucket(client, app):
+    app.config.update(LOGIN_THROTTLE_USER_LIMIT=100, LOGIN_THROTTLE_IP_LIMIT=1, PROXY_FIX_X_FOR=1)
+    init_proxy_fix(app)
+
+    def attempt(forwarded_for):
+        return client.post(
+            "/api/v1/auth/token",
+            json={"username": "nobody", "password": "wrong"},
+            headers={"X-Forwarded-For": forwarded_for},
+            environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        )
+
+    assert attempt("203.0.113.5").status_code == 401
+    assert attempt("203.0.113.5").status_code == 429
+    # Same proxy address, different client
+    assert attempt("198.51.100.7").status_code == 401
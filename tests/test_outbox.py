@@ -0,0 +1,159 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import update
+
+from extensions import db, mail
+from models import OutboxMessage
+from utils import outbox
+from utils.outbox import get_mail_outbox, init_mail_outbox, outbox_stats, queue_mail, send_batch
+
+
+def test_batch_shares_one_smtp_connection(app, smtp_server):
+    with app.app_context():
+        for i in range(3):
+            queue_mail(f"Hello {i}", [f"user{i}@example.com"], "Body")
+        db.session.commit()
+
+        assert send_batch(limit=10) == (3, 0)
+        assert smtp_server.connections == 1
+        assert [recipients for recipients, _ in smtp_server.messages] == [
+            ["user0@example.com"],
+            ["user1@example.com"],
+            ["user2@example.com"],
+        ]
+        assert "Subject: Hello 0" in smtp_server.messages[0][1]
+        assert outbox_stats()["sent"] == 3
+        assert send_batch(limit=10) == (0, 0)
+
+
+def test_failed_messages_back_off_then_give_up(app, smtp_server):
+    app.config.update(MAIL_OUTBOX_MAX_ATTEMPTS=2, MAIL_OUTBOX_RETRY_SECONDS=30)
+    smtp_server.refuse.add("bounce@example.com")
+    with app.app_context():
+        bounce = queue_mail("Hi", ["bounce@example.com"], "Body")
+        queue_mail("Hi", ["ok@example.com"], "Body")
+        db.session.commit()
+        start = datetime.utcnow() + timedelta(seconds=1)
+
+        assert send_batch(now=start) == (1, 1)
+        message = db.session.get(OutboxMessage, bounce.id)
+        assert (message.status, message.attempts) == ("pending", 1)
+        assert message.next_attempt_at == start + timedelta(seconds=30)
+        assert "SMTPRecipientsRefused" in message.last_error
+
+        assert send_batch(now=start + timedelta(seconds=10)) == (0, 0)
+        assert send_batch(now=start + timedelta(seconds=31)) == (0, 1)
+        assert db.session.get(OutboxMessage, bounce.id).status == "failed"
+        assert outbox_stats() == {
+            "pending": 0,
+            "sent": 1,
+            "failed": 1,
+            "oldest_pending_seconds": None,
+        }
+
+
+def test_unreachable_server_reschedules_batch(app, smtp_server):
+    app.config["MAIL_PORT"] = smtp_server.server_address[1]
+    smtp_server.shutdown()
+    smtp_server.server_close()
+    with app.app_context():
+        queue_mail("Hi", ["a@example.com"], "Body")
+        queue_mail("Hi", ["b@example.com"], "Body")
+        db.session.commit()
+
+        assert send_batch() == (0, 2)
+        stats = outbox_stats()
+        assert stats["pending"] == 2
+        assert stats["oldest_pending_seconds"] is not None
+        assert all(m.attempts == 1 for m in OutboxMessage.query)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def file_app(app, smtp_server, tmp_path):
+    """App on a file-backed SQLite database, so the worker thread gets its own connection."""
+    file_app = Flask(__name__)
+    file_app.config.update(
+        {key: value for key, value in app.config.items() if key.startswith("MAIL_")}
+    )
+    file_app.config.update(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'outbox.db'}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+            "MAIL_OUTBOX_POLL_SECONDS": 60,
+        }
+    )
+    db.init_app(file_app)
+    mail.init_app(file_app)
+    with file_app.app_context():
+        db.create_all()
+    yield file_app
+    worker = file_app.extensions.get("mail_outbox")
+    if worker is not None:
+        worker.stop()
+    with file_app.app_context():
+        db.engine.dispose()
+
+
+def test_worker_sends_after_commit(file_app, smtp_server):
+    file_app.config["MAIL_OUTBOX_WORKER_ENABLED"] = True
+    with file_app.app_context():
+        worker = get_mail_outbox()
+        queue_mail("Welcome", ["new@example.com"], "Body")
+        db.session.commit()
+
+    assert wait_for(lambda: worker.stats()["sent"] == 1)
+    assert smtp_server.messages[0][0] == ["new@example.com"]
+
+
+def test_worker_started_with_app_sends_mail_left_pending(file_app, smtp_server):
+    file_app.add_url_rule("/ping", "ping", lambda: "pong")
+    init_mail_outbox(file_app)
+    with file_app.app_context():
+        queue_mail("Queued before restart", ["old@example.com"], "Body")
+        db.session.commit()
+
+    file_app.test_client().get("/ping")
+    assert "mail_outbox" not in file_app.extensions  # disabled in this config
+
+    file_app.config["MAIL_OUTBOX_WORKER_ENABLED"] = True
+    with file_app.app_context():
+        queue_mail("Queued by a script", ["script@example.com"], "Body")
+        db.session.commit()
+    assert "mail_outbox" not in file_app.extensions  # not started outside a request
+
+    file_app.test_client().get("/ping")
+    assert wait_for(lambda: file_app.extensions["mail_outbox"].stats()["sent"] == 2)
+    assert sorted(recipients for recipients, _ in smtp_server.messages) == [
+        ["old@example.com"],
+        ["script@example.com"],
+    ]
+
+
+def test_result_not_saved_over_a_lost_claim(app, smtp_server, monkeypatch):
+    deliver = outbox._deliver
+
+    def deliver_then_lose_claim(rows):
+        errors = deliver(rows)
+        # Another sender reclaimed the batch after the lease ran out
+        db.session.execute(update(OutboxMessage).values(claim_token="other"))
+        return errors
+
+    monkeypatch.setattr(outbox, "_deliver", deliver_then_lose_claim)
+    with app.app_context():
+        message = queue_mail("Hi", ["slow@example.com"], "Body")
+        db.session.commit()
+
+        assert send_batch() == (1, 0)
+        message = db.session.get(OutboxMessage, message.id)
+        assert (message.status, message.claim_token) == ("pending", "other")
@@ -0,0 +1,93 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from extensions import db
+from models import Exercise, User, UserExerciseTotal
+from utils.exercise_log import log_exercise
+from utils.points import award_points
+
+THREADS = 8
+WRITES_PER_THREAD = 25
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """App on a file-backed SQLite database so each thread gets its own connection."""
+    app = Flask(__name__)
+    app.config.update(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'points.db'}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+            "RANK_INDEX_ENABLED": False,
+        }
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username="racer", email="racer@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_award_points_updates_loaded_user(app):
+    with app.app_context():
+        user = User(username="solo", email="solo@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+
+        assert award_points(user, 7) == 7
+        assert user.exercise_points == 7
+        assert user not in db.session.dirty
+        db.session.commit()
+        db.session.expire_all()
+        assert user.exercise_points == 7
+
+
+def test_award_points_missing_user(app):
+    with app.app_context():
+        ghost = User(id=999, username="ghost", email="ghost@example.com", password_hash="x")
+        assert award_points(ghost, 5) is None
+
+
+def test_concurrent_writes_keep_exact_totals(file_app, record_property):
+    errors = []
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        try:
+            with file_app.app_context():
+                barrier.wait()
+                for _ in range(WRITES_PER_THREAD):
+                    # Each write loads its own (possibly stale) copy of the user
+                    user = db.session.get(User, 1)
+                    db.session.refresh(user)
+                    log_exercise(user, "pushup", 2, 3, datetime.now())
+                    db.session.commit()
+        except Exception as ex:  # surfaced in the main thread below
+            errors.append(ex)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert not errors
+    writes = THREADS * WRITES_PER_THREAD
+    record_property("writes_per_second", round(writes / elapsed, 1))
+
+    with file_app.app_context():
+        assert db.session.get(User, 1).exercise_points == writes * 3
+        assert Exercise.query.count() == writes
+        total = UserExerciseTotal.query.filter_by(user_id=1, exercise_type="pushup").one()
+        assert total.total == writes * 2
@@ -0,0 +1,45 @@
+from models.constants import EXERCISE_RANKS, USER_RANKS
+from utils.scoring import RankTable, scoring
+
+
+def linear_rank(tiers, value):
+    return next(name for thresh, name in tiers if value >= thresh)
+
+
+def test_rank_table_matches_linear_scan():
+    for exercise_type, tiers in EXERCISE_RANKS.items():
+        table = RankTable(tiers)
+        for value in range(0, 6000, 7):
+            assert table.resolve(value) == linear_rank(tiers, value)
+        for thresh, name in tiers:
+            assert table.resolve(thresh) == name
+
+
+def test_user_rank_boundaries():
+    for thresh, name in USER_RANKS:
+        assert scoring.user_rank(thresh) == name
+    assert scoring.user_rank(199) == "Bronze"
+    assert scoring.user_rank(-5) == "Bronze"
+
+
+def test_points_rounds_multiplier():
+    assert scoring.points("pushup", 10) == 5
+    assert scoring.points("run", 30) == 60
+    assert scoring.points("plank", 60) == 6
+
+
+def test_batch_results_align_with_single_calls():
+    types = ["pushup", "situp", "run", "burpee"] * 250
+    counts = list(range(len(types)))
+
+    assert scoring.score_batch(types, counts) == [
+        scoring.points(t, c) for t, c in zip(types, counts)
+    ]
+    assert scoring.rank_batch(types, counts) == [
+        scoring.exercise_rank(t, c) for t, c in zip(types, counts)
+    ]
+
+
+def test_is_valid_type():
+    assert scoring.is_valid_type("squat")
+    assert not scoring.is_valid_type("jumping_jack")
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import User
+from utils.exercise_log import log_exercise
+from utils.snapshot_cache import SnapshotCache, SqliteSnapshotStore
+
+
+def test_snapshot_cache_lru_and_ttl():
+    cache = SnapshotCache(max_entries=2, ttl=30)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    cache.get("a")
+    cache.set("c", [3])  # Evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+
+    cache.ttl = -1
+    cache.set("d", [4])
+    assert cache.get("d") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_snapshot_cache_selective_invalidation():
+    cache = SnapshotCache()
+    cache.set("top", [[1, "a", 500, 500]], {"user_ids": [1], "cutoff": 500})
+    cache.set("window", [], None)
+
+    cache.invalidate(user_id=7, points=100)  # Below the cutoff: only window snapshots drop
+    assert cache.get("top") is not None
+    assert cache.get("window") is None
+
+    cache.invalidate(user_id=7, points=600)
+    assert cache.get("top") is None
+
+
+def test_shared_store_invalidates_other_workers(tmp_path):
+    path = str(tmp_path / "snapshots.db")
+    worker_a = SnapshotCache(store=SqliteSnapshotStore(path), sync_interval=0)
+    worker_b = SnapshotCache(store=SqliteSnapshotStore(path), sync_interval=0)
+
+    worker_a.set("top", [[1, "a", 500, 500]], {"user_ids": [1], "cutoff": 500})
+    assert worker_b.get("top") == [[1, "a", 500, 500]]
+    assert worker_b.stats()["shared_hits"] == 1
+
+    worker_a.invalidate(user_id=1, points=700)
+    assert worker_b.get("top") is None
+
+
+def test_shared_store_invalidates_by_indexed_keys(tmp_path):
+    store = SqliteSnapshotStore(str(tmp_path / "snapshots.db"))
+    expires_at = time.time() + 30
+    store.set("top", [1], {"user_ids": [1, 2], "cutoff": 500}, expires_at)
+    store.set("profile", [2], {"user_ids": [3], "cutoff": None}, expires_at)
+    store.set("window", [3], None, expires_at)
+
+    assert store.invalidate(user_id=7, points=100) == 1  # Only the window snapshot
+    assert store.invalidate(user_id=3, points=100) == 1  # The profile lists user 3
+    assert store.get("top", time.time()) is not None
+    assert store.invalidate(user_id=7, points=500) == 1  # Reaches the top cutoff
+    assert store.get("top", time.time()) is None
+    assert store.generation() == 3
+
+
+def test_shared_store_deletes_expired_snapshots(tmp_path):
+    path = str(tmp_path / "snapshots.db")
+    store = SqliteSnapshotStore(path)
+    store.set("old", [1], {"user_ids": [1], "cutoff": 500}, time.time() - 1)
+    store.set("new", [2], {"user_ids": [2], "cutoff": 500}, time.time() + 30)
+
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("SELECT key FROM snapshot_entry").fetchall() == [("new",)]
+        assert conn.execute("SELECT key, user_id FROM snapshot_user").fetchall() == [("new", 2)]
+    # Expired rows are removed without counting as an invalidation
+    assert store.invalidate(user_id=1, points=0) == 0
+    assert store.generation() == 0
+
+
+def test_shared_generation_is_checked_once_per_interval(tmp_path):
+    store = SqliteSnapshotStore(str(tmp_path / "snapshots.db"))
+    other = SnapshotCache(store=store, sync_interval=0)
+    cache = SnapshotCache(store=store, sync_interval=60)
+    cache.set("top", [1], None)
+    checks = []
+    generation = store.generation
+    store.generation = lambda: checks.append(1) or generation()
+
+    other.invalidate(user_id=1, points=100)
+    # Within the interval the local copy is served without touching the store
+    assert [cache.get("top") for _ in range(5)] == [[1]] * 5
+    assert checks == []
+
+    cache._next_sync = 0
+    assert cache.get("top") is None
+    assert len(checks) == 1
+
+
+def test_leaderboard_cache_invalidated_on_points_change(client, app):
+    with app.app_context():
+        users = [
+            User(username=f"u{i}", email=f"u{i}@example.com", password_hash="x", exercise_points=p)
+            for i, p in enumerate([300, 200])
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        client.set_cookie("access_token_cookie", create_access_token(identity=users[1].id))
+
+    first = client.get("/api/v1/leaderboard").get_json()["items"]
+    client.get("/api/v1/leaderboard")
+    stats = client.get("/api/v1/metrics").get_json()["leaderboard_cache"]
+    assert stats["hits"] >= 2
+
+    with app.app_context():
+        log_exercise(db.session.get(User, users[1].id), "run", 100, 200, datetime.now())
+        db.session.commit()
+
+    second = client.get("/api/v1/leaderboard").get_json()["items"]
+    assert [item["points"] for item in first] == [300, 200]
+    assert [item["points"] for item in second] == [400, 300]
@@ -0,0 +1,132 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import User, UserStreak
+from utils.exercise_log import log_exercise, log_exercises
+from utils.streaks import rebuild_streaks, streak_from_days
+
+
+def longest_run(days):
+    days = sorted(set(days))
+    best = run = 1
+    for before, after in zip(days, days[1:]):
+        run = run + 1 if after - before == timedelta(days=1) else 1
+        best = max(best, run)
+    return best
+
+
+def trailing_run(days):
+    days = sorted(set(days))
+    run = 1
+    while len(days) > run and days[-run - 1] == days[-1] - timedelta(days=run):
+        run += 1
+    return run
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username="runner", email="runner@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_add_day_handles_backdated_days():
+    start = date(2024, 5, 1)
+    streak = streak_from_days(1, [start])
+
+    streak.add_day(start + timedelta(days=1))
+    assert (streak.current, streak.longest) == (2, 2)
+
+    # A gap starts a new run and remembers the previous one
+    streak.add_day(start + timedelta(days=3))
+    assert (streak.current, streak.longest, streak.prev_length) == (1, 2, 2)
+
+    # Backdating into the gap joins both runs
+    streak.add_day(start + timedelta(days=2))
+    assert (streak.current, streak.longest, streak.prev_end) == (4, 4, None)
+
+    # Repeats inside the run change nothing
+    streak.add_day(start + timedelta(days=1))
+    assert (streak.current, streak.longest) == (4, 4)
+    assert streak.current_streak(start + timedelta(days=4)) == 4
+    assert streak.current_streak(start + timedelta(days=5)) == 0
+
+
+def test_add_day_matches_full_recompute():
+    rng = random.Random(19)
+    for _ in range(200):
+        today = date(2024, 1, 1)
+        days = []
+        streak = None
+        for _ in range(40):
+            today += timedelta(days=rng.choice([0, 1, 1, 2, 3]))
+            day = today - timedelta(days=rng.randint(0, 2))
+            days.append(day)
+            if streak is None:
+                streak = streak_from_days(1, [day])
+            elif day >= streak.last_day - timedelta(days=2):
+                streak.add_day(day)
+            else:
+                streak = streak_from_days(1, sorted(set(days)))
+            assert streak.longest == longest_run(days)
+            assert streak.current == trailing_run(days)
+
+
+def test_logging_maintains_streak_and_rebuild_agrees(app, user_id):
+    start = datetime(2024, 3, 1)
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for offset in (0, 1, 2, 5, 4):
+            log_exercise(user, "pushup", 10, 5, start + timedelta(days=offset))
+        db.session.commit()
+        streak = db.session.get(UserStreak, user_id)
+        assert (streak.current, streak.longest, streak.last_day) == (2, 3, date(2024, 3, 6))
+
+        # An import far in the past bridges the earlier gap via a rebuild
+        log_exercises(
+            user,
+            [
+                {
+                    "exercise_type": "squat",
+                    "count": 5,
+                    "intensity": 1.0,
+                    "points": 3,
+                    "date_added": start + timedelta(days=3),
+                }
+            ],
+        )
+        db.session.commit()
+        assert (streak.current, streak.longest) == (6, 6)
+        assert "Consistent" not in {a.name for a in user.achievements}
+
+        assert rebuild_streaks(chunk_size=1) == 1
+        db.session.commit()
+        db.session.expire_all()
+        rebuilt = db.session.get(UserStreak, user_id)
+        assert (rebuilt.current, rebuilt.longest, rebuilt.last_day) == (6, 6, date(2024, 3, 6))
+
+
+def test_users_me_reports_streak(client, app, user_id):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=user_id))
+        response = client.get("/api/v1/users/me")
+        assert response.get_json()["streak"] == {"current": 0, "longest": 0, "last_active": None}
+
+        user = db.session.get(User, user_id)
+        for offset in (2, 1, 0):
+            log_exercise(user, "situp", 10, 5, today - timedelta(days=offset))
+        db.session.commit()
+
+    response = client.get("/api/v1/users/me")
+    assert response.get_json()["streak"] == {
+        "current": 3,
+        "longest": 3,
+        "last_active": today.date().isoformat(),
+    }
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+import pytest
+from flask import make_response
+from flask_jwt_extended import create_access_token, decode_token, verify_jwt_in_request
+
+from extensions import refresh_expiring_token
+
+ITERATIONS = 2000
+
+
+def _access_cookie(response):
+    cookies = [
+        c for c in response.headers.getlist("Set-Cookie") if c.startswith("access_token_cookie=")
+    ]
+    return cookies[0] if cookies else None
+
+
+def test_token_reissued_only_near_expiry(client, app):
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=15)
+    app.config["JWT_REFRESH_WINDOW"] = 300
+
+    with app.app_context():
+        fresh = create_access_token(identity=1)
+        expiring = create_access_token(identity=1, expires_delta=timedelta(seconds=60))
+
+    client.set_cookie("access_token_cookie", fresh)
+    response = client.get("/api/v1/users/me")
+    assert _access_cookie(response) is None
+
+    client.set_cookie("access_token_cookie", expiring)
+    response = client.get("/api/v1/users/me")
+    cookie = _access_cookie(response)
+    assert cookie is not None
+    assert "HttpOnly" in cookie
+
+    token = cookie.split(";")[0].split("=", 1)[1]
+    with app.app_context():
+        claims = decode_token(token)
+    assert str(claims["sub"]) == "1"
+    assert claims["exp"] - time.time() > 600
+
+    # Requests that never verified a token are left alone
+    with app.app_context(), app.test_request_context():
+        assert _access_cookie(refresh_expiring_token(make_response(""))) is None
+
+
+@pytest.mark.benchmark
+def test_auth_overhead_benchmark(app, record_property):
+    """Per-request auth cost: sliding refresh vs. reissuing a token on every response."""
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=15)
+    with app.app_context():
+        token = create_access_token(identity=1)
+
+    def run(after_request):
+        with app.test_request_context(headers={"Cookie": f"access_token_cookie={token}"}):
+            response = make_response("")
+            started = time.perf_counter()
+            for _ in range(ITERATIONS):
+                verify_jwt_in_request()
+                after_request(response)
+            return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+    def reissue(response):
+        response.set_cookie("access_token_cookie", create_access_token(identity=1), httponly=True)
+
+    sliding_us = run(refresh_expiring_token)
+    reissue_us = run(reissue)
+    record_property("sliding_refresh_us_per_request", round(sliding_us, 1))
+    record_property("reissue_every_request_us_per_request", round(reissue_us, 1))
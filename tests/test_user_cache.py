@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+from sqlalchemy import event
+
+from extensions import db
+from models import User
+from utils.exercise_log import log_exercise
+from utils.helpers import get_current_user
+from utils.user_cache import UserSummary, UserSummaryCache
+
+
+def test_summary_cache_versions_reject_racing_loads():
+    cache = UserSummaryCache(ttl=30, max_entries=2)
+    summary = UserSummary(1, "a", "a@example.com", 10, True)
+
+    version = cache.version(1)
+    cache.bump(1)  # A commit lands while the row is being loaded
+    cache.put(summary, version)
+    assert cache.get(1) is None
+
+    cache.put(summary, cache.version(1))
+    assert cache.get(1) == summary
+    cache.bump(1)
+    assert cache.get(1) is None
+
+    for user_id in (2, 3, 4):
+        cache.put(summary._replace(id=user_id), cache.version(user_id))
+    assert cache.stats()["entries"] == 2
+
+    cache.ttl = -1
+    cache.put(summary._replace(id=5), cache.version(5))
+    assert cache.get(5) is None
+
+
+def test_current_user_loaded_once_per_request(app):
+    with app.app_context():
+        user = User(username="memo", email="memo@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id)
+        db.session.expunge_all()
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        with app.test_request_context(headers={"Cookie": f"access_token_cookie={token}"}):
+            verify_jwt_in_request()
+            assert get_current_user() is get_current_user()
+        assert len(statements) == 1
+
+
+def test_summary_served_from_cache_and_invalidated(client, app):
+    with app.app_context():
+        user = User(username="cached", email="cached@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        client.set_cookie("access_token_cookie", create_access_token(identity=user_id))
+
+    def me():
+        items = client.get("/api/v1/leaderboard/around-me").get_json()["items"]
+        return next(item for item in items if item["user"]["id"] == user_id)
+
+    assert me()["points"] == 0
+    assert me()["points"] == 0
+    stats = client.get("/api/v1/metrics").get_json()["user_cache"]
+    assert stats["hits"] >= 1
+
+    with app.app_context():
+        log_exercise(db.session.get(User, user_id), "run", 10, 20, datetime.now())
+        db.session.commit()
+    assert me()["points"] == 20
+
+    with app.app_context():
+        db.session.get(User, user_id).username = "renamed"
+        db.session.commit()
+    assert me()["user"]["username"] == "renamed"
+    assert client.get("/api/v1/metrics").get_json()["user_cache"]["invalidations"] >= 2
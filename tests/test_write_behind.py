@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Exercise, JobCheckpoint, User
+from utils import write_behind
+from utils.write_behind import _checkpoint_name, _encode, get_write_behind
+
+
+@pytest.fixture
+def queued_app(app, tmp_path):
+    app.config.update(
+        {
+            "WRITE_BEHIND_ENABLED": True,
+            "WRITE_BEHIND_JOURNAL_DIR": str(tmp_path),
+            # Flushes are driven by the tests
+            "WRITE_BEHIND_FLUSH_MS": 60000,
+            "WRITE_BEHIND_MAX_BATCH": 3,
+        }
+    )
+    with app.app_context():
+        user = User(username="sprinter", email="sprinter@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+    yield app
+    queue = app.extensions.get("write_behind")
+    if queue is not None:
+        queue.stop()
+
+
+def test_submissions_commit_in_groups(queued_app, client):
+    with queued_app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=1))
+    today = datetime.now().date().isoformat()
+
+    def submit(count):
+        response = client.post(
+            "/api/v1/exercises", json={"type": "pushup", "count": count, "date": today}
+        )
+        assert response.status_code == 202
+        assert response.get_json()["status"] == "queued"
+
+    submit(10)
+    submit(20)
+    with queued_app.app_context():
+        queue = get_write_behind()
+        assert queue.stats()["depth"] == 2
+        assert Exercise.query.count() == 0
+        assert os.path.getsize(queue.journal_path) > 0
+
+    # Reaching the batch size wakes the flush thread without waiting for the timer
+    submit(30)
+    deadline = time.monotonic() + 5
+    while queue.stats()["committed"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with queued_app.app_context():
+        assert db.session.get(User, 1).exercise_points == 30
+        assert os.path.getsize(queue.journal_path) == 0
+
+    stats = client.get("/api/v1/metrics").get_json()["write_behind"]
+    assert stats["depth"] == 0
+    assert stats["committed"] == 3
+    assert stats["batches"] == 1
+    assert stats["max_batch_size"] == 3
+
+    queue.stop()
+    assert not os.path.exists(queue.journal_path)
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+@pytest.mark.parametrize("field, value", [("count", -5), ("count", "ten"), ("intensity", "high")])
+def test_invalid_submission_is_rejected_before_queueing(queued_app, client, enabled, field, value):
+    queued_app.config["WRITE_BEHIND_ENABLED"] = enabled
+    with queued_app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=1))
+    payload = {"type": "pushup", "count": 10, "date": datetime.now().date().isoformat()}
+
+    response = client.post("/api/v1/exercises", json=dict(payload, **{field: value}))
+    assert response.status_code == 400
+    with queued_app.app_context():
+        queue = get_write_behind()
+        assert queue is None or queue.stats()["submitted"] == 0
+        assert Exercise.query.count() == 0
+
+
+def test_dashboard_submission_is_queued_and_flushed_on_stop(queued_app, client):
+    with queued_app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=1))
+    today = datetime.now().date().isoformat()
+
+    client.post("/dashboard/", data={"squat": "25", "squat_date": today})
+    with queued_app.app_context():
+        queue = get_write_behind()
+        assert queue.stats()["depth"] == 1
+
+    queue.stop()
+    with queued_app.app_context():
+        assert db.session.get(User, 1).exercise_points == 10
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_dashboard_form_with_a_bad_row_saves_nothing(queued_app, client, enabled):
+    queued_app.config["WRITE_BEHIND_ENABLED"] = enabled
+    with queued_app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(identity=1))
+    today = datetime.now().date().isoformat()
+
+    form = {"pushup": "10", "pushup_date": today, "squat": "5", "squat_date": "2000-01-01"}
+    assert client.post("/dashboard/", data=form).status_code == 302
+    with queued_app.app_context():
+        queue = get_write_behind()
+        if queue is not None:
+            assert queue.stats()["submitted"] == 0
+            queue.flush()
+        assert Exercise.query.count() == 0
+        assert db.session.get(User, 1).exercise_points == 0
+
+
+def test_orphaned_journal_is_replayed_once(queued_app, tmp_path):
+    journal = tmp_path / "crashed-host-1-1.journal"
+    entry = {
+        "exercise_type": "run",
+        "count": 10,
+        "intensity": 1.0,
+        "points": 20,
+        "date_added": datetime(2024, 5, 1),
+    }
+    journal.write_text("".join(_encode(seq, 1, entry) for seq in (1, 2, 3)) + '{"seq": 4, "us')
+
+    with queued_app.app_context():
+        # Items 1 and 2 were committed before the crash
+        db.session.add(JobCheckpoint(name=_checkpoint_name(str(journal)), position=2))
+        db.session.commit()
+
+        get_write_behind()
+
+        assert Exercise.query.count() == 1
+        assert db.session.get(User, 1).exercise_points == 20
+        assert JobCheckpoint.query.filter_by(name=_checkpoint_name(str(journal))).count() == 0
+    assert not journal.exists()
+
+
+def entry(count):
+    return {
+        "exercise_type": "pushup",
+        "count": count,
+        "intensity": 1.0,
+        "points": count,
+        "date_added": datetime(2024, 5, 1),
+    }
+
+
+def test_bad_entry_is_isolated_and_dead_lettered(queued_app, monkeypatch):
+    # A full batch would wake the flush thread; these flushes are driven by hand
+    queued_app.config.update(
+        {"WRITE_BEHIND_MAX_BATCH": 10, "WRITE_BEHIND_MAX_ATTEMPTS": 2, "WRITE_BEHIND_RETRY_MS": 0}
+    )
+    log_exercises = write_behind.log_exercises
+
+    def reject_negative(user, entries):
+        if any(item["count"] < 0 for item in entries):
+            raise ValueError("negative count")
+        return log_exercises(user, entries)
+
+    monkeypatch.setattr(write_behind, "log_exercises", reject_negative)
+    with queued_app.app_context():
+        queue = get_write_behind()
+        for count in (10, -1, 30):
+            queue.submit(1, entry(count))
+
+        # The entry ahead of the bad one commits; the bad one blocks only itself
+        assert queue.flush_once() == 1
+        assert queue.stats()["depth"] == 2
+        assert queue.flush() == 1
+        assert db.session.get(User, 1).exercise_points == 40
+
+    stats = queue.stats()
+    assert (stats["depth"], stats["committed"], stats["dead_lettered"]) == (0, 2, 1)
+    with open(queue.dead_letter_path, encoding="utf-8") as dead_letters:
+        [dead] = [json.loads(line) for line in dead_letters]
+    assert (dead["seq"], dead["count"], dead["error"]) == (2, -1, "ValueError: negative count")
+
+
+def test_dead_letter_waits_for_its_checkpoint(queued_app, monkeypatch):
+    queued_app.config.update({"WRITE_BEHIND_MAX_ATTEMPTS": 1, "WRITE_BEHIND_RETRY_MS": 0})
+    applied = []
+    apply_batch = write_behind.apply_batch
+
+    def flaky_checkpoint(items, checkpoint, position):
+        applied.append([seq for seq, _, _ in items])
+        if not items and applied.count([]) == 1:
+            raise OperationalError("UPDATE", {}, Exception("database is locked"))
+        if any(item["count"] < 0 for _, _, item in items):
+            raise ValueError("negative count")
+        return apply_batch(items, checkpoint, position)
+
+    monkeypatch.setattr(write_behind, "apply_batch", flaky_checkpoint)
+    with queued_app.app_context():
+        queue = get_write_behind()
+        queue.submit(1, entry(-1))
+        assert queue.flush_once() == 0
+        # Written aside, but still at the head until the checkpoint commits
+        assert (queue.stats()["depth"], queue.stats()["dead_lettered"]) == (1, 0)
+
+        assert queue.flush() == 0
+        assert JobCheckpoint.query.filter_by(name=queue._checkpoint).one().position == 1
+
+    # The entry itself was applied only twice (batch, then alone); the retry only checkpoints
+    assert applied == [[1], [1], [], []]
+    assert (queue.stats()["depth"], queue.stats()["dead_lettered"]) == (0, 1)
+    with open(queue.dead_letter_path, encoding="utf-8") as dead_letters:
+        assert len(dead_letters.readlines()) == 1
+
+
+def test_replay_skips_dead_lettered_entries(queued_app, tmp_path):
+    journal = tmp_path / "crashed-host-1-1.journal"
+    journal.write_text("".join(_encode(seq, 1, entry(seq * 10)) for seq in (1, 2, 3)))
+    # Entry 2 was dead-lettered, but the process died before its checkpoint committed
+    dead = json.loads(_encode(2, 1, entry(20)))
+    (tmp_path / "dead-letter.ndjson").write_text(json.dumps(dict(dead, journal=journal.name)))
+
+    with queued_app.app_context():
+        db.session.add(JobCheckpoint(name=_checkpoint_name(str(journal)), position=1))
+        db.session.commit()
+
+        get_write_behind()
+
+        assert [e.count for e in Exercise.query] == [30]
+    assert not journal.exists()
+
+
+def test_database_outage_backs_off_without_dead_lettering(queued_app, monkeypatch):
+    queued_app.config.update({"WRITE_BEHIND_MAX_ATTEMPTS": 1, "WRITE_BEHIND_RETRY_MS": 60000})
+
+    def outage(user, entries):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    log_exercises = write_behind.log_exercises
+    monkeypatch.setattr(write_behind, "log_exercises", outage)
+    with queued_app.app_context():
+        queue = get_write_behind()
+        queue.submit(1, entry(10))
+        queue.submit(1, entry(20))
+        assert queue.flush() == 0
+        # Backing off: no further attempts until the delay passes
+        assert queue.flush_once() == 0
+
+        monkeypatch.setattr(write_behind, "log_exercises", log_exercises)
+        queue._retry_at = 0.0
+        assert queue.flush() == 2
+
+    stats = queue.stats()
+    assert (stats["errors"], stats["dead_lettered"], stats["committed"]) == (1, 0, 2)
+    assert not os.path.exists(queue.dead_letter_path)
@@ -0,0 +1,386 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, func, insert, literal, select, true, union_all
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Achievement, PointsRollup, User, UserExerciseTotal, UserStreak
+from models.constants import (
+    ACHIEVEMENT_TIERS,
+    EXERCISE_RANKS,
+    STREAK_ACHIEVEMENTS,
+    WEEKLY_SESSION_ACHIEVEMENTS,
+)
+from utils.aggregates import conflict_insert, period_start
+
+
+def achievement_description(threshold):
+    return f"Earned {threshold} exercise points"
+
+
+class ActivityChange:
+    """What one write did to a user, with lazy reads of the maintained aggregates.
+
+    Rules only ever read ``user_exercise_totals`` rows for the touched types, the
+    user's ``user_streak`` row and a bounded window of ``points_rollup`` day rows,
+    never the exercise table. ``points_by_day`` maps each logged day to the
+    points this write added to it, and ``old_longest`` is the longest streak
+    before the write, so rules can tell when a threshold was crossed.
+    """
+
+    def __init__(
+        self,
+        user_id,
+        old_points,
+        new_points,
+        counts_by_type,
+        points_by_day,
+        streak=None,
+        old_longest=0,
+    ):
+        self.user_id = user_id
+        self.old_points = old_points
+        self.new_points = new_points
+        self.counts_by_type = counts_by_type
+        self.points_by_day = points_by_day
+        self.days = sorted(points_by_day)
+        self.old_longest = old_longest
+        self._streak = streak
+        self._totals = None
+        self._rollup_days = None
+
+    def exercise_total(self, exercise_type):
+        """Return the type's running total after this write."""
+        if self._totals is None:
+            self._totals = dict(
+                db.session.execute(
+                    select(UserExerciseTotal.exercise_type, UserExerciseTotal.total).where(
+                        UserExerciseTotal.user_id == self.user_id,
+                        UserExerciseTotal.exercise_type.in_(self.counts_by_type),
+                    )
+                ).all()
+            )
+        return self._totals.get(exercise_type, 0)
+
+    def streak(self):
+        """The user's streak after this write, as updated by ``record_active_days``."""
+        if self._streak is None:
+            self._streak = db.session.get(UserStreak, self.user_id)
+        return self._streak
+
+    def active_days(self):
+        """Days with any activity within the lookback window of the enabled rules."""
+        return set(self._day_points())
+
+    def new_days(self):
+        """Logged days that had no activity before this write.
+
+        A day's rollup holding exactly the points this write added means the
+        write created it.
+        """
+        day_points = self._day_points()
+        return {day for day, points in self.points_by_day.items() if day_points.get(day) == points}
+
+    def _day_points(self):
+        if self._rollup_days is None:
+            span = max(max_rule_span() - 1, 0)
+            self._rollup_days = dict(
+                db.session.execute(
+                    select(PointsRollup.period_start, PointsRollup.points).where(
+                        PointsRollup.period == "day",
+                        PointsRollup.user_id == self.user_id,
+                        PointsRollup.period_start >= self.days[0] - timedelta(days=span),
+                        PointsRollup.period_start <= self.days[-1] + timedelta(days=span),
+                    )
+                ).all()
+            )
+        return self._rollup_days
+
+
+class AchievementRule:
+    """An achievement unlocked by a condition on maintained aggregates.
+
+    Subclasses implement ``is_met(change)``, called only for writes that
+    ``triggered_by`` says can affect the rule. They may also implement the
+    classmethod ``earned_select(rules, after_id, upto_id)``, returning a
+    ``(user_id, name, description)`` select that lists every user in the id
+    range who has earned one of ``rules``. ``recompute_achievements`` uses it.
+    """
+
+    # Days of activity history the rule needs around a logged day
+    span = 1
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+
+    def triggered_by(self, change):
+        return True
+
+    def is_met(self, change):
+        raise NotImplementedError
+
+    @classmethod
+    def earned_select(cls, rules, after_id, upto_id):
+        return None
+
+
+def _tier_table(rows):
+    """Build an inline table from a list of column dicts."""
+    return union_all(
+        *(select(*(literal(value).label(key) for key, value in row.items())) for row in rows)
+    ).subquery()
+
+
+class PointsRule(AchievementRule):
+    """Unlocked when the user's total points reach ``threshold``."""
+
+    def __init__(self, name, threshold):
+        super().__init__(name, achievement_description(threshold))
+        self.threshold = threshold
+
+    def triggered_by(self, change):
+        return change.old_points < self.threshold <= change.new_points
+
+    def is_met(self, change):
+        return True
+
+    @classmethod
+    def earned_select(cls, rules, after_id, upto_id):
+        tiers = _tier_table(
+            [
+                {"name": r.name, "threshold": r.threshold, "description": r.description}
+                for r in rules
+            ]
+        )
+        return select(User.id, tiers.c.name, tiers.c.description).where(
+            User.id > after_id,
+            User.id <= upto_id,
+            User.exercise_points >= tiers.c.threshold,
+        )
+
+
+class ExerciseTotalRule(AchievementRule):
+    """Unlocked when the running total for one exercise type reaches ``threshold``."""
+
+    def __init__(self, name, exercise_type, threshold, description):
+        super().__init__(name, description)
+        self.exercise_type = exercise_type
+        self.threshold = threshold
+
+    def triggered_by(self, change):
+        return self.exercise_type in change.counts_by_type
+
+    def is_met(self, change):
+        total = change.exercise_total(self.exercise_type)
+        return total - change.counts_by_type[self.exercise_type] < self.threshold <= total
+
+    @classmethod
+    def earned_select(cls, rules, after_id, upto_id):
+        tiers = _tier_table(
+            [
+                {
+                    "name": r.name,
+                    "exercise_type": r.exercise_type,
+                    "threshold": r.threshold,
+                    "description": r.description,
+                }
+                for r in rules
+            ]
+        )
+        return select(UserExerciseTotal.user_id, tiers.c.name, tiers.c.description).where(
+            UserExerciseTotal.user_id > after_id,
+            UserExerciseTotal.user_id <= upto_id,
+            UserExerciseTotal.exercise_type == tiers.c.exercise_type,
+            UserExerciseTotal.total >= tiers.c.threshold,
+        )
+
+
+class StreakRule(AchievementRule):
+    """Unlocked by ``days`` consecutive days with any exercise."""
+
+    def __init__(self, name, days):
+        super().__init__(name, f"Exercise {days} days in a row")
+        self.days = days
+
+    def triggered_by(self, change):
+        return bool(change.days)
+
+    def is_met(self, change):
+        streak = change.streak()
+        return streak is not None and change.old_longest < self.days <= streak.longest
+
+    @classmethod
+    def earned_select(cls, rules, after_id, upto_id):
+        tiers = _tier_table(
+            [{"name": r.name, "days": r.days, "description": r.description} for r in rules]
+        )
+        return select(UserStreak.user_id, tiers.c.name, tiers.c.description).where(
+            UserStreak.user_id > after_id,
+            UserStreak.user_id <= upto_id,
+            UserStreak.longest >= tiers.c.days,
+        )
+
+
+class WeeklySessionsRule(AchievementRule):
+    """Unlocked by exercising on ``sessions`` different days of one calendar week."""
+
+    span = 7
+
+    def __init__(self, name, sessions):
+        super().__init__(name, f"Exercise on {sessions} days in one week")
+        self.sessions = sessions
+
+    def triggered_by(self, change):
+        return bool(change.days)
+
+    def is_met(self, change):
+        per_week = defaultdict(int)
+        for day in change.active_days():
+            per_week[period_start("week", day)] += 1
+        added = defaultdict(int)
+        for day in change.new_days():
+            added[period_start("week", day)] += 1
+        return any(
+            per_week[week] - new < self.sessions <= per_week[week] for week, new in added.items()
+        )
+
+    @classmethod
+    def earned_select(cls, rules, after_id, upto_id):
+        # Sessions are distinct active days, so count day rows per week rather
+        # than exercise counts. Each day belongs to the latest week row starting
+        # on or before it, which avoids dialect-specific date arithmetic.
+        day = aliased(PointsRollup)
+        week = aliased(PointsRollup)
+        week_start = (
+            select(func.max(week.period_start))
+            .where(
+                week.user_id == day.user_id,
+                week.period == "week",
+                week.period_start <= day.period_start,
+            )
+            .scalar_subquery()
+        )
+        per_week = (
+            select(day.user_id.label("user_id"), func.count().label("sessions"))
+            .where(day.user_id > after_id, day.user_id <= upto_id, day.period == "day")
+            .group_by(day.user_id, week_start)
+            .subquery()
+        )
+        best = (
+            select(per_week.c.user_id, func.max(per_week.c.sessions).label("sessions"))
+            .group_by(per_week.c.user_id)
+            .subquery()
+        )
+        tiers = _tier_table(
+            [{"name": r.name, "sessions": r.sessions, "description": r.description} for r in rules]
+        )
+        return select(best.c.user_id, tiers.c.name, tiers.c.description).where(
+            best.c.sessions >= tiers.c.sessions
+        )
+
+
+def default_rules():
+    """Build the shipped rules from the tier tables in ``models.constants``."""
+    rules = [PointsRule(name, threshold) for name, threshold in ACHIEVEMENT_TIERS.items()]
+    for exercise_type, tiers in EXERCISE_RANKS.items():
+        for threshold, tier in tiers:
+            if threshold > 0:
+                rules.append(
+                    ExerciseTotalRule(
+                        f"{exercise_type.capitalize()} {tier}",
+                        exercise_type,
+                        threshold,
+                        f"Reach {tier} rank in {exercise_type} ({threshold} total)",
+                    )
+                )
+    rules += [StreakRule(name, days) for name, days in STREAK_ACHIEVEMENTS.items()]
+    rules += [
+        WeeklySessionsRule(name, sessions) for name, sessions in WEEKLY_SESSION_ACHIEVEMENTS.items()
+    ]
+    return rules
+
+
+RULES = default_rules()
+
+
+def register_rule(rule):
+    """Add a rule to the set evaluated on every write and by recompute-achievements."""
+    RULES.append(rule)
+    return rule
+
+
+def max_rule_span():
+    return max((rule.span for rule in RULES), default=1)
+
+
+def _insert_missing(query, user_id, name):
+    """INSERT ... SELECT ``query``'s rows, skipping achievements the user already has."""
+    columns = ["user_id", "name", "description", "unlocked_at"]
+    dialect_insert = conflict_insert()
+    if dialect_insert is not None:
+        # SQLite needs a WHERE before ON CONFLICT to tell it apart from a join's ON
+        query = query.where(true())
+        stmt = dialect_insert(Achievement).from_select(columns, query).on_conflict_do_nothing()
+    else:
+        query = query.where(
+            ~exists().where(and_(Achievement.user_id == user_id, Achievement.name == name))
+        )
+        stmt = insert(Achievement).from_select(columns, query)
+    return db.session.execute(stmt).rowcount
+
+
+def evaluate_achievements(change):
+    """Unlock, in the current transaction, every rule the change satisfies.
+
+    Returns the names of the rules that were met; any the user already had
+    are left untouched.
+    """
+    met = [rule for rule in RULES if rule.triggered_by(change) and rule.is_met(change)]
+    if met:
+        earned = _tier_table(
+            [
+                {"user_id": change.user_id, "name": rule.name, "description": rule.description}
+                for rule in met
+            ]
+        )
+        _insert_missing(
+            select(
+                earned.c.user_id, earned.c.name, earned.c.description, literal(datetime.utcnow())
+            ),
+            earned.c.user_id,
+            earned.c.name,
+        )
+    return [rule.name for rule in met]
+
+
+def max_user_id():
+    return db.session.execute(select(func.max(User.id))).scalar() or 0
+
+
+def recompute_achievements(after_id, upto_id, now=None):
+    """Insert every missing achievement for users with ``after_id < id <= upto_id``.
+
+    Each rule class that supports set-based evaluation contributes one
+    select joining its aggregate table against an inline table of its rules.
+    All of them feed a single ``INSERT ... SELECT``. Rows that already exist
+    are skipped through the ``(user_id, name)`` unique constraint
+    (``ON CONFLICT DO NOTHING``) or, on other databases, a ``NOT EXISTS``
+    filter. Returns the number of rows added.
+    """
+    by_class = defaultdict(list)
+    for rule in RULES:
+        by_class[type(rule)].append(rule)
+    selects = [
+        query
+        for cls, rules in by_class.items()
+        if (query := cls.earned_select(rules, after_id, upto_id)) is not None
+    ]
+    if not selects:
+        return 0
+    earned = union_all(*selects).subquery("earned")
+    user_id, name, description = earned.c
+    return _insert_missing(
+        select(user_id, name, description, literal(now or datetime.utcnow())), user_id, name
+    )
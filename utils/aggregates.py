@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Grains kept by the rollup tables
+ROLLUP_PERIODS = ("day", "week", "month")
+
+
+def period_start(period, day):
+    """Return the first day of the rollup period containing ``day``."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period_start(period, start):
+    """Return the first day of the period following the one starting at ``start``."""
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def conflict_insert():
+    """Return the dialect ``insert`` supporting ``ON CONFLICT`` for the bound database, or None."""
+    return _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+
+
+def increment(model, keys, rows):
+    """Add each row's counters onto the aggregate row matching its ``keys`` columns.
+
+    Rows that do not exist yet are created. On SQLite and PostgreSQL this is a
+    single atomic ``INSERT ... ON CONFLICT DO UPDATE`` executed for all rows;
+    ``keys`` must match a unique constraint on ``model``.
+    """
+    if not rows:
+        return
+    counters = [column for column in rows[0] if column not in keys]
+    dialect_insert = conflict_insert()
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: getattr(model, column) + stmt.excluded[column] for column in counters},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(model)
+            .filter_by(**{key: row[key] for key in keys})
+            .values({column: getattr(model, column) + row[column] for column in counters})
+        )
+        if not result.rowcount:
+            db.session.execute(insert(model).values(**row))
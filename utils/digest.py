@@ -0,0 +1,165 @@
+import logging
+import smtplib
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import select
+
+from extensions import db, mail
+from models import Achievement, ExerciseRollup, PointsRollup, User, UserExerciseTotal, UserStreak
+from utils.aggregates import period_start
+from utils.scoring import scoring
+
+logger = logging.getLogger(__name__)
+
+DIGEST_TEMPLATE = "emails/weekly_digest.txt"
+CHECKPOINT_PREFIX = "weekly-digest:"
+
+
+def digest_week(today=None):
+    """Return the Monday starting the last full week before ``today``."""
+    today = today or datetime.now().date()
+    return period_start("week", today) - timedelta(days=7)
+
+
+def checkpoint_name(week_start):
+    return CHECKPOINT_PREFIX + week_start.isoformat()
+
+
+def _by_user(rows):
+    grouped = defaultdict(dict)
+    for user_id, key, value in rows:
+        grouped[user_id][key] = value
+    return grouped
+
+
+def digest_chunk(after_id, upto_id, week_start, rank_index, today=None):
+    """Build the digests of active users with ``after_id < id <= upto_id``.
+
+    Every figure comes from one aggregate query over the whole id range, so
+    a chunk costs the same handful of queries however many users it holds.
+    Overall positions are read from ``rank_index``, built once per run.
+    """
+    today = today or datetime.now().date()
+    week_end = week_start + timedelta(days=7)
+
+    users = db.session.execute(
+        select(User.id, User.username, User.email, User.exercise_points)
+        .where(User.id > after_id, User.id <= upto_id, User.is_active.is_(True))
+        .order_by(User.id)
+    ).all()
+    if not users:
+        return []
+
+    week_points = dict(
+        db.session.execute(
+            select(PointsRollup.user_id, PointsRollup.points).where(
+                PointsRollup.user_id > after_id,
+                PointsRollup.user_id <= upto_id,
+                PointsRollup.period == "week",
+                PointsRollup.period_start == week_start,
+            )
+        ).all()
+    )
+    week_counts = _by_user(
+        db.session.execute(
+            select(
+                ExerciseRollup.user_id, ExerciseRollup.exercise_type, ExerciseRollup.count
+            ).where(
+                ExerciseRollup.user_id > after_id,
+                ExerciseRollup.user_id <= upto_id,
+                ExerciseRollup.period == "week",
+                ExerciseRollup.period_start == week_start,
+            )
+        ).all()
+    )
+    totals = _by_user(
+        db.session.execute(
+            select(
+                UserExerciseTotal.user_id, UserExerciseTotal.exercise_type, UserExerciseTotal.total
+            ).where(UserExerciseTotal.user_id > after_id, UserExerciseTotal.user_id <= upto_id)
+        ).all()
+    )
+    unlocked = defaultdict(list)
+    for user_id, name in db.session.execute(
+        select(Achievement.user_id, Achievement.name)
+        .where(
+            Achievement.user_id > after_id,
+            Achievement.user_id <= upto_id,
+            Achievement.unlocked_at >= datetime.combine(week_start, time.min),
+            Achievement.unlocked_at < datetime.combine(week_end, time.min),
+        )
+        .order_by(Achievement.unlocked_at, Achievement.id)
+    ):
+        unlocked[user_id].append(name)
+    streaks = {
+        streak.user_id: streak
+        for streak in db.session.execute(
+            select(UserStreak).where(UserStreak.user_id > after_id, UserStreak.user_id <= upto_id)
+        ).scalars()
+    }
+
+    digests = []
+    for user_id, username, email, points in users:
+        user_totals = totals.get(user_id, {})
+        exercise_types = sorted(user_totals)
+        ranks = scoring.rank_batch(exercise_types, [user_totals[t] for t in exercise_types])
+        streak = streaks.get(user_id)
+        digests.append(
+            {
+                "user_id": user_id,
+                "username": username,
+                "email": email,
+                "week_start": week_start,
+                "week_end": week_end - timedelta(days=1),
+                "week_points": week_points.get(user_id, 0),
+                "total_points": points or 0,
+                "tier": scoring.user_rank(points or 0),
+                "position": rank_index.rank(points or 0),
+                "exercises": [
+                    {
+                        "type": exercise_type,
+                        "week": week_counts.get(user_id, {}).get(exercise_type, 0),
+                        "total": user_totals[exercise_type],
+                        "rank": rank,
+                    }
+                    for exercise_type, rank in zip(exercise_types, ranks)
+                ],
+                "achievements": unlocked.get(user_id, []),
+                "current_streak": streak.current_streak(today) if streak else 0,
+                "longest_streak": streak.longest if streak else 0,
+            }
+        )
+    return digests
+
+
+def send_digests(digests, on_sent=None):
+    """Render and send ``digests`` over one SMTP connection; return ``(sent, failed)``.
+
+    The template is looked up once for the whole chunk. A message the server
+    refuses is logged and skipped; losing the connection raises. ``on_sent``
+    is called with each user id once its message is handed to the server or
+    refused, so the caller can checkpoint past it before the next send.
+    """
+    if not digests:
+        return 0, 0
+    template = current_app.jinja_env.get_template(DIGEST_TEMPLATE)
+    sent = failed = 0
+    with mail.connect() as conn:
+        for digest in digests:
+            message = Message(
+                subject=f"Your GameFit week: {digest['week_points']} points",
+                recipients=[digest["email"]],
+                body=template.render(**digest),
+            )
+            try:
+                conn.send(message)
+                sent += 1
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as ex:
+                logger.warning(f"Weekly digest to user {digest['user_id']} failed: {ex}")
+                failed += 1
+            if on_sent is not None:
+                on_sent(digest["user_id"])
+    return sent, failed
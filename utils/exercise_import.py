@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from extensions import db
+from utils.exercise_log import log_exercises
+from utils.scoring import scoring
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# Row-level errors kept in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+INVALID_ENCODING = "File is not valid UTF-8; this row and the rest were not imported"
+
+
+def validate_entry(item, latest, earliest=None):
+    """Validate one exercise entry; return ``(entry, None)`` or ``(None, message)``.
+
+    ``entry`` is ready for :func:`utils.exercise_log.log_exercises` once its
+    points are filled in. Dates must fall in [``earliest``, ``latest``];
+    ``earliest`` None means no lower bound.
+    """
+    if not isinstance(item, dict) or not all(k in item for k in ("type", "count", "date")):
+        return None, "Missing required fields"
+    if not scoring.is_valid_type(item["type"]):
+        return None, "Invalid exercise type"
+    count = item["count"]
+    if isinstance(count, bool) or not isinstance(count, int) or count <= 0:
+        return None, "Count must be a positive integer"
+    intensity = item.get("intensity", 1.0)
+    if isinstance(intensity, bool) or not isinstance(intensity, (int, float)):
+        return None, "Intensity must be a number"
+    try:
+        exercise_date = datetime.strptime(item["date"], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None, "Invalid date format"
+    if exercise_date > latest:
+        return None, "Date cannot be in the future"
+    if earliest is not None and exercise_date < earliest:
+        return None, f"Date must be between {earliest.isoformat()} and {latest.isoformat()}"
+    return {
+        "exercise_type": item["type"],
+        "count": count,
+        "intensity": intensity,
+        "date_added": datetime.combine(exercise_date, datetime.min.time()),
+    }, None
+
+
+def detect_format(filename="", mimetype=""):
+    """Guess the import format from a file name or content type; None if unknown."""
+    filename = (filename or "").lower()
+    if filename.endswith(".csv") or mimetype == "text/csv":
+        return "csv"
+    if filename.endswith((".ndjson", ".jsonl")) or mimetype in (
+        "application/x-ndjson",
+        "application/jsonl",
+    ):
+        return "ndjson"
+    return None
+
+
+def _number(value, convert):
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def iter_csv_rows(stream):
+    """Yield one dict per CSV data row; the header names the ``type,count,date`` columns."""
+    for row in csv.DictReader(stream):
+        row = {key: value for key, value in row.items() if key and value not in (None, "")}
+        if "count" in row:
+            row["count"] = _number(row["count"], int)
+        if "intensity" in row:
+            row["intensity"] = _number(row["intensity"], float)
+        yield row
+
+
+def iter_ndjson_rows(stream):
+    """Yield one object per non-blank line; unparsable lines yield None."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def iter_rows(stream, fmt):
+    """Stream rows from a text or binary file object in ``fmt`` (csv or ndjson)."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    return iter_ndjson_rows(stream)
+
+
+def _read_chunk(rows, size):
+    """Return up to ``size`` rows, and whether the input broke off on a decoding error."""
+    chunk = []
+    try:
+        for item in islice(rows, size):
+            chunk.append(item)
+    except UnicodeDecodeError:
+        return chunk, True
+    return chunk, False
+
+
+def _import_chunk(user, chunk, first_row, today, report):
+    """Validate ``chunk`` and commit its valid rows in one transaction, updating ``report``."""
+    entries = []
+    for row, item in enumerate(chunk, start=first_row):
+        entry, error = validate_entry(item, today)
+        if error:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row, "message": error})
+        else:
+            entries.append(entry)
+    if not entries:
+        return
+
+    points = scoring.score_batch(
+        [entry["exercise_type"] for entry in entries], [entry["count"] for entry in entries]
+    )
+    for entry, entry_points in zip(entries, points):
+        entry["points"] = entry_points
+    try:
+        log_exercises(user, entries)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    report["imported"] += len(entries)
+    report["points"] += sum(points)
+
+
+def import_exercises(user, rows, chunk_size=1000, today=None):
+    """Import historical exercises for ``user`` from an iterable of row dicts.
+
+    Rows are validated with the same rules as the API, except that any past
+    date is allowed. Valid rows are written ``chunk_size`` at a time, each
+    chunk in its own transaction with one points, totals and rollup update, so
+    memory stays bounded by the chunk size no matter how long the input is.
+    Returns a report of imported and failed rows with the first errors.
+
+    Input that stops decoding as UTF-8 ends the import: the rows read before
+    it are committed, ``complete`` is False and the last error names the row
+    where reading stopped, so the caller knows what was saved.
+    """
+    today = today or datetime.now().date()
+    report = {"imported": 0, "failed": 0, "points": 0, "errors": [], "complete": True}
+    rows = iter(rows)
+    line = 0
+    while True:
+        chunk, broken = _read_chunk(rows, chunk_size)
+        _import_chunk(user, chunk, line + 1, today, report)
+        line += len(chunk)
+        if broken:
+            report["complete"] = False
+            report["errors"].append({"row": line + 1, "message": INVALID_ENCODING})
+            return report
+        if not chunk:
+            return report
@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from sqlalchemy import insert
+
+from extensions import db
+from models import Exercise
+from utils.achievements import ActivityChange, evaluate_achievements
+from utils.leaderboard import (
+    add_exercise_total,
+    add_exercise_totals,
+    rollup_points,
+    rollup_points_by_day,
+)
+from utils.points import award_points
+from utils.stats import rollup_exercise, rollup_exercises
+from utils.streaks import record_active_days
+
+
+def log_exercise(user, exercise_type, count, points, date_added, intensity=1.0):
+    """Add an exercise and apply its point and rollup updates in the current transaction.
+
+    Every write path that awards exercise points should go through here so the
+    aggregates read by the leaderboards, the user's streak, and the achievements
+    unlocked by the new totals stay in step with the exercise table.
+    """
+    exercise = Exercise(
+        user_id=user.id,
+        exercise_type=exercise_type,
+        count=count,
+        intensity=intensity,
+        points=points,
+        date_added=date_added,
+    )
+    new_points = award_points(user, points)
+    db.session.add(exercise)
+    rollup_points(user.id, date_added.date(), points)
+    add_exercise_total(user.id, exercise_type, count)
+    rollup_exercise(user.id, exercise_type, date_added.date(), count, points)
+    if new_points is not None:
+        old_longest, streak = record_active_days(user.id, [date_added.date()])
+        evaluate_achievements(
+            ActivityChange(
+                user.id,
+                new_points - points,
+                new_points,
+                {exercise_type: count},
+                {date_added.date(): points},
+                streak=streak,
+                old_longest=old_longest,
+            )
+        )
+    return exercise
+
+
+def log_exercises(user, entries):
+    """Bulk variant of :func:`log_exercise` for many entries of one user.
+
+    ``entries`` are dicts with ``exercise_type``, ``count``, ``points``,
+    ``date_added`` and ``intensity``. The rows are inserted with a single
+    executemany, and the points, totals and rollups are applied once per user,
+    period and type rather than once per entry. Returns the new ids in input order.
+    """
+    if not entries:
+        return []
+    rows = [dict(entry, user_id=user.id) for entry in entries]
+    ids = (
+        db.session.execute(
+            insert(Exercise).returning(Exercise.id, sort_by_parameter_order=True), rows
+        )
+        .scalars()
+        .all()
+    )
+
+    points_by_day = defaultdict(int)
+    count_by_type = defaultdict(int)
+    by_type_day = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        day = entry["date_added"].date()
+        points_by_day[day] += entry["points"]
+        count_by_type[entry["exercise_type"]] += entry["count"]
+        totals = by_type_day[(entry["exercise_type"], day)]
+        totals[0] += entry["count"]
+        totals[1] += entry["points"]
+
+    points = sum(points_by_day.values())
+    new_points = award_points(user, points)
+    rollup_points_by_day(user.id, points_by_day)
+    add_exercise_totals(user.id, count_by_type)
+    rollup_exercises(user.id, by_type_day)
+    if new_points is not None:
+        old_longest, streak = record_active_days(user.id, points_by_day)
+        evaluate_achievements(
+            ActivityChange(
+                user.id,
+                new_points - points,
+                new_points,
+                count_by_type,
+                points_by_day,
+                streak=streak,
+                old_longest=old_longest,
+            )
+        )
+    return ids
@@ -1,11 +1,39 @@
+from flask import g
 from flask_jwt_extended import get_jwt_identity
 from extensions import db
 from models import User
+from utils.user_cache import load_user_summary
+
+
+def _current_identity():
+    uid = get_jwt_identity()
+    return int(uid) if uid else None
 
 
 def get_current_user():
+    """Return the authenticated User, loaded at most once per request."""
+    try:
+        uid = _current_identity()
+        if uid is None:
+            return None
+        memo = g.get("_current_user")
+        if memo is None or memo[0] != uid:
+            memo = g._current_user = (uid, db.session.get(User, uid))
+        return memo[1]
+    except Exception:  # Catch any exception but log it properly
+        return None
+
+
+def get_current_user_summary():
+    """Return a cached UserSummary of the authenticated user, or None.
+
+    For read paths that only need the user's id, name and points (authorization,
+    the page header, leaderboard position); it avoids the database entirely
+    while the summary is cached. Use ``get_current_user`` to modify the user or
+    follow relationships.
+    """
     try:
-        uid = get_jwt_identity()
-        return db.session.get(User, uid) if uid else None
+        uid = _current_identity()
+        return load_user_summary(uid) if uid is not None else None
     except Exception:  # Catch any exception but log it properly
         return None
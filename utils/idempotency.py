@@ -0,0 +1,155 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _error(status, message):
+    return jsonify({"code": status, "message": message}), status
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return _error(422, "Idempotency-Key was already used for a different request")
+    if record.status_code is None:
+        return _error(409, "A request with this Idempotency-Key is still in progress")
+    response = current_app.response_class(
+        record.response_body, status=record.status_code, mimetype="application/json"
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(user_id, key_hash, request_hash):
+    """Insert an in-progress row for the key; return it, or the row that already holds it."""
+    now = datetime.utcnow()
+    lock_timeout = timedelta(seconds=current_app.config.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key_hash=key_hash).first()
+    if record is not None:
+        expired = record.expires_at <= now
+        abandoned = record.status_code is None and record.created_at <= now - lock_timeout
+        if not (expired or abandoned):
+            return record, False
+        db.session.delete(record)
+        db.session.flush()
+
+    record = IdempotencyKey(
+        user_id=user_id,
+        key_hash=key_hash,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + timedelta(seconds=current_app.config.get("IDEMPOTENCY_KEY_TTL", 86400)),
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker claimed the key between our lookup and insert
+        db.session.rollback()
+        return IdempotencyKey.query.filter_by(user_id=user_id, key_hash=key_hash).one(), False
+    return record, True
+
+
+def _release(record):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record.id))
+    db.session.commit()
+
+
+def _run_view(view, args, kwargs):
+    """Run ``view``, rolling back whatever it wrote if it raises."""
+    try:
+        return make_response(view(*args, **kwargs))
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def idempotent(view):
+    """Make a JSON endpoint safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key runs the view and stores its response; retries
+    with the same key and body get the stored response back without running the
+    view again. Requests without the header are unaffected. Server errors are
+    not stored, so the client may retry them. Must be applied under
+    ``jwt_required`` because keys are scoped per user.
+
+    The decorator owns the transaction: decorated views flush but never commit,
+    and their writes are committed together with the stored response. A key
+    without a response therefore never has a committed write behind it, so one
+    left by a crashed request can be reclaimed after ``IDEMPOTENCY_LOCK_TIMEOUT``.
+    A request that outlives its claim finds its key reclaimed and answers 409
+    with its writes rolled back, leaving the retry's outcome as the only one.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            response = _run_view(view, args, kwargs)
+            if response.status_code >= 500:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            return response
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        user_id = get_jwt_identity()
+        request_hash = _digest(request.method, request.path, request.get_data())
+        record, claimed = _claim(user_id, _digest(key), request_hash)
+        if not claimed:
+            return _replay(record, request_hash)
+
+        try:
+            response = _run_view(view, args, kwargs)
+        except Exception:
+            _release(record)
+            raise
+        if response.status_code >= 500:
+            _release(record)
+            return response
+
+        stored = db.session.execute(
+            update(IdempotencyKey)
+            # A reclaimed key is a new row, which may reuse the id but not the claim time
+            .where(IdempotencyKey.id == record.id, IdempotencyKey.created_at == record.created_at)
+            .values(status_code=response.status_code, response_body=response.get_data(as_text=True))
+            .execution_options(synchronize_session=False)
+        )
+        if stored.rowcount != 1:
+            db.session.rollback()
+            return _error(
+                409, "Idempotency-Key was reclaimed by a retry; this request was not applied"
+            )
+        db.session.commit()
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(now=None):
+    """Delete expired idempotency keys; return how many were removed."""
+    result = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,286 @@
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, tuple_
+
+from extensions import db
+from models import Exercise, PointsRollup, User, UserExerciseTotal
+from utils.aggregates import ROLLUP_PERIODS, increment, period_start
+from utils.points import on_points_changed
+from utils.snapshot_cache import SnapshotCache, SqliteSnapshotStore
+
+# Leaderboard windows; "all" ranks by User.exercise_points
+WINDOWS = ("all", "week", "month", "30d")
+WINDOW_LABELS = {
+    "all": "All Time",
+    "week": "This Week",
+    "month": "This Month",
+    "30d": "Last 30 Days",
+}
+ROLLING_DAYS = 30
+
+
+def rollup_points(user_id, day, points):
+    """Add points earned on ``day`` to the user's day, week and month rollups."""
+    rollup_points_by_day(user_id, {day: points})
+
+
+def rollup_points_by_day(user_id, points_by_day):
+    """Add a ``{day: points}`` mapping to the user's rollups in one upsert.
+
+    Days falling into the same week or month are merged first, so a long
+    history costs one row per period rather than one per day.
+    """
+    merged = defaultdict(int)
+    for day, points in points_by_day.items():
+        for period in ROLLUP_PERIODS:
+            merged[(period, period_start(period, day))] += points
+    rows = [
+        {"user_id": user_id, "period": period, "period_start": start, "points": points}
+        for (period, start), points in merged.items()
+    ]
+    increment(PointsRollup, ("period", "period_start", "user_id"), rows)
+
+
+def add_exercise_total(user_id, exercise_type, count):
+    """Add ``count`` to the user's running total for the exercise type."""
+    add_exercise_totals(user_id, {exercise_type: count})
+
+
+def add_exercise_totals(user_id, counts_by_type):
+    """Add a ``{exercise_type: count}`` mapping to the user's running totals."""
+    increment(
+        UserExerciseTotal,
+        ("user_id", "exercise_type"),
+        [
+            {"user_id": user_id, "exercise_type": exercise_type, "total": count}
+            for exercise_type, count in counts_by_type.items()
+        ],
+    )
+
+
+def rebuild_exercise_totals():
+    """Recompute user_exercise_totals from the exercise table in one set-based statement."""
+    db.session.execute(delete(UserExerciseTotal))
+    totals = select(Exercise.user_id, Exercise.exercise_type, func.sum(Exercise.count)).group_by(
+        Exercise.user_id, Exercise.exercise_type
+    )
+    db.session.execute(
+        insert(UserExerciseTotal).from_select(["user_id", "exercise_type", "total"], totals)
+    )
+    return db.session.query(UserExerciseTotal).count()
+
+
+def rebuild_points_rollups(chunk_size=1000):
+    """Recompute points_rollup from per-user daily sums, upserting one chunk at a time."""
+    db.session.execute(delete(PointsRollup))
+    day = func.date(Exercise.date_added)
+    daily = db.session.execute(
+        select(Exercise.user_id, day, func.sum(Exercise.points)).group_by(Exercise.user_id, day),
+        execution_options={"stream_results": True},
+    )
+    days = 0
+    for partition in daily.partitions(chunk_size):
+        # A user's days in one week or month share a row; one upsert must not hit it twice
+        merged = defaultdict(int)
+        for user_id, active_day, points in partition:
+            if isinstance(active_day, str):
+                active_day = date.fromisoformat(active_day)
+            for period in ROLLUP_PERIODS:
+                merged[(user_id, period, period_start(period, active_day))] += points or 0
+        rows = [
+            {"user_id": user_id, "period": period, "period_start": start, "points": points}
+            for (user_id, period, start), points in merged.items()
+        ]
+        increment(PointsRollup, ("period", "period_start", "user_id"), rows)
+        days += len(partition)
+    return days
+
+
+def leaderboard_order():
+    """Canonical all-time ordering, matching the (exercise_points, id) index."""
+    return (User.exercise_points.desc(), User.id.desc())
+
+
+def users_around(user, radius):
+    """Return ``(position, above, below)`` for ``user`` in the all-time order.
+
+    ``above`` and ``below`` hold up to ``radius`` users each, best first,
+    read with keyset seeks on the (exercise_points, id) index. The position
+    is a range count on the same key, so all three come from the database
+    in one transaction and agree with the caller's current points.
+    """
+    key = tuple_(User.exercise_points, User.id)
+    mine = tuple_(user.exercise_points or 0, user.id)
+    position = db.session.query(func.count(User.id)).filter(key > mine).scalar() + 1
+    above = (
+        User.query.filter(key > mine)
+        .order_by(User.exercise_points.asc(), User.id.asc())
+        .limit(radius)
+        .all()
+    )
+    below = User.query.filter(key < mine).order_by(*leaderboard_order()).limit(radius).all()
+    return position, list(reversed(above)), below
+
+
+def _window_points_query(window, today):
+    """Return a (user_id, points) query for a rollup-backed window."""
+    if window == "30d":
+        total = func.sum(PointsRollup.points)
+        return (
+            db.session.query(PointsRollup.user_id.label("user_id"), total.label("points"))
+            .filter(
+                PointsRollup.period == "day",
+                PointsRollup.period_start > today - timedelta(days=ROLLING_DAYS),
+            )
+            .group_by(PointsRollup.user_id)
+        )
+    return db.session.query(
+        PointsRollup.user_id.label("user_id"), PointsRollup.points.label("points")
+    ).filter(
+        PointsRollup.period == window,
+        PointsRollup.period_start == period_start(window, today),
+    )
+
+
+def window_top(window, limit, offset=0, today=None):
+    """Return ``[(user, points)]`` for the window, best first."""
+    if window == "all":
+        query = User.query.order_by(*leaderboard_order())
+        if offset:
+            query = query.offset(offset)
+        return [(user, user.exercise_points) for user in query.limit(limit).all()]
+
+    today = today or datetime.now().date()
+    scores = _window_points_query(window, today).subquery()
+    rows = (
+        db.session.query(User, scores.c.points)
+        .join(scores, scores.c.user_id == User.id)
+        .order_by(scores.c.points.desc(), User.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [(user, points) for user, points in rows]
+
+
+def window_count(window, today=None):
+    """Return how many users have points in the window."""
+    if window == "all":
+        return User.query.count()
+    today = today or datetime.now().date()
+    return _window_points_query(window, today).order_by(None).count()
+
+
+def window_points(user, window, today=None):
+    """Return the points the user earned in the window."""
+    if window == "all":
+        return user.exercise_points or 0
+    today = today or datetime.now().date()
+    scores = _window_points_query(window, today).subquery()
+    return db.session.query(scores.c.points).filter(scores.c.user_id == user.id).scalar() or 0
+
+
+def window_rank(user, window, today=None):
+    """Return the user's 1-based rank in a rollup-backed window, ties sharing a rank."""
+    today = today or datetime.now().date()
+    points = window_points(user, window, today)
+    scores = _window_points_query(window, today).subquery()
+    ahead = db.session.query(func.count()).select_from(scores).filter(scores.c.points > points)
+    return ahead.scalar() + 1
+
+
+def exercise_top(exercise_type, limit):
+    """Return ``[(user, total)]`` for the exercise type, best first."""
+    rows = (
+        db.session.query(User, UserExerciseTotal.total)
+        .join(UserExerciseTotal, UserExerciseTotal.user_id == User.id)
+        .filter(UserExerciseTotal.exercise_type == exercise_type)
+        .order_by(UserExerciseTotal.total.desc(), UserExerciseTotal.user_id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [(user, total) for user, total in rows]
+
+
+def exercise_total(user, exercise_type):
+    """Return the user's running total for the exercise type."""
+    total = (
+        db.session.query(UserExerciseTotal.total)
+        .filter_by(user_id=user.id, exercise_type=exercise_type)
+        .scalar()
+    )
+    return total or 0
+
+
+def exercise_rank(user, exercise_type):
+    """Return the user's 1-based rank for the exercise type, ties sharing a rank."""
+    ahead = UserExerciseTotal.query.filter(
+        UserExerciseTotal.exercise_type == exercise_type,
+        UserExerciseTotal.total > exercise_total(user, exercise_type),
+    ).count()
+    return ahead + 1
+
+
+class Player(namedtuple("Player", "id username exercise_points")):
+    """Detached leaderboard row that renders like a User."""
+
+    __slots__ = ()
+    get_rank = User.get_rank
+
+
+def get_leaderboard_cache():
+    """Return this app's leaderboard snapshot cache."""
+    cache = current_app.extensions.get("leaderboard_cache")
+    if cache is None:
+        path = current_app.config.get("LEADERBOARD_CACHE_PATH")
+        cache = SnapshotCache(
+            max_entries=current_app.config.get("LEADERBOARD_CACHE_SIZE", 128),
+            ttl=current_app.config.get("LEADERBOARD_CACHE_TTL", 30),
+            sync_interval=current_app.config.get("LEADERBOARD_CACHE_SYNC_MS", 1000) / 1000,
+            store=SqliteSnapshotStore(path) if path else None,
+        )
+        cache = current_app.extensions.setdefault("leaderboard_cache", cache)
+    return cache
+
+
+def cached_window_top(window, limit, offset=0):
+    """``window_top`` served from the snapshot cache, as ``[(Player, points)]``."""
+    today = datetime.now().date()
+    day_key = today.isoformat() if window != "all" else ""
+    key = f"top:{window}:{day_key}:{limit}:{offset}"
+
+    def compute():
+        rows = [
+            [user.id, user.username, user.exercise_points, points]
+            for user, points in window_top(window, limit, offset, today)
+        ]
+        if window != "all":
+            return rows, None
+        # A full all-time page only changes for its own users or users reaching its last score
+        cutoff = rows[-1][3] if len(rows) == limit else 0
+        return rows, {"user_ids": [row[0] for row in rows], "cutoff": cutoff}
+
+    rows = get_leaderboard_cache().fetch(key, compute)
+    return [(Player(*row[:3]), row[3]) for row in rows]
+
+
+def cached_window_count(window):
+    """``window_count`` served from the snapshot cache."""
+    today = datetime.now().date()
+    day_key = today.isoformat() if window != "all" else ""
+
+    def compute():
+        # Point changes never alter the all-time user count, only registrations (TTL bound)
+        meta = {"user_ids": [], "cutoff": None} if window == "all" else None
+        return window_count(window, today), meta
+
+    return get_leaderboard_cache().fetch(f"count:{window}:{day_key}", compute)
+
+
+@on_points_changed
+def _invalidate_snapshots(user_id, old_points, new_points):
+    cache = current_app.extensions.get("leaderboard_cache")
+    if cache is not None:
+        cache.invalidate(user_id, new_points)
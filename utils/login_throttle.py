@@ -0,0 +1,221 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+
+_start_lock = threading.Lock()
+
+
+def _refill(state, capacity, rate, now):
+    """Return the tokens a bucket holds at ``now``; a missing bucket is full."""
+    if state is None:
+        return float(capacity)
+    tokens, updated = state
+    return min(float(capacity), tokens + (now - updated) * rate)
+
+
+def _take(states, buckets, now):
+    """Take one token from every bucket, or from none of them.
+
+    ``buckets`` is a list of ``(key, capacity, rate)`` and ``states`` maps keys
+    to their stored ``(tokens, updated)``. Returns ``(retry_after, blocked_key,
+    updates)``: ``retry_after`` is 0 when the attempt is admitted, and
+    ``updates`` holds the new state of each bucket to store.
+    """
+    levels = {key: _refill(states.get(key), capacity, rate, now) for key, capacity, rate in buckets}
+    for key, _, rate in buckets:
+        if levels[key] < 1:
+            return (1 - levels[key]) / rate, key, {}
+    return 0, None, {key: (levels[key] - 1, now) for key, _, _ in buckets}
+
+
+class MemoryBucketStore:
+    """Token buckets for this worker process, capped at ``max_keys`` (least recently used go first).
+
+    An evicted bucket simply starts full again.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, buckets, now):
+        with self._lock:
+            states = {key: self._buckets.get(key) for key, _, _ in buckets}
+            retry_after, blocked, updates = _take(states, buckets, now)
+            for key, state in updates.items():
+                self._buckets[key] = state
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after, blocked
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """Token buckets in a local SQLite file shared by all workers on a host.
+
+    Each attempt reads and updates its buckets in one ``BEGIN IMMEDIATE``
+    transaction, so concurrent workers cannot both spend the last token.
+    Buckets idle for longer than ``idle_after`` seconds have refilled and are
+    purged every ``purge_every`` attempts.
+    """
+
+    def __init__(self, path, idle_after=3600, purge_every=1000):
+        self.path = path
+        self.idle_after = idle_after
+        self.purge_every = purge_every
+        self._attempts = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bucket "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self, buckets, now):
+        keys = [key for key, _, _ in buckets]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM bucket WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            states = {key: (tokens, updated) for key, tokens, updated in rows}
+            retry_after, blocked, updates = _take(states, buckets, now)
+            conn.executemany(
+                "INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, tokens, updated) for key, (tokens, updated) in updates.items()],
+            )
+            self._attempts += 1
+            if self._attempts % self.purge_every == 0:
+                conn.execute("DELETE FROM bucket WHERE updated < ?", (now - self.idle_after,))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return retry_after, blocked
+
+    def reset(self, key):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM bucket WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM bucket").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class LoginThrottle:
+    """Token-bucket limit on login attempts per username and per client IP.
+
+    Each bucket holds up to its limit of attempts and refills at limit/window
+    per second, so a user gets a burst of ``user_limit`` tries and then one more
+    every ``window / user_limit`` seconds. An attempt must find a token in both
+    its buckets and is rejected without spending either otherwise. A successful
+    login refills the username's bucket; the IP bucket keeps draining so one
+    address cannot cycle through many accounts.
+    """
+
+    def __init__(self, user_limit=5, ip_limit=20, window=300, store=None):
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.window = window
+        self.store = store if store is not None else MemoryBucketStore()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected_user = 0
+        self.rejected_ip = 0
+
+    @staticmethod
+    def _user_key(username):
+        return "user:" + (username or "").strip().lower()
+
+    def check(self, username, ip):
+        """Spend one attempt; return 0 if it may proceed, else seconds until it may retry."""
+        buckets = [
+            (self._user_key(username), self.user_limit, self.user_limit / self.window),
+            ("ip:" + (ip or "unknown"), self.ip_limit, self.ip_limit / self.window),
+        ]
+        retry_after, blocked = self.store.take(buckets, time.time())
+        with self._lock:
+            if blocked is None:
+                self.allowed += 1
+            elif blocked.startswith("user:"):
+                self.rejected_user += 1
+            else:
+                self.rejected_ip += 1
+        return math.ceil(retry_after)
+
+    def reset(self, username):
+        self.store.reset(self._user_key(username))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_keys": len(self.store),
+                "allowed": self.allowed,
+                "rejected": self.rejected_user + self.rejected_ip,
+                "rejected_by_username": self.rejected_user,
+                "rejected_by_ip": self.rejected_ip,
+            }
+
+
+def get_login_throttle():
+    """Return this app's login throttle; None when disabled."""
+    if not current_app.config.get("LOGIN_THROTTLE_ENABLED", True):
+        return None
+    throttle = current_app.extensions.get("login_throttle")
+    if throttle is None:
+        with _start_lock:
+            throttle = current_app.extensions.get("login_throttle")
+            if throttle is None:
+                path = current_app.config.get("LOGIN_THROTTLE_PATH")
+                window = current_app.config.get("LOGIN_THROTTLE_WINDOW", 300)
+                throttle = LoginThrottle(
+                    user_limit=current_app.config.get("LOGIN_THROTTLE_USER_LIMIT", 5),
+                    ip_limit=current_app.config.get("LOGIN_THROTTLE_IP_LIMIT", 20),
+                    window=window,
+                    store=SqliteBucketStore(path, idle_after=window) if path else None,
+                )
+                current_app.extensions["login_throttle"] = throttle
+    return throttle
+
+
+def check_login_attempt(username):
+    """Spend a login attempt for ``username`` from this request's client.
+
+    Call before looking up the user or checking a password. Returns 0 when the
+    attempt may proceed, otherwise the seconds to send in ``Retry-After``.
+    """
+    throttle = get_login_throttle()
+    if throttle is None:
+        return 0
+    return throttle.check(username, request.remote_addr)
+
+
+def login_succeeded(username):
+    throttle = get_login_throttle()
+    if throttle is not None:
+        throttle.reset(username)
@@ -0,0 +1,283 @@
+import atexit
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from flask_mail import Message
+from sqlalchemy import event, func, select, update
+
+from extensions import db, mail
+from models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+_QUEUED_KEY = "outbox_queued"
+# Longest wait between two attempts at the same message
+MAX_RETRY_DELAY = 3600
+
+_start_lock = threading.Lock()
+
+
+def queue_mail(subject, recipients, body, html=None, sender=None):
+    """Add an email to the outbox in the current transaction; it is sent after commit."""
+    message = OutboxMessage(
+        subject=subject,
+        recipients=json.dumps(list(recipients)),
+        sender=sender,
+        body=body,
+        html=html,
+    )
+    db.session.add(message)
+    db.session.info[_QUEUED_KEY] = True
+    return message
+
+
+def retry_delay(attempts, base):
+    """Seconds to wait after the ``attempts``-th failed attempt: doubling, capped."""
+    return min(MAX_RETRY_DELAY, base * 2 ** (attempts - 1))
+
+
+def claim_due(limit, lease, now=None):
+    """Claim up to ``limit`` due messages for this sender and return them.
+
+    The claim moves ``next_attempt_at`` forward by ``lease`` seconds and
+    counts the attempt. It is committed before anything is sent, so other
+    senders skip the messages and a crash only delays them.
+    """
+    now = now or datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+    )
+    db.session.execute(
+        update(OutboxMessage)
+        .where(
+            OutboxMessage.id.in_(due),
+            OutboxMessage.status == "pending",
+            OutboxMessage.next_attempt_at <= now,
+        )
+        .values(
+            claim_token=token,
+            next_attempt_at=now + timedelta(seconds=lease),
+            attempts=OutboxMessage.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(claim_token=token).order_by(OutboxMessage.id).all()
+
+
+def _to_message(row):
+    return Message(
+        subject=row.subject,
+        recipients=row.recipient_list,
+        body=row.body,
+        html=row.html,
+        sender=row.sender or None,
+    )
+
+
+def _deliver(rows):
+    """Send ``rows`` over one SMTP connection; return ``{id: exception or None}``."""
+    errors = {}
+    try:
+        with mail.connect() as conn:
+            for row in rows:
+                try:
+                    conn.send(_to_message(row))
+                    errors[row.id] = None
+                except Exception as ex:  # one bad message must not hold up the rest
+                    errors[row.id] = ex
+    except Exception as ex:  # connecting failed, or the connection dropped
+        for row in rows:
+            errors.setdefault(row.id, ex)
+    return errors
+
+
+def _outcome(row, error, now, max_attempts, base):
+    """Return the column values recording one delivery attempt."""
+    if error is None:
+        return {"claim_token": None, "status": "sent", "sent_at": now, "last_error": None}
+    values = {"claim_token": None, "last_error": f"{type(error).__name__}: {error}"[:1000]}
+    if row.attempts >= max_attempts:
+        values["status"] = "failed"
+        logger.error(f"Giving up on outbox message {row.id}: {values['last_error']}")
+    else:
+        values["next_attempt_at"] = now + timedelta(seconds=retry_delay(row.attempts, base))
+    return values
+
+
+def send_batch(limit=None, now=None):
+    """Send one batch of due messages over a single SMTP connection.
+
+    Messages that fail are retried with exponential backoff until
+    ``MAIL_OUTBOX_MAX_ATTEMPTS``, then marked failed. Results are only
+    written while the claim is still ours: a batch that outlived its lease
+    may have been reclaimed by another sender, whose outcome then stands.
+    Returns ``(sent, failed)``. Must run inside an app context.
+    """
+    config = current_app.config
+    limit = limit or config.get("MAIL_OUTBOX_BATCH_SIZE", 50)
+    rows = claim_due(limit, config.get("MAIL_OUTBOX_LEASE_SECONDS", 300), now)
+    if not rows:
+        return 0, 0
+    token = rows[0].claim_token
+    errors = _deliver(rows)
+
+    now = now or datetime.utcnow()
+    max_attempts = config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 6)
+    base = config.get("MAIL_OUTBOX_RETRY_SECONDS", 30)
+    sent = failed = 0
+    for row in rows:
+        error = errors[row.id]
+        recorded = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == row.id, OutboxMessage.claim_token == token)
+            .values(**_outcome(row, error, now, max_attempts, base))
+            .execution_options(synchronize_session=False)
+        )
+        if recorded.rowcount == 0:
+            logger.warning(f"Outbox message {row.id} was reclaimed before its result was saved")
+        if error is None:
+            sent += 1
+        else:
+            failed += 1
+    db.session.commit()
+    return sent, failed
+
+
+def outbox_stats(now=None):
+    """Queue depth by status and the age in seconds of the oldest pending message."""
+    counts = dict(
+        db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+    )
+    oldest = db.session.execute(
+        select(func.min(OutboxMessage.created_at)).where(OutboxMessage.status == "pending")
+    ).scalar()
+    now = now or datetime.utcnow()
+    return {
+        "pending": counts.get("pending", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_seconds": round((now - oldest).total_seconds()) if oldest else None,
+    }
+
+
+class MailOutboxWorker:
+    """Background thread that drains the outbox one batch, and one connection, at a time.
+
+    It sends whenever a commit queues mail and otherwise polls every
+    ``poll_seconds`` for retries that have come due. Full batches are sent
+    back to back.
+    """
+
+    def __init__(self, app, batch_size=50, poll_seconds=5):
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="mail-outbox", daemon=True)
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.sent = 0
+        self.failed = 0
+        self.errors = 0
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def notify(self):
+        self._wake.set()
+
+    def run_once(self):
+        """Send one batch; return how many messages it held."""
+        try:
+            with self.app.app_context():
+                sent, failed = send_batch(self.batch_size)
+        except Exception:
+            logger.exception("Mail outbox batch failed; will retry")
+            with self._lock:
+                self.errors += 1
+            return 0
+        with self._lock:
+            if sent or failed:
+                self.batches += 1
+            self.sent += sent
+            self.failed += failed
+        return sent + failed
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            if self.run_once() < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "sent": self.sent,
+                "failed_attempts": self.failed,
+                "errors": self.errors,
+            }
+
+
+def get_mail_outbox():
+    """Return this app's outbox worker, starting it on first use; None when disabled."""
+    if not current_app.config.get("MAIL_OUTBOX_WORKER_ENABLED", False):
+        return None
+    worker = current_app.extensions.get("mail_outbox")
+    if worker is None:
+        with _start_lock:
+            worker = current_app.extensions.get("mail_outbox")
+            if worker is None:
+                worker = MailOutboxWorker(
+                    current_app._get_current_object(),
+                    batch_size=current_app.config.get("MAIL_OUTBOX_BATCH_SIZE", 50),
+                    poll_seconds=current_app.config.get("MAIL_OUTBOX_POLL_SECONDS", 5),
+                )
+                worker.start()
+                current_app.extensions["mail_outbox"] = worker
+    return worker
+
+
+def init_mail_outbox(app):
+    """Start the outbox worker on the first request so mail left pending by a restart goes out.
+
+    Waiting for a request keeps scripts and CLI commands that build the app
+    (init_db.py, flask send-outbox) from starting a polling thread of their own.
+    """
+
+    @app.before_request
+    def _start_mail_outbox():
+        if "mail_outbox" not in app.extensions:
+            get_mail_outbox()
+
+
+@event.listens_for(db.session, "after_commit")
+def _wake_outbox(session):
+    if session.info.pop(_QUEUED_KEY, None) and has_app_context():
+        worker = current_app.extensions.get("mail_outbox")
+        if worker is not None:
+            worker.notify()
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_outbox_wakeup(session, previous_transaction):
+    session.info.pop(_QUEUED_KEY, None)
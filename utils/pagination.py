@@ -0,0 +1,23 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(**fields):
+    """Encode keyset position fields into an opaque, URL-safe cursor string."""
+    raw = json.dumps(fields, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor, required=()):
+    """Decode a cursor from ``encode_cursor``, raising ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fields = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeError, ValueError) as ex:
+        raise ValueError("Invalid cursor") from ex
+    if not isinstance(fields, dict) or any(
+        not isinstance(fields.get(key), int) for key in required
+    ):
+        raise ValueError("Invalid cursor")
+    return fields
@@ -0,0 +1,158 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from flask import current_app
+from werkzeug.security import check_password_hash
+
+from utils.errors import APIError
+
+# bcrypt only reads this many bytes of the password; older bcrypt releases truncated silently
+MAX_PASSWORD_BYTES = 72
+
+_start_lock = threading.Lock()
+
+
+class PasswordHasherBusy(APIError):
+    """Every hashing slot stayed taken for the whole wait."""
+
+    def __init__(self, message="Too many sign-ins in progress, please retry shortly"):
+        super().__init__(message=message, status_code=503)
+
+
+def _encode(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def _bcrypt_rounds(stored):
+    """Return the cost factor of a bcrypt hash, or None for any other format."""
+    if stored.startswith(("$2a$", "$2b$", "$2y$")):
+        return int(stored[4:6])
+    return None
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small thread pool so login bursts cannot take every core.
+
+    bcrypt releases the GIL, so ``workers`` hashes run in parallel while the
+    request threads waiting on them sit idle. At most ``queue_size`` hashes are
+    admitted at once; a caller that cannot get a slot within ``timeout`` seconds
+    gets :class:`PasswordHasherBusy` instead of queueing indefinitely.
+    """
+
+    def __init__(self, rounds=12, workers=2, queue_size=32, timeout=10):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            with self._lock:
+                self.in_flight += 1
+            return self._pool.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        """Return a bcrypt hash of ``password`` at the configured cost."""
+        hashed = self._run(bcrypt.hashpw, _encode(password), bcrypt.gensalt(self.rounds))
+        with self._lock:
+            self.hashed += 1
+        return hashed.decode("utf-8")
+
+    def verify(self, stored, password):
+        """Check ``password`` against a bcrypt or legacy werkzeug hash."""
+        if not stored or password is None:
+            return False
+        if _bcrypt_rounds(stored) is not None:
+            ok = self._run(bcrypt.checkpw, _encode(password), stored.encode("utf-8"))
+        else:
+            try:
+                ok = self._run(check_password_hash, stored, password)
+            except ValueError:  # not a hash at all
+                ok = False
+        with self._lock:
+            self.verified += 1
+        return ok
+
+    def needs_rehash(self, stored):
+        """True for non-bcrypt hashes and bcrypt hashes at a different cost."""
+        return _bcrypt_rounds(stored) != self.rounds
+
+    def check(self, stored, password):
+        """Return ``(matches, new_hash)``; ``new_hash`` replaces a matching outdated hash."""
+        if not self.verify(stored, password):
+            return False, None
+        if not self.needs_rehash(stored):
+            return True, None
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return True, new_hash
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "hashed": self.hashed,
+                "verified": self.verified,
+                "rehashed": self.rehashed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def get_password_hasher():
+    """Return this app's password hasher, creating it on first use."""
+    hasher = current_app.extensions.get("password_hasher")
+    if hasher is None:
+        with _start_lock:
+            hasher = current_app.extensions.get("password_hasher")
+            if hasher is None:
+                workers = current_app.config.get("PASSWORD_HASH_WORKERS") or min(
+                    4, os.cpu_count() or 1
+                )
+                hasher = PasswordHasher(
+                    rounds=current_app.config.get("BCRYPT_LOG_ROUNDS", 12),
+                    workers=workers,
+                    queue_size=current_app.config.get("PASSWORD_HASH_QUEUE_SIZE", 32),
+                    timeout=current_app.config.get("PASSWORD_HASH_TIMEOUT", 10),
+                )
+                current_app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+
+def verify_password(user, password):
+    """Check ``user``'s password, upgrading a legacy or outdated hash when it matches.
+
+    The new hash is only set on ``user``; the caller's commit persists it.
+    """
+    matches, new_hash = get_password_hasher().check(user.password_hash, password)
+    if new_hash is not None:
+        user.password_hash = new_hash
+    return matches
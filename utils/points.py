@@ -0,0 +1,61 @@
+from flask import has_app_context
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db
+from models import User
+
+_PENDING_KEY = "points_changes"
+_listeners = []
+
+
+def on_points_changed(listener):
+    """Register ``listener(user_id, old_points, new_points)`` to run after commit."""
+    _listeners.append(listener)
+    return listener
+
+
+def award_points(user, points):
+    """Atomically add points to a user and queue the change for the post-commit listeners.
+
+    The increment runs in the database as ``exercise_points = exercise_points +
+    :points``, so concurrent requests for the same user cannot overwrite each
+    other's points. The resulting total is copied onto ``user`` without marking
+    it dirty. Returns the new total, or None if the user row no longer exists.
+    """
+    stmt = (
+        update(User)
+        .where(User.id == user.id)
+        .values(exercise_points=func.coalesce(User.exercise_points, 0) + points)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        new_points = db.session.execute(stmt.returning(User.exercise_points)).scalar()
+    elif db.session.execute(stmt).rowcount:
+        # The UPDATE holds the row lock, so this reads our own increment
+        new_points = db.session.execute(
+            select(User.exercise_points).where(User.id == user.id)
+        ).scalar()
+    else:
+        new_points = None
+    if new_points is None:
+        return None
+
+    set_committed_value(user, "exercise_points", new_points)
+    db.session.info.setdefault(_PENDING_KEY, []).append((user.id, new_points - points, new_points))
+    return new_points
+
+
+@event.listens_for(db.session, "after_commit")
+def _dispatch_points_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes or not has_app_context():
+        return
+    for user_id, old_points, new_points in changes:
+        for listener in _listeners:
+            listener(user_id, old_points, new_points)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_points_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import User
+from utils.points import on_points_changed
+
+logger = logging.getLogger(__name__)
+
+_build_lock = threading.Lock()
+
+
+class RankIndex:
+    """Order-statistic index over user point totals.
+
+    Backed by a sparse Fenwick tree keyed by point value, so updates and
+    "how many users are ahead of N points" are O(log M), M being the
+    highest total seen. The tree doubles its range on demand. It only
+    counts users per point value, so ties share a rank; pages that order
+    tied users by id read them with seeks on the (exercise_points, id) index.
+    """
+
+    def __init__(self, points=()):
+        self._tree = {}
+        self._counts = {}
+        self._size = 1
+        self._total = 0
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+        for value in points:
+            self._add(value, 1)
+
+    def __len__(self):
+        return self._total
+
+    def _grow(self, index):
+        while self._size < index:
+            self._size *= 2
+            # The new root covers (0, size]; all other new nodes cover empty ranges.
+            self._tree[self._size] = self._total
+
+    def _add(self, value, delta):
+        value = max(int(value or 0), 0)
+        index = value + 1
+        self._grow(index)
+        while index <= self._size:
+            self._tree[index] = self._tree.get(index, 0) + delta
+            index += index & -index
+        self._counts[value] = self._counts.get(value, 0) + delta
+        self._total += delta
+
+    def _prefix(self, index):
+        index = min(index, self._size)
+        total = 0
+        while index > 0:
+            total += self._tree.get(index, 0)
+            index -= index & -index
+        return total
+
+    def add(self, points):
+        with self._lock:
+            self._add(points, 1)
+
+    def move(self, old_points, new_points):
+        """Move one user from ``old_points`` to ``new_points``."""
+        with self._lock:
+            if self._counts.get(max(int(old_points or 0), 0), 0) > 0:
+                self._add(old_points, -1)
+            self._add(new_points, 1)
+
+    def count_above(self, points):
+        """Return the number of users with strictly more than ``points``."""
+        points = max(int(points or 0), 0)
+        with self._lock:
+            return self._total - self._prefix(points + 1)
+
+    def rank(self, points):
+        return self.count_above(points) + 1
+
+
+def build_rank_index():
+    """Build an index from the current point totals (one column scan)."""
+    points = db.session.execute(select(User.exercise_points)).scalars()
+    return RankIndex(points)
+
+
+def get_rank_index():
+    """Return this app's rank index, rebuilding it once it is older than the max age."""
+    max_age = current_app.config.get("RANK_INDEX_MAX_AGE", 60)
+    index = current_app.extensions.get("rank_index")
+    if index is not None and time.monotonic() - index.built_at < max_age:
+        return index
+
+    with _build_lock:
+        index = current_app.extensions.get("rank_index")
+        if index is None or time.monotonic() - index.built_at >= max_age:
+            index = build_rank_index()
+            current_app.extensions["rank_index"] = index
+    return index
+
+
+def count_rank(points):
+    """COUNT-based rank lookup, served by the exercise_points index."""
+    return User.query.filter(User.exercise_points > (points or 0)).count() + 1
+
+
+def get_user_rank(user):
+    """Return the user's 1-based position, ties sharing the better rank."""
+    points = user.exercise_points or 0
+    if current_app.config.get("RANK_INDEX_ENABLED", True):
+        try:
+            return get_rank_index().rank(points)
+        except SQLAlchemyError as ex:
+            logger.warning(f"Rank index unavailable, falling back to COUNT: {ex}")
+            db.session.rollback()
+    return count_rank(points)
+
+
+@on_points_changed
+def _update_rank_index(user_id, old_points, new_points):
+    index = current_app.extensions.get("rank_index")
+    if index is not None:
+        index.move(old_points, new_points)
@@ -0,0 +1,63 @@
+from bisect import bisect_right
+
+from models.constants import EXERCISE_MULTIPLIERS, EXERCISE_RANKS, USER_RANKS
+
+
+class RankTable:
+    """Tier thresholds compiled into ascending arrays for binary-search lookups."""
+
+    __slots__ = ("thresholds", "names")
+
+    def __init__(self, tiers):
+        ordered = sorted(tiers)
+        self.thresholds = [threshold for threshold, _ in ordered]
+        self.names = [name for _, name in ordered]
+
+    def resolve(self, value):
+        """Return the name of the highest tier whose threshold ``value`` reaches."""
+        return self.names[max(bisect_right(self.thresholds, value) - 1, 0)]
+
+
+class ScoringEngine:
+    """Point multipliers and rank tiers, loaded once and shared by web and API paths."""
+
+    def __init__(self, multipliers, exercise_ranks, user_ranks):
+        self.multipliers = dict(multipliers)
+        self.exercise_tables = {
+            exercise_type: RankTable(tiers) for exercise_type, tiers in exercise_ranks.items()
+        }
+        self.user_table = RankTable(user_ranks)
+
+    def is_valid_type(self, exercise_type):
+        return exercise_type in self.multipliers
+
+    def points(self, exercise_type, count):
+        """Return the points earned for ``count`` units of an exercise."""
+        return round(self.multipliers[exercise_type] * count)
+
+    def exercise_rank(self, exercise_type, total):
+        """Return the EXERCISE_RANKS tier for a running total of one exercise type."""
+        return self.exercise_tables[exercise_type].resolve(total)
+
+    def user_rank(self, points):
+        """Return the overall tier for a user's total points."""
+        return self.user_table.resolve(points)
+
+    def score_batch(self, exercise_types, counts):
+        """Score many rows in one call; returns a list of points aligned with the input."""
+        multipliers = self.multipliers
+        return [
+            round(multipliers[exercise_type] * count)
+            for exercise_type, count in zip(exercise_types, counts)
+        ]
+
+    def rank_batch(self, exercise_types, totals):
+        """Resolve many per-type totals in one call; returns tier names aligned with the input."""
+        tables = self.exercise_tables
+        return [
+            tables[exercise_type].resolve(total)
+            for exercise_type, total in zip(exercise_types, totals)
+        ]
+
+
+scoring = ScoringEngine(EXERCISE_MULTIPLIERS, EXERCISE_RANKS, USER_RANKS)
@@ -1,3 +1,6 @@
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
 def init_security_headers(app):
     @app.after_request
     def add_security_headers(response):
@@ -15,4 +18,17 @@ def init_security_headers(app):
         response.headers["X-Content-Type-Options"] = "nosniff"
         response.headers["X-Frame-Options"] = "SAMEORIGIN"
         response.headers["X-XSS-Protection"] = "1; mode=block"
-        return response 
\ No newline at end of file
+        return response
+
+
+def init_proxy_fix(app):
+    """Trust ``X-Forwarded-For`` from ``PROXY_FIX_X_FOR`` reverse proxies.
+
+    Behind a proxy ``request.remote_addr`` is the proxy's address, so per-IP
+    limits such as the login throttle would lump every client together. Set
+    the count to the number of proxies in front of the app; left at 0 the
+    header is ignored, since clients can forge it.
+    """
+    hops = app.config.get("PROXY_FIX_X_FOR", 0)
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops)
@@ -0,0 +1,233 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+
+def is_affected(meta, user_id, points):
+    """Return whether a points change for ``user_id`` can alter a snapshot.
+
+    ``meta`` is None for snapshots that any change may alter. Otherwise it lists
+    the ``user_ids`` in the snapshot and the ``cutoff`` a user must reach to
+    enter it (None when nobody can enter through a points change).
+    """
+    if meta is None:
+        return True
+    if user_id in meta["user_ids"]:
+        return True
+    return meta["cutoff"] is not None and points >= meta["cutoff"]
+
+
+class SqliteSnapshotStore:
+    """Snapshot store in a local SQLite file shared by all workers on a host.
+
+    A generation counter is bumped whenever snapshots are invalidated, so other
+    workers know to drop their in-process copies. Each snapshot's cutoff and
+    user ids are kept in indexed columns so an invalidation only touches the
+    rows it removes, and expired rows are deleted on every write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            # Replaced by snapshot_entry, whose invalidation keys are indexed
+            conn.execute("DROP TABLE IF EXISTS snapshot")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot_entry "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, meta TEXT, "
+                "any_change INTEGER NOT NULL, cutoff INTEGER, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_snapshot_entry_any_change "
+                "ON snapshot_entry (any_change)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_snapshot_entry_cutoff ON snapshot_entry (cutoff)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_snapshot_entry_expires_at "
+                "ON snapshot_entry (expires_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot_user "
+                "(key TEXT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (key, user_id))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_snapshot_user_user_id ON snapshot_user (user_id)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY, value INTEGER)"
+            )
+            conn.execute("INSERT OR IGNORE INTO generation (id, value) VALUES (1, 0)")
+
+    @contextmanager
+    def _connect(self):
+        """Yield a connection that commits on success and is always closed."""
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    @staticmethod
+    def _delete(conn, keys):
+        conn.executemany("DELETE FROM snapshot_user WHERE key = ?", keys)
+        conn.executemany("DELETE FROM snapshot_entry WHERE key = ?", keys)
+
+    def _delete_expired(self, conn, now):
+        expired = conn.execute(
+            "SELECT key FROM snapshot_entry WHERE expires_at <= ?", (now,)
+        ).fetchall()
+        self._delete(conn, expired)
+
+    def generation(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM generation WHERE id = 1").fetchone()[0]
+
+    def get(self, key, now):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, meta FROM snapshot_entry WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def set(self, key, value, meta, expires_at):
+        user_ids = [] if meta is None else meta["user_ids"]
+        cutoff = None if meta is None else meta["cutoff"]
+        with self._connect() as conn:
+            self._delete_expired(conn, time.time())
+            self._delete(conn, [(key,)])
+            conn.execute(
+                "INSERT INTO snapshot_entry (key, value, meta, any_change, cutoff, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(value), json.dumps(meta), meta is None, cutoff, expires_at),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO snapshot_user (key, user_id) VALUES (?, ?)",
+                [(key, user_id) for user_id in user_ids],
+            )
+
+    def invalidate(self, user_id, points):
+        """Delete affected snapshots; return how many were removed.
+
+        Matches the same snapshots as ``is_affected``, selected through the indexes.
+        """
+        with self._connect() as conn:
+            self._delete_expired(conn, time.time())
+            stale = conn.execute(
+                "SELECT key FROM snapshot_entry WHERE any_change = 1 "
+                "UNION SELECT key FROM snapshot_entry WHERE cutoff <= ? "
+                "UNION SELECT key FROM snapshot_user WHERE user_id = ?",
+                (points, user_id),
+            ).fetchall()
+            if stale:
+                self._delete(conn, stale)
+                conn.execute("UPDATE generation SET value = value + 1 WHERE id = 1")
+        return len(stale)
+
+
+class SnapshotCache:
+    """LRU cache of JSON-compatible snapshots with a TTL and optional shared store.
+
+    The store's generation is checked at most once per ``sync_interval``
+    seconds, so another worker's invalidation can take that long to show here.
+    """
+
+    def __init__(self, max_entries=128, ttl=30, store=None, sync_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.sync_interval = sync_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = store.generation() if store else 0
+        self._next_sync = time.monotonic() + sync_interval
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_generation(self):
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        generation = self.store.generation()
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def _remember(self, key, value, meta, expires_at):
+        self._entries[key] = (expires_at, value, meta)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        if self.store is not None:
+            stored = self.store.get(key, now)
+            if stored is not None:
+                value, meta = stored
+                with self._lock:
+                    self._remember(key, value, meta, now + self.ttl)
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, meta=None):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, meta, expires_at)
+        if self.store is not None:
+            self.store.set(key, value, meta, expires_at)
+
+    def fetch(self, key, compute):
+        """Return the cached value for ``key``, or store ``compute()``'s ``(value, meta)``."""
+        value = self.get(key)
+        if value is None:
+            value, meta = compute()
+            self.set(key, value, meta)
+        return value
+
+    def invalidate(self, user_id, points):
+        """Drop snapshots that a change to ``points`` for ``user_id`` may alter."""
+        with self._lock:
+            stale = [
+                key
+                for key, (_, _, meta) in self._entries.items()
+                if is_affected(meta, user_id, points)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if self.store is not None:
+            self.store.invalidate(user_id, points)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
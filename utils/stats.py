@@ -0,0 +1,131 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from extensions import db
+from models import Exercise, ExerciseRollup
+from utils.aggregates import ROLLUP_PERIODS, increment, next_period_start, period_start
+
+GRANULARITIES = ROLLUP_PERIODS
+# Ten years: a monthly chart of the whole range still reads ~120 rows per type
+MAX_STATS_DAYS = 3660
+
+ROLLUP_KEYS = ("user_id", "exercise_type", "period", "period_start")
+
+
+def _rollup_rows(user_id, exercise_type, day, count, points):
+    return [
+        {
+            "user_id": user_id,
+            "exercise_type": exercise_type,
+            "period": period,
+            "period_start": period_start(period, day),
+            "count": count,
+            "points": points,
+        }
+        for period in ROLLUP_PERIODS
+    ]
+
+
+def rollup_exercise(user_id, exercise_type, day, count, points):
+    """Add an exercise to the user's day, week and month rollups for its type."""
+    increment(ExerciseRollup, ROLLUP_KEYS, _rollup_rows(user_id, exercise_type, day, count, points))
+
+
+def rollup_exercises(user_id, totals):
+    """Add ``{(exercise_type, day): (count, points)}`` to the user's rollups in one upsert."""
+    merged = defaultdict(lambda: [0, 0])
+    for (exercise_type, day), (count, points) in totals.items():
+        for period in ROLLUP_PERIODS:
+            bucket = merged[(exercise_type, period, period_start(period, day))]
+            bucket[0] += count
+            bucket[1] += points
+    rows = [
+        {
+            "user_id": user_id,
+            "exercise_type": exercise_type,
+            "period": period,
+            "period_start": start,
+            "count": count,
+            "points": points,
+        }
+        for (exercise_type, period, start), (count, points) in merged.items()
+    ]
+    increment(ExerciseRollup, ROLLUP_KEYS, rows)
+
+
+def rebuild_exercise_rollups(chunk_size=1000):
+    """Recompute exercise_rollup from per-user, per-type daily sums, one chunk at a time."""
+    db.session.execute(delete(ExerciseRollup))
+    day = func.date(Exercise.date_added)
+    daily = db.session.execute(
+        select(
+            Exercise.user_id,
+            Exercise.exercise_type,
+            day,
+            func.sum(Exercise.count),
+            func.sum(Exercise.points),
+        ).group_by(Exercise.user_id, Exercise.exercise_type, day),
+        execution_options={"stream_results": True},
+    )
+    days = 0
+    for partition in daily.partitions(chunk_size):
+        # Days in one week or month share a row; one upsert must not hit it twice
+        merged = defaultdict(lambda: [0, 0])
+        for user_id, exercise_type, active_day, count, points in partition:
+            if isinstance(active_day, str):
+                active_day = date.fromisoformat(active_day)
+            for row in _rollup_rows(user_id, exercise_type, active_day, count, points or 0):
+                bucket = merged[tuple(row[key] for key in ROLLUP_KEYS)]
+                bucket[0] += row["count"]
+                bucket[1] += row["points"]
+        rows = [
+            dict(zip(ROLLUP_KEYS, key), count=count, points=points)
+            for key, (count, points) in merged.items()
+        ]
+        increment(ExerciseRollup, ROLLUP_KEYS, rows)
+        days += len(partition)
+    return days
+
+
+def bucket_starts(granularity, start, end):
+    """Return the start of every ``granularity`` bucket overlapping [start, end]."""
+    buckets = []
+    current = period_start(granularity, start)
+    while current <= end:
+        buckets.append(current)
+        current = next_period_start(granularity, current)
+    return buckets
+
+
+def exercise_series(user_id, exercise_types, days, granularity="day"):
+    """Return ``(dates, {type: counts})`` for the last ``days`` days, read from the rollups.
+
+    Reads at most one pre-aggregated row per type and bucket, so a multi-year
+    chart costs the same at month granularity as a few weeks does at day
+    granularity.
+    """
+    days = min(max(days, 0), MAX_STATS_DAYS)
+    end = datetime.now().date()
+    buckets = bucket_starts(granularity, end - timedelta(days=days), end)
+
+    rows = (
+        db.session.query(
+            ExerciseRollup.exercise_type, ExerciseRollup.period_start, ExerciseRollup.count
+        )
+        .filter(
+            ExerciseRollup.user_id == user_id,
+            ExerciseRollup.exercise_type.in_(exercise_types),
+            ExerciseRollup.period == granularity,
+            ExerciseRollup.period_start >= buckets[0],
+            ExerciseRollup.period_start <= end,
+        )
+        .all()
+    )
+
+    positions = {bucket: idx for idx, bucket in enumerate(buckets)}
+    series = {exercise_type: [0] * len(buckets) for exercise_type in exercise_types}
+    for exercise_type, start, count in rows:
+        series[exercise_type][positions[start]] = count
+    return [bucket.strftime("%Y-%m-%d") for bucket in buckets], series
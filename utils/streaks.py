@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from extensions import db
+from models import PointsRollup, UserStreak
+
+# How far back validate_exercise_date lets entries be logged
+BACKDATE_DAYS = 2
+
+_STREAK_COLUMNS = ("last_day", "current", "longest", "prev_end", "prev_length")
+
+
+def streak_from_days(user_id, days):
+    """Build a UserStreak from a user's active days in ascending order; None if empty."""
+    streak = None
+    for day in days:
+        if streak is None:
+            streak = UserStreak(user_id=user_id, last_day=day, current=1, longest=1, prev_length=0)
+        else:
+            streak.add_day(day)
+    return streak
+
+
+def _active_days(user_id):
+    return db.session.execute(
+        select(PointsRollup.period_start)
+        .where(PointsRollup.period == "day", PointsRollup.user_id == user_id)
+        .order_by(PointsRollup.period_start)
+    ).scalars()
+
+
+def rebuild_user_streak(user_id):
+    """Recompute one user's streak from their daily point rollups."""
+    fresh = streak_from_days(user_id, _active_days(user_id))
+    streak = db.session.get(UserStreak, user_id)
+    if fresh is None or streak is None:
+        if fresh is not None:
+            db.session.add(fresh)
+        return fresh
+    for column in _STREAK_COLUMNS:
+        setattr(streak, column, getattr(fresh, column))
+    return streak
+
+
+def record_active_days(user_id, days):
+    """Update the user's streak for newly active ``days``, which must already be rolled up.
+
+    Days within BACKDATE_DAYS of the last active day are applied in O(1) each.
+    Anything older (history imports) and users without a streak row yet are
+    rebuilt from the user's daily rollups. Callers run this after the atomic
+    point update, which holds the user's row lock, so concurrent writes for
+    the same user cannot interleave here. Returns ``(old_longest, streak)``,
+    where ``old_longest`` is the longest streak before these days (0 for a new row).
+    """
+    days = sorted(days)
+    streak = db.session.get(UserStreak, user_id, populate_existing=True)
+    old_longest = streak.longest if streak is not None else 0
+    if streak is None or days[0] < streak.last_day - timedelta(days=BACKDATE_DAYS):
+        return old_longest, rebuild_user_streak(user_id)
+    for day in days:
+        streak.add_day(day)
+    return old_longest, streak
+
+
+def rebuild_streaks(chunk_size=1000):
+    """Recompute every user's streak from the daily point rollups, one chunk at a time."""
+    db.session.execute(delete(UserStreak))
+    rows = db.session.execute(
+        select(PointsRollup.user_id, PointsRollup.period_start)
+        .where(PointsRollup.period == "day")
+        .order_by(PointsRollup.user_id, PointsRollup.period_start),
+        execution_options={"stream_results": True},
+    )
+    pending = []
+    users = 0
+    current_user, streak = None, None
+
+    def emit():
+        pending.append(
+            {"user_id": current_user, **{c: getattr(streak, c) for c in _STREAK_COLUMNS}}
+        )
+
+    for user_id, day in rows:
+        if user_id != current_user:
+            if streak is not None:
+                emit()
+                users += 1
+                if len(pending) >= chunk_size:
+                    db.session.execute(insert(UserStreak), pending)
+                    pending = []
+            current_user = user_id
+            streak = UserStreak(user_id=user_id, last_day=day, current=1, longest=1, prev_length=0)
+        else:
+            streak.add_day(day)
+    if streak is not None:
+        emit()
+        users += 1
+    if pending:
+        db.session.execute(insert(UserStreak), pending)
+    return users
+
+
+def streak_summary(user_id, today=None):
+    """Return ``{"current", "longest", "last_active"}`` for display."""
+    streak = db.session.get(UserStreak, user_id)
+    if streak is None:
+        return {"current": 0, "longest": 0, "last_active": None}
+    today = today or datetime.now().date()
+    return {
+        "current": streak.current_streak(today),
+        "longest": streak.longest,
+        "last_active": streak.last_day.isoformat(),
+    }
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from extensions import db
+from models import User
+from utils.points import on_points_changed
+
+_PENDING_KEY = "user_cache_changes"
+
+
+class UserSummary(namedtuple("UserSummary", "id username email exercise_points is_active")):
+    """Detached snapshot of the columns needed to authorize a request and render the header."""
+
+    __slots__ = ()
+    get_rank = User.get_rank
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.exercise_points, user.is_active)
+
+
+class UserSummaryCache:
+    """Per-process LRU of user summaries with a short TTL and per-user versions.
+
+    Bumping a user's version makes any cached summary for them a miss. A
+    reader takes the version before loading from the database and ``put``
+    drops the result if the version moved meanwhile, so a load racing with a
+    commit cannot cache the old row. Other workers only see the change once
+    their copy expires, so ``ttl`` bounds how stale a summary can be.
+    """
+
+    def __init__(self, ttl=5, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, version, summary = entry
+                if expires_at > now and version == self._versions.get(user_id, 0):
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return summary
+                del self._entries[user_id]
+            self.misses += 1
+        return None
+
+    def put(self, summary, version):
+        with self._lock:
+            if version != self._versions.get(summary.id, 0):
+                return
+            self._entries[summary.id] = (time.monotonic() + self.ttl, version, summary)
+            self._entries.move_to_end(summary.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def get_user_cache():
+    """Return this app's user summary cache; None when disabled."""
+    if not current_app.config.get("USER_CACHE_ENABLED", True):
+        return None
+    cache = current_app.extensions.get("user_cache")
+    if cache is None:
+        cache = UserSummaryCache(
+            ttl=current_app.config.get("USER_CACHE_TTL", 5),
+            max_entries=current_app.config.get("USER_CACHE_SIZE", 10000),
+        )
+        cache = current_app.extensions.setdefault("user_cache", cache)
+    return cache
+
+
+def load_user_summary(user_id):
+    """Return the user's summary from the cache, loading it on a miss; None if no such user."""
+    cache = get_user_cache()
+    if cache is None:
+        user = db.session.get(User, user_id)
+        return UserSummary.from_user(user) if user else None
+    summary = cache.get(user_id)
+    if summary is None:
+        version = cache.version(user_id)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        summary = UserSummary.from_user(user)
+        cache.put(summary, version)
+    return summary
+
+
+def _invalidate(user_ids):
+    cache = current_app.extensions.get("user_cache")
+    if cache is not None:
+        for user_id in user_ids:
+            cache.bump(user_id)
+
+
+@on_points_changed
+def _invalidate_on_points(user_id, old_points, new_points):
+    _invalidate([user_id])
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    changed = {
+        obj.id
+        for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(db.session, "after_commit")
+def _dispatch_user_changes(session):
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed and has_app_context():
+        _invalidate(changed)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_user_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,413 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from glob import glob
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import JobCheckpoint, User
+from utils.exercise_log import log_exercises
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are still written, orphan recovery is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+DEAD_LETTER_FILE = "dead-letter.ndjson"
+MAX_RETRY_DELAY = 60.0
+
+_start_lock = threading.Lock()
+
+
+def _encode(seq, user_id, entry):
+    item = dict(entry, seq=seq, user_id=user_id, date_added=entry["date_added"].isoformat())
+    return json.dumps(item) + "\n"
+
+
+def _decode(line):
+    item = json.loads(line)
+    seq = item.pop("seq")
+    user_id = item.pop("user_id")
+    item["date_added"] = datetime.fromisoformat(item["date_added"])
+    return seq, user_id, item
+
+
+def _dead_letter_line(journal_path, seq, user_id, entry, error):
+    item = json.loads(_encode(seq, user_id, entry))
+    item["journal"] = os.path.basename(journal_path)
+    item["error"] = f"{type(error).__name__}: {error}"[:1000]
+    return json.dumps(item) + "\n"
+
+
+def _checkpoint_name(journal_path):
+    return "write-behind:" + os.path.basename(journal_path)
+
+
+def _dead_lettered(journal_path):
+    """Return the sequence numbers of ``journal_path`` already set aside as dead letters."""
+    path = os.path.join(os.path.dirname(journal_path), DEAD_LETTER_FILE)
+    journal = os.path.basename(journal_path)
+    seqs = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as dead_letters:
+            for line in dead_letters:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if item.get("journal") == journal:
+                    seqs.add(item["seq"])
+    return seqs
+
+
+def apply_batch(items, checkpoint, position):
+    """Write queued ``(seq, user_id, entry)`` items in one transaction.
+
+    The journal's checkpoint is advanced to ``position`` in the same
+    transaction, so a replay after a crash never applies an item twice.
+    """
+    by_user = defaultdict(list)
+    for _, user_id, entry in items:
+        by_user[user_id].append(entry)
+    try:
+        for user_id, entries in by_user.items():
+            user = db.session.get(User, user_id)
+            if user is None:
+                logger.warning(
+                    f"Dropping {len(entries)} queued exercises for missing user {user_id}"
+                )
+                continue
+            log_exercises(user, entries)
+        record = JobCheckpoint.query.filter_by(name=checkpoint).first()
+        if record is None:
+            db.session.add(JobCheckpoint(name=checkpoint, position=position))
+        else:
+            record.position = position
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def replay_journal(path, max_batch=500):
+    """Apply the uncommitted tail of an orphaned journal, then delete it.
+
+    Returns the number of replayed items, or None when a live process still
+    holds the journal. Must run inside an app context.
+    """
+    with open(path, "r+", encoding="utf-8") as journal:
+        try:
+            fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        name = _checkpoint_name(path)
+        record = JobCheckpoint.query.filter_by(name=name).first()
+        done = record.position if record else 0
+        # Dead-lettered before the crash, but the checkpoint had not moved past them
+        skip = _dead_lettered(path)
+
+        replayed = 0
+        batch = []
+        for line in journal:
+            try:
+                item = _decode(line)
+            except (ValueError, KeyError):
+                continue  # blank line or a write torn by the crash
+            if item[0] <= done or item[0] in skip:
+                continue
+            batch.append(item)
+            if len(batch) >= max_batch:
+                apply_batch(batch, name, batch[-1][0])
+                replayed += len(batch)
+                batch = []
+        if batch:
+            apply_batch(batch, name, batch[-1][0])
+            replayed += len(batch)
+
+        JobCheckpoint.query.filter_by(name=name).delete()
+        db.session.commit()
+        os.remove(path)
+    return replayed
+
+
+class WriteBehindQueue:
+    """In-process queue that commits exercise submissions in grouped transactions.
+
+    Submissions are appended to a per-process journal file before they are
+    acknowledged. A background thread fsyncs the journal and commits the
+    queue every ``flush_ms`` milliseconds, or as soon as ``max_batch`` are
+    waiting. An acknowledged entry survives a process crash at once; an OS
+    crash or power loss can lose entries acknowledged since the last flush.
+    Anything left is flushed on shutdown. Journals left behind by a crashed
+    process are replayed by the next queue that starts in the same directory.
+
+    When a batch fails its entries are retried one at a time, so a single bad
+    entry cannot hold back the rest. The entry at the head is retried with
+    exponential backoff and, after ``max_attempts`` failures that were not
+    database outages, moved to the dead-letter file beside the journals.
+    """
+
+    def __init__(self, app, journal_dir, flush_ms=50, max_batch=500, max_attempts=5, retry_ms=500):
+        self.app = app
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_ms / 1000
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_ms / 1000
+        os.makedirs(journal_dir, exist_ok=True)
+        self.journal_path = os.path.join(
+            journal_dir, f"{socket.gethostname()}-{os.getpid()}-{time.time_ns()}{JOURNAL_SUFFIX}"
+        )
+        self.dead_letter_path = os.path.join(journal_dir, DEAD_LETTER_FILE)
+        self._checkpoint = _checkpoint_name(self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if fcntl is not None:
+            fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._seq = 0
+        self._stopping = False
+        # Failures of the entry at the head of the queue, and when to try again
+        self._head_attempts = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        # Head entry written to the dead letters whose checkpoint has not committed yet
+        self._dead_seq = None
+
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.errors = 0
+        self.dead_lettered = 0
+
+    def start(self):
+        if fcntl is not None:
+            with self.app.app_context():
+                for path in glob(os.path.join(self.journal_dir, "*" + JOURNAL_SUFFIX)):
+                    if path != self.journal_path:
+                        replayed = replay_journal(path, self.max_batch)
+                        if replayed is not None:
+                            logger.info(f"Replayed {replayed} queued exercises from {path}")
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, user_id, entry):
+        """Journal and enqueue one validated entry (as built for ``log_exercises``)."""
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Write-behind queue is shut down")
+            self._seq += 1
+            self._journal.write(_encode(self._seq, user_id, entry))
+            self._journal.flush()
+            self._pending.append((self._seq, user_id, entry))
+            self.submitted += 1
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def flush_once(self):
+        """Commit up to ``max_batch`` queued items; return how many were committed."""
+        with self._flush_lock:
+            if time.monotonic() < self._retry_at:
+                return 0
+            with self._cond:
+                size = min(len(self._pending), self.max_batch)
+                batch = [self._pending.popleft() for _ in range(size)]
+            if not batch:
+                return 0
+            os.fsync(self._journal.fileno())
+            if self._dead_seq is not None:
+                committed = self._apply_each(batch)
+            else:
+                try:
+                    with self.app.app_context():
+                        apply_batch(batch, self._checkpoint, batch[-1][0])
+                    committed = len(batch)
+                    self._head_attempts = self._failures = 0
+                except Exception:
+                    logger.exception("Write-behind batch failed; retrying its entries one by one")
+                    committed = self._apply_each(batch)
+
+            with self._cond:
+                self.committed += committed
+                if committed:
+                    self.batches += 1
+                    self.last_batch_size = committed
+                    self.max_batch_size = max(self.max_batch_size, committed)
+                if not self._pending:
+                    # Everything journaled so far is committed or dead-lettered
+                    self._journal.truncate(0)
+            return committed
+
+    def _apply_each(self, batch):
+        """Apply ``batch`` an item at a time, stopping at the first that must be retried.
+
+        The checkpoint only ever moves past items that were committed or
+        dead-lettered, so the unapplied tail goes back to the head of the queue.
+        """
+        committed = 0
+        for index, (seq, user_id, entry) in enumerate(batch):
+            if seq == self._dead_seq:
+                error = None  # only its checkpoint is left to commit
+            else:
+                try:
+                    with self.app.app_context():
+                        apply_batch([(seq, user_id, entry)], self._checkpoint, seq)
+                except Exception as ex:
+                    error = ex
+                else:
+                    committed += 1
+                    self._head_attempts = self._failures = 0
+                    continue
+                if self._attempts_left(error):
+                    self._requeue(batch[index:], error)
+                    return committed
+            checkpoint_error = self._dead_letter(seq, user_id, entry, error)
+            if checkpoint_error is not None:
+                self._requeue(batch[index:], checkpoint_error)
+                return committed
+        return committed
+
+    def _attempts_left(self, error):
+        """Count a failure of the head entry; return whether it may be retried."""
+        self._failures += 1
+        if not isinstance(error, OperationalError):
+            # Database outages do not count against the entry
+            self._head_attempts += 1
+        if self._head_attempts >= self.max_attempts:
+            self._head_attempts = 0
+            return False
+        return True
+
+    def _requeue(self, items, error):
+        """Put ``items`` back at the head of the queue and back off before the next try."""
+        delay = min(MAX_RETRY_DELAY, self.retry_delay * 2 ** max(self._failures - 1, 0))
+        self._retry_at = time.monotonic() + delay
+        logger.warning(f"Write-behind entry {items[0][0]} failed: {error}; retrying in {delay}s")
+        with self._cond:
+            self._pending.extendleft(reversed(items))
+            self.errors += 1
+
+    def _dead_letter(self, seq, user_id, entry, error):
+        """Set aside an entry that keeps failing and move the checkpoint past it.
+
+        The entry is written to the dead-letter file once, and only counts as
+        dead-lettered when the checkpoint commits; until then it stays at the
+        head of the queue and the checkpoint is retried. Returns the error that
+        stopped the checkpoint, or None once it has committed.
+        """
+        if self._dead_seq != seq:
+            logger.error(
+                f"Write-behind entry {seq} for user {user_id} moved to dead letters: {error}"
+            )
+            with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letters:
+                dead_letters.write(_dead_letter_line(self.journal_path, seq, user_id, entry, error))
+                dead_letters.flush()
+                os.fsync(dead_letters.fileno())
+            self._dead_seq = seq
+        try:
+            with self.app.app_context():
+                apply_batch([], self._checkpoint, seq)
+        except Exception as ex:
+            logger.exception(f"Could not checkpoint past dead-lettered entry {seq}")
+            self._failures += 1
+            return ex
+        self._dead_seq = None
+        self._head_attempts = self._failures = 0
+        with self._cond:
+            self.errors += 1
+            self.dead_lettered += 1
+        return None
+
+    def flush(self):
+        """Commit everything queued so far; return how many items were committed.
+
+        Stops early while the head of the queue is backing off after a failure.
+        """
+        total = 0
+        while True:
+            total += self.flush_once()
+            with self._cond:
+                if not self._pending or time.monotonic() < self._retry_at:
+                    return total
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            if stopping:
+                self.flush()
+                return
+            self.flush_once()
+
+    def stop(self):
+        """Flush what is queued, stop the flush thread and close the journal."""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        self._journal.close()
+        if not self._pending:
+            # A clean shutdown leaves nothing to replay
+            os.remove(self.journal_path)
+            with self.app.app_context():
+                JobCheckpoint.query.filter_by(name=self._checkpoint).delete()
+                db.session.commit()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._pending),
+                "submitted": self.submitted,
+                "committed": self.committed,
+                "batches": self.batches,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "avg_batch_size": round(self.committed / self.batches, 2) if self.batches else 0.0,
+                "errors": self.errors,
+                "dead_lettered": self.dead_lettered,
+            }
+
+
+def get_write_behind():
+    """Return this app's write-behind queue, starting it on first use; None when disabled."""
+    if not current_app.config.get("WRITE_BEHIND_ENABLED", False):
+        return None
+    queue = current_app.extensions.get("write_behind")
+    if queue is None:
+        with _start_lock:
+            queue = current_app.extensions.get("write_behind")
+            if queue is None:
+                journal_dir = current_app.config.get("WRITE_BEHIND_JOURNAL_DIR")
+                queue = WriteBehindQueue(
+                    current_app._get_current_object(),
+                    journal_dir or os.path.join(current_app.instance_path, "write_behind"),
+                    flush_ms=current_app.config.get("WRITE_BEHIND_FLUSH_MS", 50),
+                    max_batch=current_app.config.get("WRITE_BEHIND_MAX_BATCH", 500),
+                    max_attempts=current_app.config.get("WRITE_BEHIND_MAX_ATTEMPTS", 5),
+                    retry_ms=current_app.config.get("WRITE_BEHIND_RETRY_MS", 500),
+                )
+                queue.start()
+                current_app.extensions["write_behind"] = queue
+    return queue